@@ -0,0 +1,186 @@
+"""
+Ejecucion por lotes de ROMs sin interfaz.
+
+Cada ROM se ejecuta en un proceso del pool hasta que termina (OPCODE 0x0000), falla o agota los ciclos.
+Si junto a la ROM existe un archivo con el mismo nombre y extension DUMP_EXTENSION, sus registros se
+comparan con los finales. El formato es el del volcado de main.py --dump, una linea por registro:
+
+    DUMP V0 0b101
+    V1 0x2a
+
+Tambien se pueden indicar puntos de ruptura y de vigilancia de memoria: la ROM se detiene en el primero
+que se alcanza y el motivo aparece en el campo stop del informe.
+
+El informe se escribe en JSON y el codigo de salida es 1 si alguna ROM no pasa.
+"""
+from CPU import HertzCPU, InvalidOpcodeError
+from Config import BATCH_CYCLES, CLOCK_SPEED, DUMP_EXTENSION
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import argparse
+import json
+import os
+import sys
+
+
+def find_roms(paths):
+    """
+    :param paths: archivos o directorios
+    :return: lista de ROMs; de los directorios se toman todos los archivos salvo los volcados esperados
+    """
+    roms = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if os.path.isfile(full_path) and not name.startswith('.') and not name.endswith(DUMP_EXTENSION):
+                    roms.append(full_path)
+        else:
+            roms.append(path)
+    return roms
+
+
+def parse_dump(text):
+    """
+    :param text: contenido de un volcado de registros
+    :return: diccionario {indice del registro V: valor}
+    """
+    expected = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if fields and fields[0] == 'DUMP':
+            fields = fields[1:]
+        if not fields:
+            continue
+        name, value = fields
+        expected[int(name[1:])] = int(value, 0)
+    return expected
+
+
+def format_dump(registers):
+    return ''.join("DUMP V{} {}\n".format(i, bin(value)) for i, value in enumerate(registers))
+
+
+def run_rom(rom, cycles=BATCH_CYCLES, clock_speed=CLOCK_SPEED, breakpoints=(), watches=(), seed=None):
+    """
+    Ejecuta una ROM y compara sus registros con el volcado esperado, si existe
+
+    :param breakpoints: direcciones donde detener la ejecucion
+    :param watches: rangos de memoria (inicio, fin) cuyas escrituras detienen la ejecucion
+    :param seed: semilla de RND. Si es None se elige una y se incluye en el resultado para poder repetirlo
+    :return: diccionario con el estado final (serializable a JSON)
+    """
+    cpu = HertzCPU(clock_speed=clock_speed, seed=seed)
+    result = {'rom': rom, 'seed': cpu.rng.seed, 'halted': False, 'trap': None, 'stop': None}
+    for address in breakpoints:
+        cpu.breakpoints.add_breakpoint(address)
+    for start, end in watches:
+        cpu.breakpoints.watch_memory(start, end)
+
+    start = perf_counter()
+    try:
+        cpu.load_rom(rom, 0)
+        cpu.run(cycles)
+    except InvalidOpcodeError as error:
+        result['trap'] = {'opcode': hex(error.opcode), 'address': hex(error.address)}
+    except (OSError, IndexError) as error:
+        result['error'] = str(error)
+    result['wall_time'] = perf_counter() - start
+    if cpu.breakpoints.hit is not None:
+        kind, location = cpu.breakpoints.hit
+        result['stop'] = {'kind': kind, 'location': hex(location) if isinstance(location, int) else location}
+
+    registers = cpu.registers
+    result.update({
+        'halted': cpu.halted,
+        'cycles': cpu.cycles,
+        'v': list(registers.v),
+        'I': registers.I,
+        'pc': registers.pc,
+        'sp': registers.sp,
+    })
+
+    dump_file = os.path.splitext(rom)[0] + DUMP_EXTENSION
+    if os.path.isfile(dump_file):
+        with open(dump_file) as dump:
+            expected = parse_dump(dump.read())
+        result['expected'] = {'V' + str(i): value for i, value in expected.items()}
+        result['mismatches'] = ['V' + str(i) for i, value in expected.items() if registers.v[i] != value]
+        result['passed'] = cpu.halted and not result['mismatches']
+    else:
+        result['passed'] = cpu.halted
+    return result
+
+
+def run_batch(roms, cycles=BATCH_CYCLES, clock_speed=CLOCK_SPEED, jobs=None, breakpoints=(), watches=(), seed=None):
+    """
+    Reparte las ROMs entre un pool de procesos
+
+    :param jobs: numero de procesos (por defecto, uno por nucleo)
+    :return: informe con un resultado por ROM, en el mismo orden
+    """
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        count = len(roms)
+        results = list(executor.map(run_rom, roms, [cycles] * count, [clock_speed] * count,
+                                    [breakpoints] * count, [watches] * count, [seed] * count))
+
+    return {
+        'cycles': cycles,
+        'wall_time': perf_counter() - start,
+        'passed': sum(result['passed'] for result in results),
+        'failed': sum(not result['passed'] for result in results),
+        'results': results,
+    }
+
+
+def parse_range(text):
+    """
+    :param text: 'inicio' o 'inicio:fin' (fin no incluido)
+    :return: (inicio, fin)
+    """
+    start, _, end = text.partition(':')
+    start = int(start, 0)
+    return start, int(end, 0) if end else start + 1
+
+
+def record_dumps(report):
+    """
+    Escribe el volcado de las ROMs terminadas que aun no tienen uno esperado
+    """
+    for result in report['results']:
+        dump_file = os.path.splitext(result['rom'])[0] + DUMP_EXTENSION
+        if result['halted'] and not os.path.exists(dump_file):
+            with open(dump_file, 'w') as dump:
+                dump.write(format_dump(result['v']))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Ejecuta ROMs sin interfaz y comprueba sus registros finales')
+    parser.add_argument('roms', nargs='+', help='ROMs o directorios con ROMs')
+    parser.add_argument('-n', '--cycles', dest='cycles', type=int, default=BATCH_CYCLES)
+    parser.add_argument('-c', '--clockspeed', dest='clock_speed', type=int, default=CLOCK_SPEED)
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int)
+    parser.add_argument('-o', '--output', dest='output', help='archivo del informe JSON (por defecto, la salida estandar)')
+    parser.add_argument('-b', '--breakpoint', dest='breakpoints', action='append', default=[], type=lambda address: int(address, 0))
+    parser.add_argument('-w', '--watch', dest='watches', action='append', default=[], type=parse_range,
+                        help='rango de memoria inicio[:fin] cuyas escrituras detienen la ejecucion')
+    parser.add_argument('-s', '--seed', dest='seed', type=int, help='semilla de RND para todas las ROMs')
+    parser.add_argument('--record', action='store_true', help='guarda el volcado de las ROMs que no tienen uno esperado')
+    args = parser.parse_args()
+    if args.clock_speed <= 0:
+        parser.error('clockspeed must be positive')
+
+    report = run_batch(find_roms(args.roms), args.cycles, args.clock_speed, args.jobs, args.breakpoints, args.watches, args.seed)
+    if args.record:
+        record_dumps(report)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    sys.exit(1 if report['failed'] else 0)
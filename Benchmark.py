@@ -0,0 +1,218 @@
+"""
+Pruebas de rendimiento.
+
+ - Instrucciones: tiempo por llamada de cada manejador de general_opcode_lookup, logic_opcode_lookup,
+   misc_opcode_lookup y key_opcode_lookup, ejecutado aislado a traves de la tabla de OPCODES (como en el bucle de run()).
+ - Programas: instrucciones por segundo con Chip8Test.b y con ROMs sinteticas (bucle cerrado, llamadas a
+   subrutinas y accesos a memoria Fx55/Fx65), con el interprete y con el recompilador.
+
+Los resultados se comparan con BENCHMARK_BASELINE y el codigo de salida es 1 si la media geometrica de
+las instrucciones o la de los programas empeora mas de BENCHMARK_THRESHOLD, o si una sola medida empeora mas
+de BENCHMARK_ENTRY_THRESHOLD. Cada medida es la mejor de varias repeticiones.
+
+    python Benchmark.py [--save] [--baseline ARCHIVO] [--threshold 0.2] [--entry-threshold 1.0] [--quick]
+"""
+from CPU import HertzCPU
+from Config import BENCHMARK_BASELINE, BENCHMARK_ENTRY_THRESHOLD, BENCHMARK_THRESHOLD
+from time import perf_counter
+import argparse
+import json
+import math
+import os
+import sys
+
+TEST_ROM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Chip8Test.b')
+
+# OPCODE representativo de cada entrada de las tablas (las entradas 0x8 y 0xF solo despachan)
+GENERAL_OPCODES = {
+    0x0: 0x00EE, 0x1: 0x1200, 0x2: 0x2200, 0x3: 0x3123, 0x4: 0x4123, 0x5: 0x5120, 0x6: 0x6123,
+    0x7: 0x7123, 0x9: 0x9120, 0xA: 0xA300, 0xB: 0xB200, 0xC: 0xC1FF, 0xD: 0xD123
+}
+LOGIC_OPCODES = {key: 0x8120 | key for key in (0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7, 0xE)}
+# Fx?5 agrupa tres instrucciones en un mismo manejador: se mide cada una
+MISC_OPCODES = {
+    0x3: (0xF133,), 0x5: (0xF155, 0xF165, 0xF115), 0x7: (0xF107,), 0x8: (0xF118,), 0xA: (0xF10A,), 0xE: (0xF11E,)
+}
+KEY_OPCODES = {0x9E: 0xE19E, 0xA1: 0xE1A1}
+
+# ROMs sinteticas
+SYNTHETIC_ROMS = {
+    # ADD V0, 1 ; SE V0, 0 ; JP 0x000 ; ADD V1, 1 ; JP 0x000
+    'tight_loop': bytes([0x70, 0x01, 0x30, 0x00, 0x10, 0x00, 0x71, 0x01, 0x10, 0x00]),
+    # 0x000 CALL 0x010 ; 0x010 ADD V0, 1 ; LD V1, V0 ; RET (RET vuelve a STACK[SP], 0x000 en este programa)
+    'calls': bytes([0x20, 0x10]).ljust(0x10, b'\x00') + bytes([0x70, 0x01, 0x81, 0x00, 0x00, 0xee]),
+    # LD I, 0x300 ; ADD VF, 1 ; LD [I], VF ; LD VF, [I] ; LD B, V0 ; JP 0x002
+    'memory': bytes([0xa3, 0x00, 0x7f, 0x01, 0xff, 0x55, 0xff, 0x65, 0xf0, 0x33, 0x10, 0x02]),
+}
+
+
+CALLS_PER_RESET = 8
+# Repeticiones de cada medida: el minimo es lo que menos depende de la carga de la maquina
+HANDLER_REPEATS = 15
+PROGRAM_REPEATS = 7
+
+
+def reset(cpu):
+    registers = cpu.registers
+    registers.pc = 0x200
+    registers.sp = 0
+    registers.I = 0x300
+
+
+def time_handler(cpu, opcode, iterations, repeat=HANDLER_REPEATS):
+    """
+    :return: nanosegundos por llamada al manejador de opcode, descontando el coste de preparar el estado
+             y el del propio bucle
+    """
+    handler, handler_operands = cpu.opcode_table[opcode]
+    calls_per_reset = range(CALLS_PER_RESET)
+
+    def calls():
+        # Varias llamadas por cada preparacion para que el coste de reset() pese poco en la medida
+        reset(cpu)
+        for _ in calls_per_reset:
+            handler(cpu, *handler_operands)
+
+    def no_calls():
+        reset(cpu)
+        for _ in calls_per_reset:
+            pass
+
+    def measure(function):
+        start = perf_counter()
+        for _ in range(iterations):
+            function()
+        return perf_counter() - start
+
+    cpu.opcode = opcode
+    # Las dos medidas se alternan para que una racha de carga afecte a ambas por igual
+    best_calls = best_no_calls = float('inf')
+    for _ in range(repeat):
+        best_calls = min(best_calls, measure(calls))
+        best_no_calls = min(best_no_calls, measure(no_calls))
+    return max(best_calls - best_no_calls, 0) / (iterations * CALLS_PER_RESET) * 1e9
+
+
+def instruction_benchmarks(iterations):
+    """
+    :return: {'manejador (OPCODE)': nanosegundos por llamada}
+    """
+    cpu = HertzCPU(seed=0)
+    cases = list(GENERAL_OPCODES.values()) + list(LOGIC_OPCODES.values()) + list(KEY_OPCODES.values())
+    for opcodes in MISC_OPCODES.values():
+        cases.extend(opcodes)
+
+    results = {}
+    for opcode in cases:
+        handler = cpu.opcode_table[opcode][0]
+        results['{} ({})'.format(handler.__name__, hex(opcode))] = time_handler(cpu, opcode, iterations)
+    return results
+
+
+def throughput(program, cycles, dynarec):
+    """
+    :param program: bytes de la ROM, o None para Chip8Test.b
+    :return: instrucciones por segundo
+    """
+    cpu = HertzCPU(dynarec=dynarec, seed=0)
+    if program is None:
+        cpu.load_rom(TEST_ROM, 0)
+    else:
+        cpu.memory[0:len(program)] = program
+        cpu.invalidate(0, len(program))
+    # Chip8Test.b termina enseguida: se vuelve al principio con una instantanea
+    start_state = cpu.snapshot()
+
+    executed = 0
+    start = perf_counter()
+    while executed < cycles:
+        executed += cpu.run(cycles - executed)
+        if cpu.halted:
+            cpu.restore(start_state)
+    return executed / (perf_counter() - start)
+
+
+def program_benchmarks(cycles, repeat=PROGRAM_REPEATS):
+    """
+    :return: {'rom/modo': instrucciones por segundo, la mejor de repeat ejecuciones}
+    """
+    programs = dict(SYNTHETIC_ROMS)
+    programs['Chip8Test.b'] = None
+    results = {}
+    # Las repeticiones se reparten por turnos para que una racha de carga no afecte a todas las de un programa
+    for _ in range(repeat):
+        for name, program in programs.items():
+            for dynarec in (False, True):
+                name_mode = name + '/' + ('dynarec' if dynarec else 'interpreter')
+                results[name_mode] = max(results.get(name_mode, 0.0), throughput(program, cycles, dynarec))
+    return results
+
+
+def run_benchmarks(quick=False):
+    iterations, cycles = (500, 20000) if quick else (10000, 200000)
+    return {
+        'instructions_ns': instruction_benchmarks(iterations),
+        'programs_ips': program_benchmarks(cycles),
+    }
+
+
+def compare(results, baseline, threshold=BENCHMARK_THRESHOLD, entry_threshold=BENCHMARK_ENTRY_THRESHOLD):
+    """
+    Cada medida por separado es demasiado ruidosa para compararla con threshold: con threshold se compara la
+    media geometrica de lo que se ha ralentizado cada seccion, y cada medida solo con entry_threshold
+
+    :return: lista de regresiones (seccion, nombre, referencia, actual). Las medidas que no estan en la
+             referencia aparecen con referencia None: hay que regenerarla con --save
+    """
+    regressions = []
+    for section in ('instructions_ns', 'programs_ips'):
+        log_slowdowns = []
+        for name, value in results[section].items():
+            reference = baseline.get(section, {}).get(name)
+            if reference is None:
+                regressions.append((section, name, None, value))
+                continue
+            # Tiempo por instruccion: peor si sube. Instrucciones por segundo: peor si baja
+            slowdown = value / reference if section == 'instructions_ns' else reference / value
+            if slowdown > 1 + entry_threshold:
+                regressions.append((section, name, reference, value))
+            log_slowdowns.append(math.log(slowdown))
+        if log_slowdowns:
+            slowdown = math.exp(sum(log_slowdowns) / len(log_slowdowns))
+            if slowdown > 1 + threshold:
+                regressions.append((section, 'geometric mean slowdown', 1.0, slowdown))
+    return regressions
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Mide el rendimiento de la CPU y lo compara con la referencia')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE)
+    parser.add_argument('--threshold', type=float, default=BENCHMARK_THRESHOLD)
+    parser.add_argument('--entry-threshold', dest='entry_threshold', type=float, default=BENCHMARK_ENTRY_THRESHOLD)
+    parser.add_argument('--save', action='store_true', help='guarda los resultados como nueva referencia')
+    parser.add_argument('--quick', action='store_true', help='menos iteraciones (resultados menos estables)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick)
+    for section in ('instructions_ns', 'programs_ips'):
+        print(section)
+        for name, value in results[section].items():
+            print("  {:<56} {:>14.1f}".format(name, value))
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at " + args.baseline + " (use --save)")
+        sys.exit(0)
+
+    with open(args.baseline) as baseline_file:
+        regressions = compare(results, json.load(baseline_file), args.threshold, args.entry_threshold)
+    for section, name, reference, value in regressions:
+        if reference is None:
+            print("MISSING {} {}: not in baseline (use --save)".format(section, name))
+        else:
+            print("REGRESSION {} {}: {:.2f} -> {:.2f}".format(section, name, reference, value))
+    sys.exit(1 if regressions else 0)
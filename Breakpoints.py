@@ -0,0 +1,193 @@
+"""
+Puntos de ruptura y de vigilancia.
+
+Los puntos de ruptura son un mapa de bytes con una entrada por direccion de memoria. Los puntos de
+vigilancia se definen sobre rangos de memoria (lectura y/o escritura) y sobre los registros V; para
+saber que lee y escribe cada instruccion se usan tablas de 64K entradas construidas la primera vez
+que se vigila algo.
+
+La CPU solo usa el bucle que comprueba todo esto mientras hay alguno activo (ver HertzCPU.run).
+La comprobacion se hace antes de ejecutar la instruccion, de forma que la CPU se detiene justo antes
+del acceso.
+"""
+from Config import MAX_MEMORY
+from Disassembler import instruction_kind
+from array import array
+
+# Accesos a memoria a partir de I
+NO_ACCESS, READ_N, READ_X, WRITE_X, WRITE_BCD = range(5)
+
+MEMORY_ACCESS = {'DRW': READ_N, 'LD_VX_I': READ_X, 'LD_I_VX': WRITE_X, 'LD_B_VX': WRITE_BCD}
+
+# Registros V que lee y escribe cada tipo de instruccion: 'x', 'y', 'f' (VF), '0' (V0) o 'x*' (V0..Vx)
+REGISTER_ACCESS = {
+    'SE_NN': ('x', ''), 'SNE_NN': ('x', ''), 'SE_VY': ('xy', ''), 'SNE_VY': ('xy', ''),
+    'LD_NN': ('', 'x'), 'ADD_NN': ('x', 'x'), 'LD_VY': ('y', 'x'),
+    'OR': ('xy', 'x'), 'AND': ('xy', 'x'), 'XOR': ('xy', 'x'),
+    'ADD_VY': ('xy', 'xf'), 'SUB': ('xy', 'xf'), 'SUBN': ('xy', 'xf'), 'SHR': ('xy', 'xf'), 'SHL': ('xy', 'xf'),
+    'JP_V0': ('0', ''), 'RND': ('', 'x'), 'DRW': ('xy', 'f'),
+    'LD_VX_DT': ('', 'x'), 'LD_DT_VX': ('x', ''), 'LD_ST_VX': ('x', ''), 'ADD_I_VX': ('x', 'f'),
+    'LD_B_VX': ('x', ''), 'LD_I_VX': ('x*', ''), 'LD_VX_I': ('', 'x*'),
+    'SKP': ('x', ''), 'SKNP': ('x', ''), 'LD_VX_K': ('', 'x'),
+}
+
+access_tables = None
+
+
+def register_mask(fields, opcode):
+    x = (opcode & 0x0F00) >> 8
+    if fields == 'x*':
+        return (1 << (x + 1)) - 1
+
+    mask = 0
+    for field in fields:
+        if field == 'x':
+            mask |= 1 << x
+        elif field == 'y':
+            mask |= 1 << ((opcode & 0x00F0) >> 4)
+        elif field == 'f':
+            mask |= 1 << 0xF
+        elif field == '0':
+            mask |= 1
+    return mask
+
+
+def build_access_tables():
+    """
+    :return: (registros leidos, registros escritos, acceso a memoria) de cada uno de los 65536 OPCODES
+    """
+    reads = array('H', [0] * 0x10000)
+    writes = array('H', [0] * 0x10000)
+    memory = bytearray(0x10000)
+    for opcode in range(0x10000):
+        kind = instruction_kind(opcode)
+        read_fields, write_fields = REGISTER_ACCESS.get(kind, ('', ''))
+        reads[opcode] = register_mask(read_fields, opcode)
+        writes[opcode] = register_mask(write_fields, opcode)
+        memory[opcode] = MEMORY_ACCESS.get(kind, NO_ACCESS)
+    return reads, writes, memory
+
+
+class Breakpoints:
+
+    def __init__(self):
+        self.addresses = bytearray(MAX_MEMORY)
+        self.memory_reads = bytearray(MAX_MEMORY)
+        self.memory_writes = bytearray(MAX_MEMORY)
+        self.register_reads = 0
+        self.register_writes = 0
+        self.watching = False
+        self.active = False
+        # Motivo de la ultima parada: (tipo, direccion o registro), o None
+        self.hit = None
+        # Ciclo en el que se produjo la ultima parada: al continuar no se vuelve a comprobar esa instruccion
+        self.stopped_at = None
+
+    def update(self):
+        self.watching = (self.register_reads or self.register_writes or
+                         self.memory_reads.find(1) >= 0 or self.memory_writes.find(1) >= 0)
+        self.active = self.watching or self.addresses.find(1) >= 0
+        if not self.active:
+            self.hit = None
+            self.stopped_at = None
+
+        global access_tables
+        if self.watching and access_tables is None:
+            access_tables = build_access_tables()
+
+    def add_breakpoint(self, address):
+        self.addresses[address] = 1
+        self.update()
+
+    def remove_breakpoint(self, address):
+        self.addresses[address] = 0
+        self.update()
+
+    def watch_memory(self, start, end=None, read=False, write=True):
+        """
+        Vigila los bytes [start, end). Por defecto solo las escrituras
+        """
+        end = start + 1 if end is None else end
+        if read:
+            self.memory_reads[start:end] = b'\x01' * (end - start)
+        if write:
+            self.memory_writes[start:end] = b'\x01' * (end - start)
+        self.update()
+
+    def unwatch_memory(self, start, end=None):
+        end = start + 1 if end is None else end
+        self.memory_reads[start:end] = bytes(end - start)
+        self.memory_writes[start:end] = bytes(end - start)
+        self.update()
+
+    def watch_register(self, register, read=False, write=True):
+        """
+        Vigila el registro V indicado (0-15). Por defecto solo las escrituras
+        """
+        if read:
+            self.register_reads |= 1 << register
+        if write:
+            self.register_writes |= 1 << register
+        self.update()
+
+    def unwatch_register(self, register):
+        self.register_reads &= ~(1 << register)
+        self.register_writes &= ~(1 << register)
+        self.update()
+
+    def clear(self):
+        self.__init__()
+
+    def check(self, cpu, pc, opcode):
+        """
+        Comprueba si la instruccion opcode, a punto de ejecutarse en pc, debe detener la CPU
+
+        :return: True si hay que detenerse; el motivo queda en hit
+        """
+        if self.stopped_at == cpu.cycles:
+            # Continuamos desde la ultima parada
+            self.stopped_at = None
+            return False
+
+        hit = None
+        # Una CPU aparcada en FX0A repite la instruccion en cada run(): sus puntos de ruptura y de vigilancia
+        # ya se han comprobado antes de ejecutarla la primera vez
+        if cpu.parked:
+            pass
+        elif self.addresses[pc]:
+            hit = ('breakpoint', pc)
+        elif self.watching:
+            hit = self.check_access(cpu, opcode)
+
+        if hit is None:
+            return False
+        self.hit = hit
+        self.stopped_at = cpu.cycles
+        return True
+
+    def check_access(self, cpu, opcode):
+        reads, writes, memory = access_tables
+        register_hit = reads[opcode] & self.register_reads
+        if register_hit:
+            return ('read', 'V' + str(register_hit.bit_length() - 1))
+        register_hit = writes[opcode] & self.register_writes
+        if register_hit:
+            return ('write', 'V' + str(register_hit.bit_length() - 1))
+
+        access = memory[opcode]
+        if access == NO_ACCESS:
+            return None
+        start = cpu.registers.I
+        if access == READ_N:
+            end, watched = start + (opcode & 0x000F), self.memory_reads
+        elif access == READ_X:
+            end, watched = start + ((opcode & 0x0F00) >> 8) + 1, self.memory_reads
+        elif access == WRITE_X:
+            end, watched = start + ((opcode & 0x0F00) >> 8) + 1, self.memory_writes
+        else:
+            end, watched = start + 3, self.memory_writes
+
+        address = watched.find(1, start, end)
+        if address < 0:
+            return None
+        return ('read' if watched is self.memory_reads else 'write', address)
@@ -1,12 +1,110 @@
-from Config import MAX_MEMORY, PROGRAM_COUNTER_START, DEBUG
-from os import urandom
-from random import seed, randint
-import numpy
+from Config import MAX_MEMORY, PROGRAM_COUNTER_START, DEBUG, DYNAREC, CLOCK_SPEED, JOURNAL_CAPACITY, IDLE_FAST_FORWARD, \
+    FUSE_INSTRUCTIONS
+from Disassembler import describe
+from Framebuffer import Framebuffer
+from Journal import UndoJournal
+from Keypad import Keypad
+from Breakpoints import Breakpoints
+from Profiler import Profiler
+from Replay import Recording
+from Rng import RandomSource
+from Recompiler import BlockCompiler
+from Snapshot import Snapshot, PAGE_COUNT, page_range
+from Timers import Timers
+import Rom
+from array import array
+from functools import wraps
+
+# Cada operando de una instruccion se obtiene aplicando una mascara y un desplazamiento al OPCODE
+OPERAND_DECODERS = {
+    'general': lambda opcode: (opcode & 0xF000) >> 12,
+    'x': lambda opcode: (opcode & 0x0F00) >> 8,
+    'y': lambda opcode: (opcode & 0x00F0) >> 4,
+    'n': lambda opcode: opcode & 0x000F,
+    'nn': lambda opcode: opcode & 0x00FF,
+    'nnn': lambda opcode: opcode & 0x0FFF
+}
+
+
+def decode_operands(opcode, fields):
+    return tuple(OPERAND_DECODERS[field](opcode) for field in fields)
+
+
+def operands(*fields):
+    """
+    Declara los operandos que recibe un manejador de instrucciones.
+
+    La tabla de OPCODES llama directamente a la funcion con los operandos ya decodificados.
+    Si se llama al manejador sin argumentos, los operandos se obtienen de self.opcode.
+    """
+    def decorator(function):
+        @wraps(function)
+        def handler(self, *args):
+            if not args:
+                args = decode_operands(self.opcode, fields)
+            return function(self, *args)
+
+        handler.fields = fields
+        handler.function = function
+        return handler
+
+    return decorator
+
+
+# Por convencion los programas Hertz terminan con la instruccion 0x0000
+HALT_OPCODE = 0x0000
+
+# Bytes de memoria de los que puede depender una entrada de la cache de instrucciones
+# (los bucles de espera se reconocen mirando tres instrucciones seguidas)
+DECODE_SPAN = 6
+
+
+class InvalidOpcodeError(Exception):
+    """
+    La CPU ha encontrado una instruccion que no sabe ejecutar
+    """
+    def __init__(self, opcode, address):
+        super().__init__("OpCode " + hex(opcode) + " at address " + hex(address) + " is not a valid instruction")
+        self.opcode = opcode
+        self.address = address
+
+
+class Registers:
+    """
+    Banco de registros de la CPU.
+
+    Los registros V se guardan en un bytearray y el resto son enteros de Python, de forma que
+    las operaciones aritmeticas no pasan por numpy. El acarreo y el desbordamiento se obtienen
+    aplicando mascaras explicitas.
+    Tambien admite el acceso como diccionario (registers['v'], registers['pc']...).
+    """
+    __slots__ = ('v', 'I', 'pc', 'stack', 'sp', 'index')
+
+    def __init__(self):
+        self.v = bytearray(16)
+        self.I = 0
+        self.pc = PROGRAM_COUNTER_START
+        self.stack = array('H', [0] * 16)
+        self.sp = 0
+        self.index = 0
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name in ('v', 'stack'):
+            getattr(self, name)[:] = value
+        else:
+            setattr(self, name, int(value))
 
 
 class HertzCPU:
 
-    def __init__(self):
+    # Tabla de 64K entradas indexada por el OPCODE completo: (funcion, operandos decodificados).
+    # Se construye una unica vez y la comparten todas las instancias.
+    opcode_table = None
+
+    def __init__(self, dynarec=DYNAREC, clock_speed=CLOCK_SPEED, journal=False, profile=False, seed=None):
 
         # Existen 16 registros de proposito general (V0-VF).
         # VF se encuentra reservado como marca para algunas instrucciones
@@ -14,23 +112,14 @@ class HertzCPU:
         # Stack permite almacenar el puntero de instrucciones (pc) cuando se realizan saltos, llamadas a subrutinas...
         # SP permite almacenar el nivel en el que se encuentrra el ultimo puntero de instrucciones almacenado.
 
-        self.registers = {
-            'v': [numpy.uint8(0)] * 16,
-            'I': numpy.uint16(0),
-            'pc': PROGRAM_COUNTER_START,
-            'stack': [0] * 16,
-            'sp': 0,
-            'index': 0
-        }
+        self.registers = Registers()
 
         # Ambos llevan a cabo una cuenta regresiva a 60Hz hasta llegar a 0
         # delay_timer: controla los eventos de los juegos
         # sound_timer: si su valor es distinto de cero se produce un pitido
+        # Su valor se calcula a partir del contador de ciclos, por lo que no dependen de la velocidad real de ejecucion
 
-        self.timers = {
-            'delay_timer': 0,
-            'sound_timer': 0
-        }
+        self.timers = Timers(self, clock_speed)
 
         # Debemos divir los OPCODES segun el tipo de operacion y construir diccionarios que 'traduzcan' el codigo
 
@@ -48,6 +137,8 @@ class HertzCPU:
             0xA: self.set_i_to_address,
             0xB: self.jump_to_address,
             0xC: self.set_vx_bitwise_random,
+            0xD: self.draw_sprite,
+            0xE: self.execute_key_instruction,
             0xF: self.execute_misc_instruction
         }
 
@@ -68,461 +159,842 @@ class HertzCPU:
             0x7: self.set_vx_to_delay_timer,
             0x5: self.dump_or_load_v_registers_to_memory_or_set_timer,
             0x8: self.set_sound_timer_to_vx,
+            0xA: self.wait_for_key,
             0xE: self.add_vx_to_i
         }
 
+        # Las instrucciones de teclado (0xE) se distinguen por su ultimo byte
+        self.key_opcode_lookup = {
+            0x9E: self.skip_if_key_pressed,
+            0xA1: self.skip_if_key_not_pressed
+        }
+
+        # Pantalla de 64x32 pixeles. Los manejadores solo modifican este array, nunca pygame
+        self.framebuffer = Framebuffer()
+
         self.opcode = 0
+        self.halted = False
+        self.last_random = None
         self.memory = bytearray(MAX_MEMORY)
-        seed(urandom(20))
+
+        # Instrucciones ya decodificadas indexadas por direccion: (opcode, funcion, operandos).
+        # Cualquier escritura en memoria debe pasar por invalidate() para que el programa pueda modificarse a si mismo.
+        self.decode_cache = [None] * MAX_MEMORY
+        # Misma cache con las parejas de instrucciones fusionadas: (opcode, funcion, operandos, instrucciones).
+        # Solo la usa el bucle sin ganchos de run(); el resto de bucles ejecuta las instrucciones una a una.
+        self.fused_cache = [None] * MAX_MEMORY
+        # Busquedas en la cache que encuentran la instruccion ya decodificada y decodificaciones (ver cache_stats())
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cycles = 0
+        # Limite de ciclos de la llamada a run() en curso: los bucles de espera saltan hasta el, como mucho
+        self.idle_limit = None
+        self.idle_cycles = 0
+        # Limite de ciclos de cualquier run() en curso: FX0A avanza hasta el mientras no llega ninguna tecla
+        self.run_limit = None
+        # Teclado hexadecimal. parked indica que la CPU esta detenida en FX0A esperando una tecla
+        self.keypad = Keypad()
+        self.parked = False
+        # Generador propio de la instruccion RND: con la misma semilla la ejecucion se repite exactamente
+        self.rng = RandomSource(seed)
+        self.recording = None
+        self.replaying = None
+
+        # Paginas de memoria de la ultima instantanea y paginas escritas desde entonces (ver Snapshot.py)
+        self.pages = [None] * PAGE_COUNT
+        self.dirty_pages = bytearray(b'\x01' * PAGE_COUNT)
+
+        if HertzCPU.opcode_table is None:
+            HertzCPU.opcode_table = self.build_opcode_table()
+
+        self.compiler = BlockCompiler(self) if dynarec else None
+        # Diario opcional para deshacer instrucciones. Mientras esta activo no se usa el recompilador
+        self.journal = UndoJournal(self, JOURNAL_CAPACITY) if journal else None
+        # Perfilador opcional: cuenta ejecuciones por OPCODE, direccion y subrutina
+        self.profiler = Profiler(self) if profile else None
+        # Puntos de ruptura y de vigilancia. Solo cuestan algo mientras hay alguno activo
+        self.breakpoints = Breakpoints()
+
+    def build_opcode_table(self):
+        """
+        Recorre todos los OPCODES posibles resolviendo las tablas general, logica y miscelanea
+
+        :return: lista de 65536 tuplas (funcion, operandos)
+        """
+        table = []
+        for opcode in range(0x10000):
+            handler = self.general_opcode_lookup.get((opcode & 0xF000) >> 12)
+            if handler == self.execute_logic_instruction:
+                handler = self.logic_opcode_lookup.get(opcode & 0x000F)
+            elif handler == self.execute_misc_instruction:
+                handler = self.misc_opcode_lookup.get(opcode & 0x000F)
+            elif handler == self.execute_key_instruction:
+                handler = self.key_opcode_lookup.get(opcode & 0x00FF)
+
+            if handler is None:
+                table.append((HertzCPU.trap, (opcode,)))
+            else:
+                table.append((handler.function, decode_operands(opcode, handler.fields)))
+
+        return table
 
     def decrement_timers(self):
-        if self.timers['delay_timer'] > 0:
-            self.timers['delay_timer'] -= 1
-        if self.timers['sound_timer'] > 0:
-            self.timers['delay_timer'] -= 1
+        """
+        Descuenta un periodo de 60Hz. Los temporizadores ya avanzan solos con los ciclos ejecutados.
+        """
+        self.timers.tick()
 
     def load_rom(self, rom, offset=PROGRAM_COUNTER_START):
         """
-        Carga un archivo en memoria a partir del lugar indicado
+        Carga un archivo en memoria a partir del lugar indicado.
+        Admite ROMs binarias y en texto ('01100001 ...'), ver Rom.py.
 
         :param rom: el nombre del archivo a cargar
         :param offset: la ubicación de memoria donde empezar a cargar el archivo
 
         """
-        with open(rom, "r") as file_data:
-            # Enumerate nos permite iterar sobre un objeto mientras mantenemos un contador del bucle actual
-            for index, val in enumerate(file_data.read().split()):  # Is a .read() needed?
-                self.memory[index + offset] = int(val, 2)
+        length = Rom.load_rom(self.memory, rom, offset)
+        self.invalidate(offset, length)
 
-    def execute_instruction(self):
+    def invalidate(self, address, length=1):
         """
-        Obtiene la siguiente instrucción de la memoria y lo ejecuta
+        Descarta las instrucciones decodificadas que incluyen los bytes modificados
 
-        :return: OPCODE
+        :param address: primera direccion escrita
+        :param length: numero de bytes escritos
         """
-        # Cada instruccion está formada por 2 bytes. Cada byte está formado por 8 bits.
-        # Debemos desplazar el valor del primer byte 8 puestos a la izq. para luego realizar un OR sobre ambos bytes
-        instruction = self.memory[self.registers['pc']] << 8 | self.memory[self.registers['pc'] + 1]
-
-        if DEBUG:
-            print("Instruccion: " + hex(instruction))
-            print("Direccion actual del programa: " + str(self.registers['pc']))
+        # Las entradas que empiezan hasta DECODE_SPAN - 1 bytes antes tambien dependen del byte escrito
+        for cached_address in range(max(address - DECODE_SPAN + 1, 0), min(address + length, MAX_MEMORY)):
+            self.decode_cache[cached_address] = None
+            self.fused_cache[cached_address] = None
 
-        self.registers['pc'] = self.registers['pc'] + 2
+        for page in page_range(address, length):
+            self.dirty_pages[page] = 1
 
-        self.opcode = instruction
-        instruction = (instruction & 0xF000) >> 12
-        try:
-            self.instruction_name = self.general_opcode_lookup[instruction]()
-        except KeyError:
-            print("ERROR. OpCode: " + hex(self.opcode) + " Not found in general lookup table.")
-
-        return self.opcode
-
-    def execute_logic_instruction(self):
-        instruction = self.opcode & 0x000F
-        try:
-            instruction_name = self.logic_opcode_lookup[instruction]()
-        except KeyError:
-            print("ERROR. OpCode: " + hex(self.opcode) + " Not found in logical lookup table.")
-        return instruction_name
+        if self.compiler is not None:
+            self.compiler.invalidate(address, length)
 
-    def execute_misc_instruction(self):
-        instruction = self.opcode & 0x000F
-        try:
-            instruction_name = self.misc_opcode_lookup[instruction]()
-        except KeyError:
-            print("ERROR. OpCode: " + hex(self.opcode) + " Not found in misc lookup table.")
+    def snapshot(self):
+        """
+        Instantanea del estado completo: registros, pila, temporizadores, generador aleatorio, memoria y pantalla.
+        Las paginas de memoria que no se han escrito se comparten con la instantanea anterior.
 
-        return instruction_name
+        :return: Snapshot
+        """
+        return Snapshot.capture(self)
 
-    def jump_to_address(self):
+    def restore(self, snapshot):
         """
-        Salta a la dirección de memoria especificada por los últimos 3 bits de la instrucción
+        Vuelve al estado guardado en una instantanea tomada con snapshot() o cargada con Snapshot.load()
         """
-        if (self.opcode & 0xF000) >> 12 == 0xB:
-            self.registers['pc'] = (self.opcode & 0x0FFF) + self.registers['v'][0]
-        else:
-            self.registers['pc'] = self.opcode & 0x0FFF
-            return ("JP " + str(self.opcode & 0x0FFF),)
+        snapshot.restore(self)
 
-    def set_vx_to_nn(self):
+    def start_recording(self):
         """
-        Establece el valor de Vx a nn
+        Empieza a grabar los numeros aleatorios y las teclas pulsadas para poder repetir la ejecucion con replay()
         """
-        register_to_set = (self.opcode & 0x0F00) >> 8
-        value_to_set = (self.opcode & 0x00FF)
-        self.registers['v'][register_to_set] = numpy.uint8(value_to_set)
-
-        mnemonic = "LD V" +  str(register_to_set) + ", " +  str(value_to_set)
-        human = "V" + str(register_to_set) + " <= " + str(value_to_set)
-        result = "V" + str(register_to_set) + " = " + str(self.registers['v'][register_to_set])
+        self.rng.start_recording()
+        self.recording = Recording(self.rng.seed, start_cycle=self.cycles)
+        self.keypad.recording = self.recording
 
-        return (mnemonic, human, result)
+    def stop_recording(self):
+        """
+        :return: Recording con todo lo grabado desde start_recording()
+        """
+        recording = self.recording
+        recording.random_stream = self.rng.recorded()
+        self.rng.history = None
+        self.recording = None
+        self.keypad.recording = None
+        return recording
 
-    def skip_if_vx_equals_nn(self):
+    def replay(self, recording):
         """
-        Si Vx es igual a nn saltamos la siguiente instrucción
+        Repite una ejecucion grabada: RND devuelve los mismos numeros en el mismo orden
+        y las teclas cambian en los mismos ciclos
         """
-        register_to_check = (self.opcode & 0x0F00) >> 8
-        value_to_check = (self.opcode & 0x00FF)
-        result = "False"
+        self.rng = RandomSource(recording.seed, stream=recording.random_stream)
+        self.keypad.schedule(recording.key_events)
+        self.replaying = recording
 
-        if self.registers['v'][register_to_check] == value_to_check:
-            self.registers['pc'] = self.registers['pc'] + 2
-            result = "True"
+    def decode(self, address):
+        """
+        Decodifica la instruccion almacenada en address y la guarda en la cache
 
-        mnemonic = "SE V" + str(register_to_check) + ", " + str(value_to_check)
-        human = "V" + str(register_to_check) + " == " + str(value_to_check)
+        :return: (opcode, funcion, operandos)
+        """
+        # Cada instruccion está formada por 2 bytes. Cada byte está formado por 8 bits.
+        # Debemos desplazar el valor del primer byte 8 puestos a la izq. para luego realizar un OR sobre ambos bytes
+        instruction = self.memory[address] << 8 | self.memory[address + 1]
+        entry = (instruction,) + self.opcode_table[instruction]
+        if IDLE_FAST_FORWARD:
+            entry = self.detect_idle_loop(address, entry)
 
-        return (mnemonic, human, result)
+        self.cache_misses += 1
+        self.decode_cache[address] = entry
+        return entry
 
-    def skip_if_vx_not_equals_nn(self):
+    def fuse(self, address):
         """
-        Si Vx es desigual a nn saltamos la siguiente instrucción.
+        Entrada de la cache de instrucciones fusionadas para address. Se fusionan:
+         - LD Vx, nn ; ADD Vx, mm
+         - LD I, nnn ; LD [I], Vx o LD Vx, [I]
+         - ADD Vx, Vy ; SE VF, nn
+
+        :return: (opcode de la ultima instruccion, funcion, operandos, numero de instrucciones)
         """
-        register_to_check = (self.opcode & 0x0F00) >> 8
-        value_to_check = (self.opcode & 0x00FF)
-        result = "False"
+        entry = self.decode_cache[address]
+        if entry is None:
+            entry = self.decode(address)
+        else:
+            self.cache_hits += 1
+        fused = entry + (1,)
 
-        if self.registers['v'][register_to_check] != value_to_check:
-            self.registers['pc'] = self.registers['pc'] + 2
-            result = "True"
+        if FUSE_INSTRUCTIONS and address + 4 <= MAX_MEMORY:
+            first = entry[0]
+            second = self.memory[address + 2] << 8 | self.memory[address + 3]
+            x = (first & 0x0F00) >> 8
 
-        mnemonic = "SNE V" + str(register_to_check) + ", " + str(value_to_check)
-        human = "V" + str(register_to_check) + " != " + str(value_to_check)
+            if first & 0xF000 == 0x6000 and second & 0xFF00 == 0x7000 | x << 8:
+                fused = second, HertzCPU.fused_load_add, (x, (first + second) & 0xFF), 2
+            elif first & 0xF000 == 0xA000 and second & 0xF0FF in (0xF055, 0xF065):
+                fused = second, HertzCPU.fused_set_i_dump_or_load, \
+                    (first & 0x0FFF, (second & 0x0F00) >> 8, (second & 0x00F0) >> 4), 2
+            elif first & 0xF00F == 0x8004 and second & 0xFF00 == 0x3F00:
+                fused = second, HertzCPU.fused_add_skip_if_flag, (x, (first & 0x00F0) >> 4, second & 0x00FF), 2
 
-        return (mnemonic, human, result)
+        self.fused_cache[address] = fused
+        return fused
 
-    def skip_if_vx_equals_vy(self):
+    def fused_load_add(self, vx_register, value):
         """
-        Si Vx es igual a Vy saltamos la siguiente instrucción.
+        LD Vx, nn ; ADD Vx, mm: Vx acaba valiendo (nn + mm) & 0xFF
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
-        result = "False"
+        self.registers.v[vx_register] = value
 
-        if self.registers['v'][vx_register] == self.registers['v'][vy_register]:
-            self.registers['pc'] = self.registers['pc'] + 2
-            result = "True"
+    def fused_set_i_dump_or_load(self, nnn_value, vx_register, dump_or_load):
+        """
+        LD I, nnn seguido de LD [I], Vx o LD Vx, [I]
+        """
+        self.registers.I = nnn_value
+        HertzCPU.dump_or_load_v_registers_to_memory_or_set_timer.function(self, vx_register, dump_or_load)
 
-        mnemonic = "SE V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " == " + "V" + str(vy_register)
+    def fused_add_skip_if_flag(self, vx_register, vy_register, nn_value):
+        """
+        ADD Vx, Vy seguido de SE VF, nn (comprobacion del acarreo)
+        """
+        registers = self.registers
+        v = registers.v
+        v[0xf] = 0  # Mismo orden que add_vy_to_vx: importa si Vx o Vy es VF
+        resultado = v[vx_register] + v[vy_register]
 
-        return (mnemonic, human, result)
+        v[0xf] = resultado >> 8
+        v[vx_register] = resultado & 0xFF
+        if v[0xf] == nn_value:
+            registers.pc += 2
 
-    def skip_if_vx_not_equals_vy(self):
+    def detect_idle_loop(self, address, entry):
         """
-        Si Vx es desigual a Vy saltamos la siguiente instrucción.
-        """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
-        result = "False"
+        Sustituye el manejador de las instrucciones que empiezan un bucle de espera:
+         - JP a la propia direccion
+         - LD Vx, DT ; SE Vx, NN ; JP a la primera instruccion
 
-        if self.registers['v'][vx_register] != self.registers['v'][vy_register]:
-            self.registers['pc'] = self.registers['pc'] + 2
-            result = "True"
+        :return: entrada de la cache para address
+        """
+        instruction = entry[0]
+        if instruction == 0x1000 | address:
+            return instruction, HertzCPU.idle_jump, (address,)
 
-        mnemonic = "SNE V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " != " + "V" + str(vy_register)
+        if instruction & 0xF0FF == 0xF007 and address + DECODE_SPAN <= MAX_MEMORY:
+            memory = self.memory
+            x = (instruction & 0x0F00) >> 8
+            compare = memory[address + 2] << 8 | memory[address + 3]
+            jump = memory[address + 4] << 8 | memory[address + 5]
+            if compare & 0xFF00 == 0x3000 | x << 8 and jump == 0x1000 | address:
+                return instruction, HertzCPU.idle_poll_delay_timer, (x, compare & 0x00FF)
 
-        return (mnemonic, human, result)
+        return entry
 
-    def set_i_to_address(self):
+    def idle_jump(self, address):
         """
-        Asigna a I nnn (?)
+        JP a si mismo: el programa no puede salir del bucle, asi que se consumen de golpe los ciclos que quedan
         """
-        self.registers['I'] = numpy.uint16(self.opcode & 0x0FFF)
+        self.registers.pc = address
+        limit = self.idle_limit
+        if limit is not None and self.cycles < limit:
+            self.idle_cycles += limit - self.cycles
+            self.cycles = limit
 
-        mnemonic = "LD I, " + str(self.opcode & 0x0FFF)
-        human = "I <= " + str(self.opcode & 0x0FFF)
-        result = "I = " + str(self.opcode & 0x0FFF)
+    def idle_poll_delay_timer(self, vx_register, nn_value):
+        """
+        LD Vx, DT al comienzo de un bucle que espera a que el temporizador valga nn.
+        Se saltan las vueltas completas (3 instrucciones cada una) que leerian un valor distinto de nn.
+        """
+        timers = self.timers
+        value = timers['delay_timer']
+        limit = self.idle_limit
+        if limit is not None and value != nn_value:
+            iterations = (limit - self.cycles) // 3
+            if value > nn_value:
+                # Ultima vuelta cuya lectura sigue siendo mayor que nn
+                iterations = min(iterations, (timers.cycles_until('delay_timer', nn_value) - 1) // 3)
+            if iterations > 0:
+                self.cycles += 3 * iterations
+                self.idle_cycles += 3 * iterations
+                value = timers['delay_timer']
+        self.registers.v[vx_register] = value
 
-        return (mnemonic, human, result)
+    def cache_stats(self):
+        """
+        :return: aciertos, fallos y tasa de aciertos de la cache de instrucciones.
+                 Los ciclos que no pasan por la cache (bucles de espera saltados, recompilador) no cuentan
+        """
+        hits = self.cache_hits
+        lookups = hits + self.cache_misses
+        return {
+            'hits': hits,
+            'misses': self.cache_misses,
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
 
-    def set_vx_bitwise_random(self):
+    def execute_instruction(self):
         """
-        Bitwise random number with nnn and set result to Vx
+        Obtiene la siguiente instrucción de la memoria y lo ejecuta
+
+        :return: OPCODE
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        nnn_value = (self.opcode & 0x00FF)
-        random_number = randint(0, 255)
+        registers = self.registers
+        pc = registers.pc
+        entry = self.decode_cache[pc]
+        if entry is None:
+            entry = self.decode(pc)
+        else:
+            self.cache_hits += 1
+        instruction, handler, handler_operands = entry
 
-        self.registers['v'][vx_register] = numpy.uint8(random_number & nnn_value)
+        if self.journal is not None:
+            self.journal.record(instruction)
+        if self.profiler is not None:
+            self.profiler.record(pc, instruction)
 
-        mnemonic = "RND V" + str(vx_register) + ", " + str(nnn_value)
-        human = "V" + str(vx_register) + " <= " + str(random_number) + " & " + str(nnn_value)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+        if DEBUG:
+            print("Instruccion: " + hex(instruction))
+            print("Direccion actual del programa: " + str(pc))
 
-        return (mnemonic, human, result)
+        registers.pc = pc + 2
+        self.cycles += 1
 
-    def set_vx_to_vy(self):
-        """
-        Establece el valor de Vy a Vx
-        """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        self.opcode = instruction
+        handler(self, *handler_operands)
 
-        self.registers['v'][vx_register] = numpy.uint8(self.registers['v'][vy_register])
+        return instruction
 
-        mnemonic = "LD V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vy_register])
+    def execute_block(self):
+        """
+        Ejecuta un bloque basico completo con el recompilador dinamico.
+        Si el recompilador esta desactivado (o el diario o el perfilador activados) ejecuta una sola instruccion.
 
-        return (mnemonic, human, result)
+        :return: OPCODE de la ultima instruccion ejecutada
+        """
+        if self.compiler is None or self.journal is not None or self.profiler is not None:
+            return self.execute_instruction()
+        return self.compiler.execute()
 
-    def set_vx_to_vx_or_vy(self):
+    def run(self, cycles, trace=None):
         """
-        Realiza la operación OR sobre Vx y Vy y guarda el valor en Vx
+        Ejecuta hasta cycles instrucciones seguidas sin volver al bucle principal.
+        Se detiene antes si el programa termina (OPCODE 0x0000).
+
+        :param cycles: numero maximo de instrucciones a ejecutar
+        :param trace: funcion opcional llamada con el OPCODE tras cada instruccion
+        :return: numero de instrucciones ejecutadas
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        if self.breakpoints.active:
+            return self.run_checked(cycles, trace)
 
-        self.registers['v'][vx_register] = numpy.bitwise_or(self.registers['v'][vx_register], self.registers['v'][vy_register])
+        start = self.cycles
+        limit = start + cycles
+        self.run_limit = limit
+        try:
+            if trace is not None or DEBUG or self.journal is not None or self.profiler is not None:
+                while self.cycles < limit:
+                    opcode = self.execute_instruction()
+                    if trace is not None:
+                        trace(opcode)
+                    if opcode == HALT_OPCODE:
+                        self.halted = True
+                        break
+                return self.cycles - start
+
+            if self.compiler is not None:
+                execute_block = self.compiler.execute
+                while self.cycles < limit:
+                    # Al final del lote los bloques que no caben se ejecutan instruccion a instruccion
+                    if execute_block(limit - self.cycles) == HALT_OPCODE:
+                        self.halted = True
+                        break
+                return self.cycles - start
+
+            # Variante sin ganchos: las busquedas de atributos se hacen una sola vez fuera del bucle
+            registers = self.registers
+            fused_cache = self.fused_cache
+            fuse = self.fuse
+            opcode = self.opcode
+            hits = 0
+            self.idle_limit = limit
+            try:
+                # Una pareja fusionada cuenta dos ciclos: no se empieza ninguna en el ultimo ciclo
+                while self.cycles < limit - 1:
+                    pc = registers.pc
+                    entry = fused_cache[pc]
+                    if entry is None:
+                        entry = fuse(pc)
+                    else:
+                        hits += 1
+                    opcode, handler, handler_operands, instructions = entry
+
+                    registers.pc = pc + 2 * instructions
+                    self.cycles += instructions
+                    handler(self, *handler_operands)
+
+                    if opcode == HALT_OPCODE:
+                        self.halted = True
+                        break
+                else:
+                    if self.cycles < limit:
+                        opcode = self.execute_instruction()
+                        if opcode == HALT_OPCODE:
+                            self.halted = True
+            finally:
+                self.opcode = opcode
+                self.cache_hits += hits
+                self.idle_limit = None
+
+            return self.cycles - start
+        finally:
+            self.run_limit = None
+
+    def run_checked(self, cycles, trace=None):
+        """
+        Variante de run() que se detiene en los puntos de ruptura y de vigilancia.
+        El motivo de la parada queda en breakpoints.hit (None si no se ha detenido).
+
+        :return: numero de instrucciones ejecutadas
+        """
+        start = self.cycles
+        limit = start + cycles
+        self.breakpoints.hit = None
+        self.run_limit = limit
 
-        mnemonic = "OR V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " | V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+        try:
+            while self.cycles < limit:
+                if self.breakpoint_hit():
+                    break
 
-        return (mnemonic, human, result)
+                opcode = self.execute_instruction()
+                if trace is not None:
+                    trace(opcode)
+                if opcode == HALT_OPCODE:
+                    self.halted = True
+                    break
+        finally:
+            self.run_limit = None
 
-    def set_vx_to_vx_and_vy(self):
+        return self.cycles - start
+
+    def breakpoint_hit(self):
         """
-        Realiza la operación AND sobre Vx y Vy y guarda el valor en Vx
+        Comprueba los puntos de ruptura y de vigilancia antes de ejecutar la instruccion del PC actual
+
+        :return: True si hay que detenerse; el motivo queda en breakpoints.hit
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        pc = self.registers.pc
+        entry = self.decode_cache[pc]
+        if entry is None:
+            entry = self.decode(pc)
+        return self.breakpoints.check(self, pc, entry[0])
 
-        self.registers['v'][vx_register] = numpy.bitwise_and(self.registers['v'][vx_register], self.registers['v'][vy_register])
+    def run_until(self, predicate, max_cycles=None):
+        """
+        Ejecuta instrucciones hasta que predicate(cpu) sea cierto o el programa termine.
+        Como run(), se detiene en los puntos de ruptura y de vigilancia (motivo en breakpoints.hit).
 
-        mnemonic = "AND V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " & V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+        :param predicate: funcion evaluada tras cada instruccion
+        :param max_cycles: limite opcional de instrucciones
+        :return: numero de instrucciones ejecutadas
+        """
+        start = self.cycles
+        checked = self.breakpoints.active
+        if checked:
+            self.breakpoints.hit = None
+        # Sin limite FX0A solo puede adelantarse hasta el siguiente evento programado del teclado
+        self.run_limit = None if max_cycles is None else start + max_cycles
+        try:
+            while max_cycles is None or self.cycles - start < max_cycles:
+                if checked and self.breakpoint_hit():
+                    break
+                if self.execute_instruction() == HALT_OPCODE:
+                    self.halted = True
+                    break
+                if predicate(self):
+                    break
+        finally:
+            self.run_limit = None
+        return self.cycles - start
 
-        return (mnemonic, human, result)
+    def run_paced(self, clock, on_frame=None):
+        """
+        Ejecuta el programa a la velocidad del reloj, sincronizando una vez por fotograma
 
-    def set_vx_to_vx_xor_vy(self):
+        :param clock: FrameClock que reparte los ciclos de cada fotograma
+        :param on_frame: funcion opcional llamada con la CPU al final de cada fotograma
         """
-        Realiza la operación XOR sobre Vx y Vy y guarda el valor en Vx
+        while not self.halted:
+            self.run(clock.cycles_per_frame())
+            if on_frame is not None:
+                on_frame(self)
+            clock.wait()
+
+    def step_back(self, steps=1):
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        Deshace las ultimas instrucciones ejecutadas. Requiere HertzCPU(journal=True)
 
-        self.registers['v'][vx_register] = numpy.bitwise_xor(self.registers['v'][vx_register], self.registers['v'][vy_register])
+        :return: numero de instrucciones deshechas
+        """
+        return self.journal.step_back(steps)
 
-        mnemonic = "XOR V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " ^ V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+    def run_back_to(self, pc):
+        """
+        Deshace instrucciones hasta la ultima vez que el PC valio pc. Requiere HertzCPU(journal=True)
 
-        return (mnemonic, human, result)
+        :return: numero de instrucciones deshechas
+        """
+        return self.journal.run_back_to(pc)
 
-    def call_subroutine(self):
+    @property
+    def instruction_name(self):
         """
-        Llama a la subrutina en nnn.
+        Texto (mnemonic, human, result) de la ultima instruccion ejecutada.
+        Solo se construye cuando se consulta, por lo que debe leerse antes de ejecutar la siguiente instruccion.
         """
-        subroutine_address = self.opcode & 0x0FFF
+        return describe(self)
 
-        self.registers['stack'][self.registers['sp']] = self.registers['pc'] + 2  # Saltamos a la siguiente instrucción.
-        self.registers['sp'] = self.registers['sp'] + 1
+    def trap(self, opcode=None):
+        """
+        Detiene la ejecucion ante una instruccion desconocida
+        """
+        raise InvalidOpcodeError(self.opcode if opcode is None else opcode, self.registers.pc - 2)
 
-        self.registers['pc'] = subroutine_address
+    def execute_logic_instruction(self):
+        self.logic_opcode_lookup.get(self.opcode & 0x000F, self.trap)()
 
-        mnemonic = "CALL " + str(subroutine_address)
-        human = "PC <= " + str(subroutine_address) + ", sp <= " + str(self.registers['sp'])
-        result = "PC <= " + str(subroutine_address) + ", sp <= " + str(self.registers['sp'])
+    def execute_misc_instruction(self):
+        self.misc_opcode_lookup.get(self.opcode & 0x000F, self.trap)()
 
-        return (mnemonic, human, result)
+    def execute_key_instruction(self):
+        self.key_opcode_lookup.get(self.opcode & 0x00FF, self.trap)()
 
-    def end_subroutine(self):
+    @operands('general', 'nnn')
+    def jump_to_address(self, general, nnn_value):
         """
-        Limpia la pantalla
-        El flujo del programa se devuelve a la instrucción que llamó a la subrutina
+        Salta a la dirección de memoria especificada por los últimos 3 bits de la instrucción
         """
-        if self.opcode & 0x000F == 0xE:
-            self.registers['pc'] = self.registers['stack'][self.registers['sp']]
-            self.registers['sp'] = self.registers['sp'] - 1
-
-        mnemonic = "RET"
-        human = "PC <= " + str(self.registers['stack'][self.registers['sp']]) + ", sp <= " + str(self.registers['sp'])
-        result = "PC <= " + str(self.registers['stack'][self.registers['sp']]) + ", sp <= " + str(self.registers['sp'])
-
-        return (mnemonic, human, result)
+        if general == 0xB:
+            self.registers.pc = nnn_value + self.registers.v[0]
+        else:
+            self.registers.pc = nnn_value
 
-    def add_nn_to_vx_no_flag(self):
+    @operands('x', 'nn')
+    def set_vx_to_nn(self, vx_register, nn_value):
         """
-        Suma a Vx nn sin establecer la bandera en caso de overflow
+        Establece el valor de Vx a nn
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
+        self.registers.v[vx_register] = nn_value
 
-        self.registers['v'][vx_register] = numpy.add(self.registers['v'][vx_register], numpy.uint8(self.opcode & 0x00FF))
+    @operands('x', 'nn')
+    def skip_if_vx_equals_nn(self, vx_register, nn_value):
+        """
+        Si Vx es igual a nn saltamos la siguiente instrucción
+        """
+        registers = self.registers
+        if registers.v[vx_register] == nn_value:
+            registers.pc += 2
 
-        mnemonic = "ADD V" + str(vx_register) + ", " + str(self.opcode & 0x00FF)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " + " + str(self.opcode & 0x00FF)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+    @operands('x', 'nn')
+    def skip_if_vx_not_equals_nn(self, vx_register, nn_value):
+        """
+        Si Vx es desigual a nn saltamos la siguiente instrucción.
+        """
+        registers = self.registers
+        if registers.v[vx_register] != nn_value:
+            registers.pc += 2
 
-        return (mnemonic, human, result)
+    @operands('x', 'y')
+    def skip_if_vx_equals_vy(self, vx_register, vy_register):
+        """
+        Si Vx es igual a Vy saltamos la siguiente instrucción.
+        """
+        registers = self.registers
+        if registers.v[vx_register] == registers.v[vy_register]:
+            registers.pc += 2
 
-    def add_vy_to_vx(self):
+    @operands('x', 'y')
+    def skip_if_vx_not_equals_vy(self, vx_register, vy_register):
         """
-        Suma Vy a Vx. Si llevamos un bit establecemos la bandera a 1
+        Si Vx es desigual a Vy saltamos la siguiente instrucción.
         """
-        self.registers['v'][0xf] = numpy.uint8(0)  # No borrow
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        registers = self.registers
+        if registers.v[vx_register] != registers.v[vy_register]:
+            registers.pc += 2
 
-        resultado = numpy.add(self.registers['v'][vx_register], self.registers['v'][vy_register])
+    @operands('nnn')
+    def set_i_to_address(self, nnn_value):
+        """
+        Asigna a I nnn (?)
+        """
+        self.registers.I = nnn_value
 
-        if (int(self.registers['v'][vx_register ]) + int(self.registers['v'][vy_register])) > 255:
-            self.registers['v'][0xf] = numpy.uint8(1)  # Borrow
-        self.registers['v'][vx_register] = resultado
+    @operands('x', 'nn')
+    def set_vx_bitwise_random(self, vx_register, nn_value):
+        """
+        Bitwise random number with nnn and set result to Vx
+        """
+        random_number = self.rng.next_byte()
+        self.last_random = random_number
+        self.registers.v[vx_register] = random_number & nn_value
 
-        mnemonic = "ADD V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " + V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+    @operands('x', 'y')
+    def set_vx_to_vy(self, vx_register, vy_register):
+        """
+        Establece el valor de Vy a Vx
+        """
+        v = self.registers.v
+        v[vx_register] = v[vy_register]
 
-        return (mnemonic, human, result)
+    @operands('x', 'y')
+    def set_vx_to_vx_or_vy(self, vx_register, vy_register):
+        """
+        Realiza la operación OR sobre Vx y Vy y guarda el valor en Vx
+        """
+        v = self.registers.v
+        v[vx_register] |= v[vy_register]
 
-    def subtract_vx_minus_vy(self):
+    @operands('x', 'y')
+    def set_vx_to_vx_and_vy(self, vx_register, vy_register):
         """
-        Resta Vy a Vx. Si llevamos un bit establecemos la bandera a 1
+        Realiza la operación AND sobre Vx y Vy y guarda el valor en Vx
         """
-        self.registers['v'][0xf] = numpy.uint8(0)  # No borrow
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        v = self.registers.v
+        v[vx_register] &= v[vy_register]
 
-        resultado = numpy.subtract(self.registers['v'][vx_register], self.registers['v'][vy_register])
+    @operands('x', 'y')
+    def set_vx_to_vx_xor_vy(self, vx_register, vy_register):
+        """
+        Realiza la operación XOR sobre Vx y Vy y guarda el valor en Vx
+        """
+        v = self.registers.v
+        v[vx_register] ^= v[vy_register]
 
-        if (int(self.registers['v'][vx_register]) - int(self.registers['v'][vy_register])) < 0:
-            self.registers['v'][0xf] = numpy.uint8(1) # Borrow
-        self.registers['v'][vx_register] = resultado
+    @operands('nnn')
+    def call_subroutine(self, nnn_value):
+        """
+        Llama a la subrutina en nnn.
+        """
+        registers = self.registers
+        registers.stack[registers.sp] = registers.pc + 2  # Saltamos a la siguiente instrucción.
+        registers.sp += 1
+        registers.pc = nnn_value
 
-        mnemonic = "SUB V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " - V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+    @operands('nnn')
+    def end_subroutine(self, nnn_value):
+        """
+        Limpia la pantalla
+        El flujo del programa se devuelve a la instrucción que llamó a la subrutina
+        """
+        if nnn_value & 0x000F == 0xE:
+            registers = self.registers
+            registers.pc = registers.stack[registers.sp]
+            registers.sp -= 1
+        elif nnn_value == 0x0E0:
+            self.framebuffer.clear()
 
-        return (mnemonic, human, result)
+    @operands('x', 'y', 'n')
+    def draw_sprite(self, vx_register, vy_register, n_value):
+        """
+        Dibuja en (Vx, Vy) el sprite de n filas almacenado en I. VF indica si se ha borrado algun pixel
+        """
+        registers = self.registers
+        self.check_memory_range(registers.I + n_value)
+        sprite = self.memory[registers.I:registers.I + n_value]
+        registers.v[0xf] = self.framebuffer.draw_sprite(registers.v[vx_register], registers.v[vy_register], sprite)
 
-    def subtract_vy_minus_vx(self):
+    @operands('x', 'nn')
+    def add_nn_to_vx_no_flag(self, vx_register, nn_value):
         """
-        Resta Vx a Vy. Si llevamos un bit establecemos la bandera a 1
+        Suma a Vx nn sin establecer la bandera en caso de overflow
         """
-        self.registers['v'][0xf] = numpy.uint8(0)  # No borrow
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
+        v = self.registers.v
+        v[vx_register] = (v[vx_register] + nn_value) & 0xFF
 
-        resultado = numpy.subtract(self.registers['v'][vy_register], self.registers['v'][vx_register])
+    @operands('x', 'y')
+    def add_vy_to_vx(self, vx_register, vy_register):
+        """
+        Suma Vy a Vx. Si llevamos un bit establecemos la bandera a 1
+        """
+        v = self.registers.v
+        v[0xf] = 0  # No borrow
+        resultado = v[vx_register] + v[vy_register]
 
-        if (int(self.registers['v'][vy_register]) - int(self.registers['v'][vx_register])) < 0:
-            self.registers['v'][0xf] = numpy.uint8(1)  # Borrow
-        self.registers['v'][vx_register] = resultado
+        v[0xf] = resultado >> 8  # Borrow si el resultado no cabe en 8 bits
+        v[vx_register] = resultado & 0xFF
 
-        mnemonic = "SUB V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vy_register) + " <= V" + str(vx_register) + " - V" + str(vy_register)
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+    @operands('x', 'y')
+    def subtract_vx_minus_vy(self, vx_register, vy_register):
+        """
+        Resta Vy a Vx. Si llevamos un bit establecemos la bandera a 1
+        """
+        v = self.registers.v
+        v[0xf] = 0  # No borrow
+        resultado = v[vx_register] - v[vy_register]
 
-        return (mnemonic, human, result)
+        v[0xf] = resultado < 0  # Borrow
+        v[vx_register] = resultado & 0xFF
 
-    def store_least_bit_right_shift(self):
+    @operands('x', 'y')
+    def subtract_vy_minus_vx(self, vx_register, vy_register):
         """
-        Almacena el bit menos significativo de Vy en VF y luego desplaza el valor de Vy un bit a la der
+        Resta Vx a Vy. Si llevamos un bit establecemos la bandera a 1
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
-
-        self.registers['v'][0xf] = self.registers['v'][vy_register] & 0x0F
-        self.registers['v'][vx_register] = self.registers['v'][vx_register] >> 1
+        v = self.registers.v
+        v[0xf] = 0  # No borrow
+        resultado = v[vy_register] - v[vx_register]
 
-        mnemonic = "SHR V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " >> 1"
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+        v[0xf] = resultado < 0  # Borrow
+        v[vx_register] = resultado & 0xFF
 
-        return (mnemonic, human, result)
+    @operands('x', 'y')
+    def store_least_bit_right_shift(self, vx_register, vy_register):
+        """
+        Almacena el bit menos significativo de Vy en VF y luego desplaza el valor de Vy un bit a la der
+        """
+        v = self.registers.v
+        v[0xf] = v[vy_register] & 0x0F
+        v[vx_register] = v[vx_register] >> 1
 
-    def store_most_bit_left_shift(self):
+    @operands('x', 'y')
+    def store_most_bit_left_shift(self, vx_register, vy_register):
         """
         Almacena el bit más significativo de Vy en VF y luego desplaza el valor de Vy un bit a la izq
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        vy_register = (self.opcode & 0x00F0) >> 4
-
-        self.registers['v'][0xf] = (self.registers['v'][vy_register] & 0xF0) >> 4
-        self.registers['v'][vx_register] = self.registers['v'][vx_register] << 1
-
-        mnemonic = "SHL V" + str(vx_register) + ", V" + str(vy_register)
-        human = "V" + str(vx_register) + " <= V" + str(vx_register) + " << 1"
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
+        v = self.registers.v
+        v[0xf] = (v[vy_register] & 0xF0) >> 4
+        v[vx_register] = (v[vx_register] << 1) & 0xFF
 
-        return (mnemonic, human, result)
-
-    def set_vx_to_delay_timer(self):
+    @operands('x')
+    def set_vx_to_delay_timer(self, vx_register):
         """
         Asigna a Vx el valor de delay_timer
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-
-        self.registers['v'][vx_register] = self.timers['delay_timer']
+        self.registers.v[vx_register] = self.timers['delay_timer']
 
-        mnemonic = "LD V" + str(vx_register) + ", DT"
-        human = "V" + str(vx_register) + "<= DT"
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
-
-        return (mnemonic, human, result)
-
-    def set_sound_timer_to_vx(self):
+    @operands('x')
+    def set_sound_timer_to_vx(self, vx_register):
         """
         Establece sound_timer al valor de Vx
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-
-        self.timers['sound_timer'] = self.registers['v'][vx_register]
-
-        mnemonic = "LD V" + str(vx_register) + ", ST"
-        human = "V" + str(vx_register) + "<= ST"
-        result = "V" + str(vx_register) + " = " + str(self.registers['v'][vx_register])
-
-        return (mnemonic, human, result)
+        self.timers['sound_timer'] = self.registers.v[vx_register]
 
-    def add_vx_to_i(self):
+    @operands('x')
+    def add_vx_to_i(self, vx_register):
         """
         Suma Vx a I y establece la bandera si se produce un overflow
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-        self.registers['v'][0xf] = numpy.uint8(0)  # No overflow
+        registers = self.registers
+        registers.v[0xf] = 0  # No overflow
+        resultado = registers.I + registers.v[vx_register]
 
-        resultado = numpy.add(self.registers['I'], self.registers['v'][vx_register])
+        registers.v[0xf] = resultado >> 16  # Overflow si el resultado no cabe en 16 bits
+        registers.I = resultado & 0xFFFF
 
-        if resultado < (int(self.registers['I']) + int(self.registers['v'][vx_register])):
-            self.registers['v'][0xf] = numpy.uint8(1)  # Overflow
-        self.registers['I'] = resultado
-
-        return ("NOT IMPLEMENTED", "NOT IMPLEMENTED", "NOT IMPLEMENTED")
-
-    def dump_or_load_v_registers_to_memory_or_set_timer(self):
+    @operands('x', 'y')
+    def dump_or_load_v_registers_to_memory_or_set_timer(self, vx_register, dump_or_load_or_set):
         """
         Almacena o carga los valores de los registros en/de la memoria
         """
-        dump_or_load_or_set = (self.opcode & 0x00F0) >> 4
-        vx_register = (self.opcode & 0x0F00) >> 8
+        registers = self.registers
+        end = registers.I + vx_register + 1
 
         if dump_or_load_or_set == 5:
-            for index, register in enumerate(range(0x0, vx_register + 1)):
-                self.memory[self.registers['I'] + index] = self.registers['v'][register]
+            self.check_memory_range(end)
+            self.memory[registers.I:end] = registers.v[:vx_register + 1]
+            self.invalidate(registers.I, vx_register + 1)
         if dump_or_load_or_set == 6:
-            for index, register in enumerate(range(0x0, vx_register + 1)):
-                self.registers['v'][register] = self.memory[self.registers['I'] + index]
+            self.check_memory_range(end)
+            registers.v[:vx_register + 1] = self.memory[registers.I:end]
         if dump_or_load_or_set == 1:
-            self.timers['delay_timer'] = self.registers['v'][vx_register]
-
-        return ("NOT IMPLEMENTED", "NOT IMPLEMENTED", "NOT IMPLEMENTED")
+            self.timers['delay_timer'] = registers.v[vx_register]
 
-    def store_bcd_in_memory(self):
+    @operands('x')
+    def store_bcd_in_memory(self, vx_register):
         """
         Guarda en memoria la representacion del numero Vx
         """
-        vx_register = (self.opcode & 0x0F00) >> 8
-
-        self.memory[self.registers['I']] = (self.registers['v'][vx_register] & 0xF00) >> 8
-        self.memory[self.registers['I'] + 1] = (self.registers['v'][vx_register] & 0x0F0) >> 4
-        self.memory[self.registers['I'] + 2] = (self.registers['v'][vx_register] & 0x00F)
-
-        return ("NOT IMPLEMENTED", "NOT IMPLEMENTED", "NOT IMPLEMENTED")
+        registers = self.registers
+        value = registers.v[vx_register]
+
+        self.memory[registers.I] = (value & 0xF00) >> 8
+        self.memory[registers.I + 1] = (value & 0x0F0) >> 4
+        self.memory[registers.I + 2] = (value & 0x00F)
+        self.invalidate(registers.I, 3)
+
+    @operands('x')
+    def skip_if_key_pressed(self, vx_register):
+        """
+        Si la tecla con el valor de Vx esta pulsada saltamos la siguiente instrucción
+        """
+        registers = self.registers
+        if self.keypad.is_pressed(registers.v[vx_register], self.cycles):
+            registers.pc += 2
+
+    @operands('x')
+    def skip_if_key_not_pressed(self, vx_register):
+        """
+        Si la tecla con el valor de Vx no esta pulsada saltamos la siguiente instrucción
+        """
+        registers = self.registers
+        if not self.keypad.is_pressed(registers.v[vx_register], self.cycles):
+            registers.pc += 2
+
+    @operands('x')
+    def wait_for_key(self, vx_register):
+        """
+        Espera a que se pulse una tecla y guarda su valor en Vx.
+        Mientras no llega, la CPU queda aparcada en esta instruccion sin ejecutar nada: el tiempo emulado
+        avanza de golpe hasta el siguiente evento programado o hasta el limite del run() o run_until() en curso.
+        """
+        keypad = self.keypad
+        registers = self.registers
+        key = keypad.take_key(self.cycles)
+        if key is not None:
+            registers.v[vx_register] = key
+            self.parked = False
+            return
+
+        registers.pc -= 2
+        self.parked = True
+        target = self.run_limit
+        if keypad.events:
+            # Se vuelve a ejecutar FX0A justo en el ciclo del siguiente evento
+            event_cycle = keypad.next_event_cycle()
+            if event_cycle is None:
+                target = self.cycles
+            elif target is None or event_cycle - 1 < target:
+                target = event_cycle - 1
+        if target is not None and target > self.cycles:
+            self.idle_cycles += target - self.cycles
+            self.cycles = target
+
+    def check_memory_range(self, end):
+        # Las copias por bloques no deben salirse de la memoria: un slice fuera de rango cambiaria su tamaño
+        if end > MAX_MEMORY:
+            raise IndexError("Memory access at " + hex(end - 1) + " is out of range")
@@ -0,0 +1,47 @@
+from Config import FRAME_RATE, UNLIMITED_FRAME_CYCLES
+from time import perf_counter, sleep
+
+
+class FrameClock:
+    """
+    Reparte la velocidad de reloj de la CPU en fotogramas de 1/60 s.
+
+    La CPU ejecuta de golpe los ciclos de cada fotograma y despues se espera (sin bucle activo)
+    hasta el comienzo del siguiente, de forma que la sincronizacion solo cuesta una llamada por fotograma.
+    """
+
+    def __init__(self, clock_speed, frame_rate=FRAME_RATE):
+        """
+        :param clock_speed: instrucciones por segundo. 0 ejecuta sin limite de velocidad
+        :param frame_rate: fotogramas por segundo
+        """
+        self.clock_speed = clock_speed
+        self.frame_rate = frame_rate
+        self.frame_time = 1.0 / frame_rate
+        self.remainder = 0
+        self.next_frame = perf_counter() + self.frame_time
+
+    def cycles_per_frame(self):
+        """
+        :return: ciclos a ejecutar en el siguiente fotograma. Las fracciones se acumulan entre fotogramas
+        """
+        if self.clock_speed <= 0:
+            return UNLIMITED_FRAME_CYCLES
+        total = self.clock_speed + self.remainder
+        self.remainder = total % self.frame_rate
+        return total // self.frame_rate
+
+    def wait(self):
+        """
+        Duerme hasta el comienzo del siguiente fotograma
+        """
+        if self.clock_speed <= 0:
+            return
+
+        now = perf_counter()
+        if self.next_frame > now:
+            sleep(self.next_frame - now)
+        elif now - self.next_frame > self.frame_time:
+            # Vamos con mas de un fotograma de retraso: no intentamos recuperarlo de golpe
+            self.next_frame = now
+        self.next_frame += self.frame_time
@@ -1,3 +1,4 @@
+import os
 
 
 #Memoria total del emulador
@@ -5,4 +6,68 @@ MAX_MEMORY = 4096
 #Empezamos en 0x200 ya que los primeros 512 bytes de memoria son ocupados por el intérprete. Allí será donde almacenaremos la fuente a usar.
 PROGRAM_COUNTER_START = 0#0x200
 
-DEBUG = False
\ No newline at end of file
+DEBUG = False
+
+#Ejecuta bloques basicos recompilados en lugar de instruccion a instruccion
+DYNAREC = False
+
+#Fotogramas por segundo: la CPU se sincroniza con el reloj una vez por fotograma
+FRAME_RATE = 60
+#Instrucciones por fotograma cuando no se limita la velocidad de la CPU
+UNLIMITED_FRAME_CYCLES = 10000
+
+#Velocidad de reloj emulada (instrucciones por segundo) usada para calcular el avance de los temporizadores
+CLOCK_SPEED = 500
+#Los temporizadores delay y sound descuentan 60 veces por segundo
+TIMER_FREQUENCY = 60
+
+#Carpeta donde se guardan las ROM en formato texto ('01100001 ...') ya convertidas a binario
+ROM_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'second')
+
+#Numero de instrucciones que guarda la traza del interfaz
+TRACE_CAPACITY = 4096
+#Redibujados por segundo del grid de instrucciones (npyscreen admite como maximo 10)
+TRACE_REFRESH_RATE = 10
+
+#Resolucion de la pantalla en pixeles
+SCREEN_WIDTH = 64
+SCREEN_HEIGHT = 32
+
+#Ciclos maximos por ROM en las ejecuciones por lotes (Batch.py)
+BATCH_CYCLES = 1000000
+#Extension de los volcados de registros esperados en las ejecuciones por lotes
+DUMP_EXTENSION = '.dump'
+
+#Tamaño en bytes de las paginas de memoria que comparten las instantaneas (Snapshot.py)
+SNAPSHOT_PAGE_SIZE = 256
+
+#Instrucciones que se pueden deshacer con el diario de depuracion (Journal.py)
+JOURNAL_CAPACITY = 100000
+
+#Instrucciones por bloque que escribe de una vez la traza binaria (TraceFile.py)
+TRACE_CHUNK_RECORDS = 65536
+
+#Bytes aleatorios que se generan de una vez para la instruccion RND (Rng.py)
+RANDOM_BUFFER_SIZE = 256
+
+#Resultados de referencia de Benchmark.py y perdida de rendimiento media admitida respecto a ellos (0.2 = 20%)
+BENCHMARK_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+BENCHMARK_THRESHOLD = 0.2
+
+#Perdida admitida en una sola medida: cada una varia mucho entre ejecuciones (1.0 = el doble de lenta)
+BENCHMARK_ENTRY_THRESHOLD = 1.0
+
+#Salta los bucles de espera (JP a si mismo, LD Vx, DT / SE Vx, NN / JP) en lugar de ejecutarlos
+IDLE_FAST_FORWARD = True
+
+#Ejecuta como una sola instruccion las parejas habituales (LD/ADD, LD I/LD [I], ADD/SE VF) en el bucle sin ganchos
+FUSE_INSTRUCTIONS = True
+
+#Teclas del PC que corresponden a las teclas 0x0-0xF del teclado hexadecimal (disposicion 1234/QWER/ASDF/ZXCV)
+KEYPAD_LAYOUT = 'x123qweasdzc4rfv'
+
+#Segundos que se mantiene pulsada una tecla del teclado hexadecimal desde el terminal, que no avisa al soltarla (main.py)
+TERMINAL_KEY_HOLD = 0.1
+
+#Segundos como maximo que el proceso de la CPU espera una tecla o la orden de continuar sin comprobar si debe terminar (main.py)
+WAIT_TIMEOUT = 0.1
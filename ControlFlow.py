@@ -0,0 +1,259 @@
+"""
+Desensamblado estatico de una ROM completa y grafo de flujo de control.
+
+Recorre el programa desde el PC de entrada siguiendo los saltos (JP), las llamadas (CALL) y los saltos
+condicionales (SE/SNE/SKP/SKNP), sin ejecutar nada. El resultado es un grafo de bloques basicos con el texto de
+cada instruccion alcanzable ya formateado, de forma que el listado completo se puede mostrar de una vez.
+
+Los destinos que solo se conocen en tiempo de ejecucion (RET, JP V0, codigo que se modifica a si mismo)
+no se siguen: sus direcciones quedan en ControlFlowGraph.dynamic.
+
+El analisis se guarda en ROM_CACHE_DIR con el hash de la memoria y del PC de entrada como nombre, igual
+que las ROM en texto de Rom.py.
+
+    python ControlFlow.py rom [-e ENTRADA]
+"""
+from Config import MAX_MEMORY, PROGRAM_COUNTER_START, ROM_CACHE_DIR
+from Disassembler import disassemble, instruction_kind
+from hashlib import sha1
+import argparse
+import json
+import os
+import Rom
+
+FORMAT_VERSION = 1
+
+CONDITIONAL_KINDS = {'SE_NN', 'SNE_NN', 'SE_VY', 'SNE_VY', 'SKP', 'SKNP'}
+# Instrucciones cuyo destino depende del estado de la CPU
+DYNAMIC_KINDS = {'RET', 'JP_V0'}
+
+
+def successors(address, opcode):
+    """
+    Direcciones a las que puede pasar el programa tras ejecutar opcode en address
+
+    :return: lista de direcciones; vacia si el programa se detiene o el destino no se conoce
+    """
+    kind = instruction_kind(opcode)
+    nnn = opcode & 0x0FFF
+
+    if kind == 'JP':
+        return [nnn]
+    if kind == 'CALL':
+        # HertzCPU apila PC + 2: la subrutina vuelve dos bytes despues de la instruccion siguiente
+        return [nnn, address + 4]
+    if kind in CONDITIONAL_KINDS:
+        return [address + 2, address + 4]
+    if kind in DYNAMIC_KINDS or kind == 'UNKNOWN' or opcode == 0x0000:
+        return []
+    return [address + 2]
+
+
+class Block:
+    """
+    Bloque basico: instrucciones que siempre se ejecutan seguidas, desde start hasta end (sin incluir)
+    """
+
+    def __init__(self, start, instructions, successors):
+        self.start = start
+        self.instructions = instructions
+        self.successors = successors
+
+    @property
+    def end(self):
+        return self.instructions[-1][0] + 2
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def __repr__(self):
+        return 'Block(' + hex(self.start) + '-' + hex(self.end) + ' -> ' + str([hex(s) for s in self.successors]) + ')'
+
+
+class ControlFlowGraph:
+
+    def __init__(self, entry, blocks, subroutines, dynamic, rows):
+        self.entry = entry
+        # Bloques indexados por su primera direccion
+        self.blocks = blocks
+        self.subroutines = subroutines
+        self.dynamic = dynamic
+        # Direccion -> (opcode, mnemonic, human) de cada instruccion alcanzable
+        self.rows = rows
+        self.owners = {}
+        for block in blocks.values():
+            for address, _ in block.instructions:
+                self.owners[address] = block.start
+
+    @classmethod
+    def analyze(cls, memory, entry=PROGRAM_COUNTER_START):
+        """
+        Recorre la memoria desde entry y construye el grafo
+
+        :param memory: imagen completa de la memoria (bytearray)
+        :param entry: direccion de la primera instruccion
+        :return: ControlFlowGraph
+        """
+        opcodes = {}
+        leaders = {entry}
+        subroutines = set()
+        dynamic = set()
+        pending = [entry]
+
+        while pending:
+            address = pending.pop()
+            if address in opcodes or not 0 <= address < MAX_MEMORY - 1:
+                continue
+            opcode = memory[address] << 8 | memory[address + 1]
+            opcodes[address] = opcode
+
+            targets = successors(address, opcode)
+            kind = instruction_kind(opcode)
+            if kind == 'CALL':
+                subroutines.add(targets[0])
+            elif kind in DYNAMIC_KINDS:
+                dynamic.add(address)
+            if targets != [address + 2]:
+                # Cualquier instruccion que no sigue en la siguiente termina el bloque
+                leaders.update(targets)
+            pending.extend(targets)
+
+        blocks = {}
+        for start in sorted(leaders):
+            if start not in opcodes:
+                continue
+            instructions = []
+            address = start
+            while True:
+                opcode = opcodes[address]
+                instructions.append((address, opcode))
+                targets = successors(address, opcode)
+                if targets != [address + 2] or address + 2 in leaders or address + 2 not in opcodes:
+                    break
+                address += 2
+            blocks[start] = Block(start, instructions, [target for target in targets if target in opcodes])
+
+        rows = {
+            # Igual que en la traza, 0x0000 se muestra como HALT
+            address: (opcode, 'HALT', '') if opcode == 0x0000 else (opcode,) + disassemble(opcode)
+            for address, opcode in sorted(opcodes.items())
+        }
+        return cls(entry, blocks, sorted(subroutines), sorted(dynamic), rows)
+
+    @classmethod
+    def from_memory(cls, memory, entry=PROGRAM_COUNTER_START, cache_dir=ROM_CACHE_DIR):
+        """
+        Como analyze(), pero reutiliza el analisis guardado para la misma memoria y entrada si existe
+        """
+        key = sha1(bytes(memory) + entry.to_bytes(2, 'big')).hexdigest()
+        cache_file = os.path.join(cache_dir, key + '.cfg.json')
+        try:
+            with open(cache_file) as cached:
+                graph = cls.from_dict(json.load(cached))
+            if graph is not None:
+                return graph
+        except (OSError, ValueError):
+            pass
+
+        graph = cls.analyze(memory, entry)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Escribimos en un archivo temporal para que nunca se lea un analisis a medias
+            temporary_file = cache_file + '.' + str(os.getpid())
+            with open(temporary_file, 'w') as cached:
+                json.dump(graph.to_dict(), cached)
+            os.replace(temporary_file, cache_file)
+        except OSError:
+            pass  # Sin cache la ROM se analiza en cada carga
+
+        return graph
+
+    @classmethod
+    def from_rom(cls, rom, offset=PROGRAM_COUNTER_START, entry=None, cache_dir=ROM_CACHE_DIR):
+        """
+        Carga la ROM en una memoria vacia (como HertzCPU.load_rom) y la analiza
+
+        :param entry: direccion de entrada; por defecto offset
+        """
+        memory = bytearray(MAX_MEMORY)
+        Rom.load_rom(memory, rom, offset, cache_dir)
+        return cls.from_memory(memory, offset if entry is None else entry, cache_dir)
+
+    def to_dict(self):
+        return {
+            'version': FORMAT_VERSION,
+            'entry': self.entry,
+            'blocks': [[block.start, block.instructions, block.successors] for block in self.blocks.values()],
+            'subroutines': self.subroutines,
+            'dynamic': self.dynamic,
+            'rows': [[address] + list(row) for address, row in self.rows.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :return: ControlFlowGraph o None si data es de otra version del formato
+        """
+        if data.get('version') != FORMAT_VERSION:
+            return None
+        blocks = {
+            start: Block(start, [tuple(instruction) for instruction in instructions], successors)
+            for start, instructions, successors in data['blocks']
+        }
+        rows = {address: (opcode, mnemonic, human) for address, opcode, mnemonic, human in data['rows']}
+        return cls(data['entry'], blocks, data['subroutines'], data['dynamic'], rows)
+
+    def block_at(self, address):
+        """
+        :return: Block que contiene la instruccion en address, o None si no es alcanzable
+        """
+        start = self.owners.get(address)
+        return None if start is None else self.blocks[start]
+
+    def is_leader(self, address):
+        """
+        Indica si en address empieza un bloque basico
+        """
+        return address in self.blocks
+
+    def listing(self):
+        """
+        :return: filas (direccion, instruction, mnemonic, human) de todas las instrucciones alcanzables, en orden
+        """
+        return [(hex(address), hex(opcode), mnemonic, human) for address, (opcode, mnemonic, human) in self.rows.items()]
+
+    def label(self, address):
+        if address == self.entry:
+            return 'main'
+        if address in self.subroutines:
+            return 'sub_' + hex(address)
+        return 'block_' + hex(address)
+
+    def format_listing(self):
+        """
+        Listado de texto con una etiqueta delante de cada bloque basico
+        """
+        lines = []
+        for address, instruction, mnemonic, human in self.listing():
+            address = int(address, 16)
+            if address in self.blocks:
+                block = self.blocks[address]
+                targets = ', '.join(self.label(target) for target in block.successors)
+                lines.append(self.label(address) + ':' + ('  -> ' + targets if targets else ''))
+            lines.append('    {:<7} {:<8} {:<18} {}'.format(hex(address), instruction, mnemonic, human))
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Desensambla una ROM siguiendo su flujo de control')
+    parser.add_argument('rom')
+    parser.add_argument('-o', '--offset', dest='offset', type=lambda address: int(address, 0), default=PROGRAM_COUNTER_START)
+    parser.add_argument('-e', '--entry', dest='entry', type=lambda address: int(address, 0))
+    args = parser.parse_args()
+
+    graph = ControlFlowGraph.from_rom(args.rom, args.offset, args.entry)
+    print(graph.format_listing())
+    print()
+    print(str(len(graph.rows)) + ' instructions, ' + str(len(graph.blocks)) + ' blocks, ' +
+          str(len(graph.subroutines)) + ' subroutines, ' + str(len(graph.dynamic)) + ' dynamic jumps')
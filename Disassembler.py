@@ -0,0 +1,171 @@
+"""
+Traduccion de OPCODES a texto (Mnemonic, Human, Result)
+
+Las cadenas solo se construyen cuando alguien las pide, de forma que la CPU no
+pierde tiempo formateando texto mientras ejecuta instrucciones.
+"""
+
+# Cada tipo de instruccion tiene su plantilla (mnemonic, human, result) y el destino
+# cuyo valor se muestra en la columna Result una vez ejecutada la instruccion.
+FORMATS = {
+    'SYS': ("SYS {nnn}", "NOP", "", None),
+    'CLS': ("CLS", "SCREEN <= 0", "", None),
+    'RET': ("RET", "PC <= STACK[SP], SP <= SP - 1", "PC <= {value}, sp <= {sp}", 'pc'),
+    'JP': ("JP {nnn}", "PC <= {nnn}", "PC = {value}", 'pc'),
+    'CALL': ("CALL {nnn}", "PC <= {nnn}, STACK[SP] <= PC", "PC <= {value}, sp <= {sp}", 'pc'),
+    'SE_NN': ("SE V{x}, {nn}", "V{x} == {nn}", "{flag}", 'skip'),
+    'SNE_NN': ("SNE V{x}, {nn}", "V{x} != {nn}", "{flag}", 'skip'),
+    'SE_VY': ("SE V{x}, V{y}", "V{x} == V{y}", "{flag}", 'skip'),
+    'LD_NN': ("LD V{x}, {nn}", "V{x} <= {nn}", "V{x} = {value}", 'vx'),
+    'ADD_NN': ("ADD V{x}, {nn}", "V{x} <= V{x} + {nn}", "V{x} = {value}", 'vx'),
+    'LD_VY': ("LD V{x}, V{y}", "V{x} <= V{y}", "V{x} = {value}", 'vx'),
+    'OR': ("OR V{x}, V{y}", "V{x} <= V{x} | V{y}", "V{x} = {value}", 'vx'),
+    'AND': ("AND V{x}, V{y}", "V{x} <= V{x} & V{y}", "V{x} = {value}", 'vx'),
+    'XOR': ("XOR V{x}, V{y}", "V{x} <= V{x} ^ V{y}", "V{x} = {value}", 'vx'),
+    'ADD_VY': ("ADD V{x}, V{y}", "V{x} <= V{x} + V{y}", "V{x} = {value}", 'vx'),
+    'SUB': ("SUB V{x}, V{y}", "V{x} <= V{x} - V{y}", "V{x} = {value}", 'vx'),
+    'SHR': ("SHR V{x}, V{y}", "V{x} <= V{x} >> 1", "V{x} = {value}", 'vx'),
+    'SUBN': ("SUBN V{x}, V{y}", "V{x} <= V{y} - V{x}", "V{x} = {value}", 'vx'),
+    'SHL': ("SHL V{x}, V{y}", "V{x} <= V{x} << 1", "V{x} = {value}", 'vx'),
+    'SNE_VY': ("SNE V{x}, V{y}", "V{x} != V{y}", "{flag}", 'skip'),
+    'LD_I': ("LD I, {nnn}", "I <= {nnn}", "I = {value}", 'I'),
+    'JP_V0': ("JP V0, {nnn}", "PC <= V0 + {nnn}", "PC = {value}", 'pc'),
+    'RND': ("RND V{x}, {nn}", "V{x} <= {random} & {nn}", "V{x} = {value}", 'vx'),
+    'DRW': ("DRW V{x}, V{y}, {n}", "SCREEN <= SCREEN ^ [I..I+{n}]", "VF = {value}", 'vf'),
+    'LD_VX_DT': ("LD V{x}, DT", "V{x} <= DT", "V{x} = {value}", 'vx'),
+    'LD_DT_VX': ("LD DT, V{x}", "DT <= V{x}", "DT = {value}", 'delay_timer'),
+    'LD_I_VX': ("LD [I], V{x}", "[I..I+{x}] <= V0..V{x}", "I = {value}", 'I'),
+    'LD_VX_I': ("LD V{x}, [I]", "V0..V{x} <= [I..I+{x}]", "V{x} = {value}", 'vx'),
+    'NOP_F5': ("DW {opcode}", "NOP", "", None),
+    'LD_ST_VX': ("LD ST, V{x}", "ST <= V{x}", "ST = {value}", 'sound_timer'),
+    'ADD_I_VX': ("ADD I, V{x}", "I <= I + V{x}", "I = {value}", 'I'),
+    'LD_B_VX': ("LD B, V{x}", "[I..I+2] <= BCD(V{x})", "I = {value}", 'I'),
+    'SKP': ("SKP V{x}", "KEY[V{x}] pressed", "{flag}", 'skip'),
+    'SKNP': ("SKNP V{x}", "KEY[V{x}] not pressed", "{flag}", 'skip'),
+    'LD_VX_K': ("LD V{x}, K", "V{x} <= KEY", "V{x} = {value}", 'vx'),
+    'UNKNOWN': ("DW {opcode}", "", "", None),
+}
+
+LOGIC_KINDS = {
+    0x0: 'LD_VY', 0x1: 'OR', 0x2: 'AND', 0x3: 'XOR', 0x4: 'ADD_VY',
+    0x5: 'SUB', 0x6: 'SHR', 0x7: 'SUBN', 0xE: 'SHL'
+}
+
+# La CPU decodifica las instrucciones 0xF segun su ultimo nibble (Fx?5 segun el tercero)
+MISC_KINDS = {0x3: 'LD_B_VX', 0x7: 'LD_VX_DT', 0x8: 'LD_ST_VX', 0xA: 'LD_VX_K', 0xE: 'ADD_I_VX'}
+MISC_MEMORY_KINDS = {0x1: 'LD_DT_VX', 0x5: 'LD_I_VX', 0x6: 'LD_VX_I'}
+# Las instrucciones de teclado 0xE segun su ultimo byte
+KEY_KINDS = {0x9E: 'SKP', 0xA1: 'SKNP'}
+
+GENERAL_KINDS = {
+    0x1: 'JP', 0x2: 'CALL', 0x3: 'SE_NN', 0x4: 'SNE_NN', 0x5: 'SE_VY', 0x6: 'LD_NN',
+    0x7: 'ADD_NN', 0x9: 'SNE_VY', 0xA: 'LD_I', 0xB: 'JP_V0', 0xC: 'RND', 0xD: 'DRW'
+}
+
+
+def instruction_kind(opcode):
+    """
+    Clasifica un OPCODE siguiendo la misma decodificacion que HertzCPU
+
+    :param opcode: instruccion de 16 bits
+    :return: clave de FORMATS
+    """
+    general = (opcode & 0xF000) >> 12
+
+    if general == 0x0:
+        if opcode & 0x000F == 0xE:
+            return 'RET'
+        return 'CLS' if opcode == 0x00E0 else 'SYS'
+    if general == 0x8:
+        return LOGIC_KINDS.get(opcode & 0x000F, 'UNKNOWN')
+    if general == 0xE:
+        return KEY_KINDS.get(opcode & 0x00FF, 'UNKNOWN')
+    if general == 0xF:
+        if opcode & 0x000F == 0x5:
+            return MISC_MEMORY_KINDS.get((opcode & 0x00F0) >> 4, 'NOP_F5')
+        return MISC_KINDS.get(opcode & 0x000F, 'UNKNOWN')
+    return GENERAL_KINDS.get(general, 'UNKNOWN')
+
+
+def _operands(opcode):
+    return {
+        'opcode': hex(opcode),
+        'x': (opcode & 0x0F00) >> 8,
+        'y': (opcode & 0x00F0) >> 4,
+        'n': opcode & 0x000F,
+        'nn': opcode & 0x00FF,
+        'nnn': opcode & 0x0FFF
+    }
+
+
+def disassemble(opcode, random_number=None):
+    """
+    Columnas estaticas de una instruccion: no dependen del estado de la CPU
+
+    :param opcode: instruccion de 16 bits
+    :param random_number: numero aleatorio generado por RND, si se conoce
+    :return: (mnemonic, human)
+    """
+    mnemonic, human, _, _ = FORMATS[instruction_kind(opcode)]
+    fields = _operands(opcode)
+    fields['random'] = 'RND' if random_number is None else random_number
+    return mnemonic.format(**fields), human.format(**fields)
+
+
+def describe_result(opcode, value, sp=0):
+    """
+    Columna Result a partir del valor que ha dejado la instruccion en su destino
+
+    :param opcode: instruccion de 16 bits
+    :param value: nuevo valor del destino (en los saltos condicionales, si se ha saltado)
+    :param sp: puntero de pila tras ejecutar la instruccion
+    :return: result
+    """
+    result = FORMATS[instruction_kind(opcode)][2]
+    return result.format(value=value, sp=sp, flag=str(bool(value)), **_operands(opcode))
+
+
+def destination_value(cpu, opcode):
+    """
+    Lee del estado de la CPU el valor que la instruccion acaba de escribir
+
+    :param cpu: HertzCPU tras ejecutar opcode
+    :param opcode: instruccion ejecutada
+    :return: valor del destino
+    """
+    kind = instruction_kind(opcode)
+    destination = FORMATS[kind][3]
+    x = (opcode & 0x0F00) >> 8
+    registers = cpu.registers
+
+    if destination == 'vx':
+        return int(registers['v'][x])
+    if destination == 'vf':
+        return int(registers['v'][0xF])
+    if destination == 'skip':
+        # Los saltos condicionales no modifican registros: basta con repetir la comparacion
+        if kind in KEY_KINDS.values():
+            pressed = cpu.keypad.pressed[registers['v'][x] & 0xF] == 1
+            return int(pressed if kind == 'SKP' else not pressed)
+        y = (opcode & 0x00F0) >> 4
+        operand = opcode & 0x00FF if kind in ('SE_NN', 'SNE_NN') else registers['v'][y]
+        equals = registers['v'][x] == operand
+        return int(equals if kind in ('SE_NN', 'SE_VY') else not equals)
+    if destination in ('I', 'pc'):
+        return int(registers[destination])
+    if destination is not None:
+        return int(cpu.timers[destination])
+    return 0
+
+
+def describe(cpu):
+    """
+    Columnas (mnemonic, human, result) de la ultima instruccion ejecutada por la CPU
+
+    :param cpu: HertzCPU
+    :return: (mnemonic, human, result)
+    """
+    opcode = cpu.opcode
+    mnemonic, human = disassemble(opcode, cpu.last_random)
+    result = describe_result(opcode, destination_value(cpu, opcode), int(cpu.registers['sp']))
+    return mnemonic, human, result
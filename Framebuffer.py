@@ -0,0 +1,57 @@
+from Config import SCREEN_WIDTH, SCREEN_HEIGHT
+import numpy
+
+
+class Framebuffer:
+    """
+    Contenido de la pantalla en memoria: un array de 0/1 con una fila por cada linea de pixeles.
+    No depende de pygame, por lo que funciona sin pantalla.
+
+    Cada fila lleva una marca de modificada para que la pantalla solo tenga que redibujar
+    las lineas que han cambiado desde el ultimo fotograma.
+    """
+
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.width = width
+        self.height = height
+        self.pixels = numpy.zeros((height, width), dtype=numpy.uint8)
+        self.dirty = numpy.ones(height, dtype=numpy.bool_)
+
+    def clear(self):
+        self.pixels.fill(0)
+        self.dirty.fill(True)
+
+    def get_pixel(self, x_pos, y_pos):
+        return int(self.pixels[y_pos % self.height, x_pos % self.width])
+
+    def set_pixel(self, x_pos, y_pos, pixel_state):
+        self.pixels[y_pos % self.height, x_pos % self.width] = pixel_state
+        self.dirty[y_pos % self.height] = True
+
+    def draw_sprite(self, x_pos, y_pos, sprite):
+        """
+        Dibuja un sprite mediante XOR. Los pixeles que se salen de la pantalla aparecen por el lado contrario.
+
+        :param sprite: bytes del sprite, uno por fila (8 pixeles de ancho)
+        :return: 1 si algun pixel encendido se ha apagado (colision), 0 en caso contrario
+        """
+        bits = numpy.unpackbits(numpy.frombuffer(bytes(sprite), dtype=numpy.uint8)).reshape(-1, 8)
+        rows = (y_pos + numpy.arange(bits.shape[0])) % self.height
+        columns = (x_pos + numpy.arange(8)) % self.width
+        area = numpy.ix_(rows, columns)
+
+        region = self.pixels[area]
+        collision = (region & bits).any()
+        self.pixels[area] = region ^ bits
+        self.dirty[rows] = True
+        return int(collision)
+
+    def dirty_spans(self):
+        """
+        Devuelve los bloques de filas modificadas y las marca como limpias
+
+        :return: lista de (primera fila, ultima fila + 1)
+        """
+        edges = numpy.flatnonzero(numpy.diff(self.dirty, prepend=False, append=False))
+        self.dirty.fill(False)
+        return [(int(start), int(stop)) for start, stop in zip(edges[0::2], edges[1::2])]
@@ -0,0 +1,206 @@
+"""
+Diario para deshacer instrucciones (depuracion hacia atras).
+
+Antes de ejecutar cada instruccion se guarda solo lo que esta puede sobrescribir: PC, SP, I, Vx y VF
+en columnas de arrays paralelas, y en una zona auxiliar de 16 bytes por entrada los bytes de memoria
+de Fx55/Fx33, los registros de Fx65, la entrada de la pila de CALL o los temporizadores. Las pantallas
+borradas por CLS y el estado del teclado de EX9E/EXA1/FX0A se guardan aparte porque son raros; DRW no
+necesita nada, basta con volver a dibujar el sprite (XOR). El contador de ciclos se guarda en cada
+entrada porque FX0A puede adelantarlo mas de un ciclo.
+
+El diario es circular: solo se pueden deshacer las ultimas capacity instrucciones. El generador
+aleatorio no se rebobina.
+"""
+from Config import JOURNAL_CAPACITY
+from Disassembler import instruction_kind
+from Timers import TIMER_NAMES
+from array import array
+import numpy
+import struct
+
+SIDE_SIZE = 16
+
+# Datos auxiliares que necesita cada tipo de instruccion
+NO_SIDE, SIDE_MEMORY, SIDE_BCD, SIDE_REGISTERS, SIDE_STACK, SIDE_DELAY, SIDE_SOUND, SIDE_SCREEN, SIDE_SPRITE, \
+    SIDE_KEYPAD = range(10)
+
+SIDE_KINDS = {
+    'LD_I_VX': SIDE_MEMORY,
+    'LD_B_VX': SIDE_BCD,
+    'LD_VX_I': SIDE_REGISTERS,
+    'CALL': SIDE_STACK,
+    'LD_DT_VX': SIDE_DELAY,
+    'LD_ST_VX': SIDE_SOUND,
+    'CLS': SIDE_SCREEN,
+    'DRW': SIDE_SPRITE,
+    'SKP': SIDE_KEYPAD,
+    'SKNP': SIDE_KEYPAD,
+    'LD_VX_K': SIDE_KEYPAD,
+}
+
+TIMER = struct.Struct('<BQ')
+
+side_table = None
+
+
+def build_side_table():
+    """
+    :return: array con el tipo de datos auxiliares de cada uno de los 65536 OPCODES
+    """
+    return array('B', (SIDE_KINDS.get(instruction_kind(opcode), NO_SIDE) for opcode in range(0x10000)))
+
+
+class UndoJournal:
+
+    def __init__(self, cpu, capacity=JOURNAL_CAPACITY):
+        global side_table
+        if side_table is None:
+            side_table = build_side_table()
+        self.side_table = side_table
+
+        self.cpu = cpu
+        self.capacity = capacity
+        self.opcodes = array('H', [0] * capacity)
+        self.pcs = array('H', [0] * capacity)
+        self.sps = array('h', [0] * capacity)
+        self.Is = array('H', [0] * capacity)
+        self.cycles = array('Q', [0] * capacity)
+        self.vxs = bytearray(capacity)
+        self.vfs = bytearray(capacity)
+        self.side = bytearray(capacity * SIDE_SIZE)
+        # Pantallas guardadas por CLS indexadas por su entrada
+        self.screens = {}
+        # Estado del teclado antes de EX9E/EXA1/FX0A: (state(), eventos que va a aplicar, parked)
+        self.keypads = {}
+        # Entradas escritas en total y primera que todavia se puede deshacer
+        self.count = 0
+        self.oldest = 0
+
+    def __len__(self):
+        return self.count - self.oldest
+
+    def record(self, opcode):
+        """
+        Guarda lo que va a sobrescribir la instruccion opcode, que aun no se ha ejecutado
+        """
+        cpu = self.cpu
+        registers = cpu.registers
+        slot = self.count % self.capacity
+        self.count += 1
+        if self.count - self.oldest > self.capacity:
+            self.oldest += 1
+
+        self.opcodes[slot] = opcode
+        self.pcs[slot] = registers.pc
+        self.sps[slot] = registers.sp
+        self.Is[slot] = registers.I
+        self.cycles[slot] = cpu.cycles
+        v = registers.v
+        self.vxs[slot] = v[(opcode & 0x0F00) >> 8]
+        self.vfs[slot] = v[0xF]
+
+        if self.screens:
+            self.screens.pop(slot, None)
+        if self.keypads:
+            self.keypads.pop(slot, None)
+
+        side = self.side_table[opcode]
+        if side == NO_SIDE or side == SIDE_SPRITE:
+            return
+
+        offset = slot * SIDE_SIZE
+        if side == SIDE_MEMORY or side == SIDE_BCD:
+            length = 3 if side == SIDE_BCD else ((opcode & 0x0F00) >> 8) + 1
+            data = cpu.memory[registers.I:registers.I + length]
+            self.side[offset:offset + len(data)] = data
+        elif side == SIDE_REGISTERS:
+            self.side[offset:offset + SIDE_SIZE] = v
+        elif side == SIDE_STACK:
+            if 0 <= registers.sp < len(registers.stack):
+                struct.pack_into('<H', self.side, offset, registers.stack[registers.sp])
+        elif side == SIDE_SCREEN:
+            self.screens[slot] = numpy.packbits(cpu.framebuffer.pixels).tobytes()
+        elif side == SIDE_KEYPAD:
+            # La instruccion lee el teclado con el contador de ciclos ya incrementado
+            keypad = cpu.keypad
+            self.keypads[slot] = keypad.state(), keypad.due(cpu.cycles + 1), cpu.parked
+        else:
+            name = TIMER_NAMES[0] if side == SIDE_DELAY else TIMER_NAMES[1]
+            TIMER.pack_into(self.side, offset, cpu.timers.values[name], cpu.timers.set_at[name])
+
+    def undo(self):
+        """
+        Deshace la ultima instruccion registrada
+        """
+        self.count -= 1
+        slot = self.count % self.capacity
+        cpu = self.cpu
+        registers = cpu.registers
+        opcode = self.opcodes[slot]
+        x = (opcode & 0x0F00) >> 8
+
+        registers.pc = self.pcs[slot]
+        registers.sp = self.sps[slot]
+        registers.I = self.Is[slot]
+        registers.v[0xF] = self.vfs[slot]
+        registers.v[x] = self.vxs[slot]
+        cpu.cycles = self.cycles[slot]
+        cpu.halted = False
+
+        side = self.side_table[opcode]
+        offset = slot * SIDE_SIZE
+        if side == SIDE_MEMORY or side == SIDE_BCD:
+            length = 3 if side == SIDE_BCD else x + 1
+            data = self.side[offset:offset + length]
+            cpu.memory[registers.I:registers.I + len(data)] = data[:len(cpu.memory) - registers.I]
+            cpu.invalidate(registers.I, length)
+        elif side == SIDE_REGISTERS:
+            registers.v[:x + 1] = self.side[offset:offset + x + 1]
+        elif side == SIDE_STACK:
+            if 0 <= registers.sp < len(registers.stack):
+                registers.stack[registers.sp] = struct.unpack_from('<H', self.side, offset)[0]
+        elif side == SIDE_SCREEN:
+            framebuffer = cpu.framebuffer
+            bits = numpy.unpackbits(numpy.frombuffer(self.screens.pop(slot), dtype=numpy.uint8))
+            framebuffer.pixels[:] = bits[:framebuffer.pixels.size].reshape(framebuffer.pixels.shape)
+            framebuffer.dirty.fill(True)
+        elif side == SIDE_SPRITE:
+            # Dibujar otra vez el mismo sprite en el mismo sitio deja la pantalla como estaba
+            n = opcode & 0x000F
+            sprite = cpu.memory[registers.I:registers.I + n]
+            cpu.framebuffer.draw_sprite(registers.v[x], registers.v[(opcode & 0x00F0) >> 4], sprite)
+            registers.v[0xF] = self.vfs[slot]
+        elif side == SIDE_KEYPAD:
+            state, applied, cpu.parked = self.keypads.pop(slot)
+            cpu.keypad.set_state(*state)
+            cpu.keypad.unapply(applied)
+        elif side != NO_SIDE:
+            name = TIMER_NAMES[0] if side == SIDE_DELAY else TIMER_NAMES[1]
+            cpu.timers.values[name], cpu.timers.set_at[name] = TIMER.unpack_from(self.side, offset)
+
+        cpu.opcode = self.opcodes[(self.count - 1) % self.capacity] if len(self) else 0
+
+    def step_back(self, steps=1):
+        """
+        Deshace hasta steps instrucciones
+
+        :return: numero de instrucciones deshechas
+        """
+        steps = min(steps, len(self))
+        for _ in range(steps):
+            self.undo()
+        return steps
+
+    def run_back_to(self, pc):
+        """
+        Deshace instrucciones hasta la ultima vez que el PC valio pc (o hasta que se acaba el diario)
+
+        :return: numero de instrucciones deshechas
+        """
+        steps = 0
+        while len(self):
+            self.undo()
+            steps += 1
+            if self.cpu.registers.pc == pc:
+                break
+        return steps
@@ -0,0 +1,147 @@
+"""
+Teclado hexadecimal de 16 teclas (0x0-0xF).
+
+Los cambios de las teclas llegan como eventos a una cola: desde pygame (Chip8Screen.handle_events), desde
+otro hilo o programados para un ciclo concreto (por ejemplo al repetir una grabacion, ver Replay.py).
+La CPU solo aplica los eventos pendientes cuando una instruccion lee el teclado (EX9E, EXA1, FX0A), de
+forma que el resto de instrucciones no pagan nada.
+
+FX0A no da vueltas sobre si misma mientras espera una tecla: la CPU queda aparcada (HertzCPU.parked)
+hasta el siguiente evento y quien la ejecuta puede dormir en wait() en lugar de seguir llamando a run().
+"""
+from collections import deque
+import threading
+
+KEY_COUNT = 16
+
+
+class Keypad:
+
+    def __init__(self):
+        self.pressed = bytearray(KEY_COUNT)
+        # Eventos recibidos y aun no aplicados: (ciclo o None, tecla, pulsada)
+        self.events = deque()
+        self.arrived = threading.Event()
+        # FX0A en curso: la primera tecla pulsada mientras espera queda en captured
+        self.waiting = False
+        self.captured = None
+        # Grabacion (Replay.Recording) donde se anotan los eventos a medida que se aplican
+        self.recording = None
+
+    def push(self, key, pressed, cycle=None):
+        """
+        Añade un evento a la cola. Puede llamarse desde otro hilo.
+
+        :param key: tecla 0x0-0xF
+        :param pressed: True al pulsarla, False al soltarla
+        :param cycle: ciclo de la CPU a partir del cual se aplica; None para aplicarlo en la siguiente lectura.
+                      Los eventos con ciclo deben llegar ordenados
+        """
+        self.events.append((cycle, key & 0xF, bool(pressed)))
+        self.arrived.set()
+
+    def press(self, key, cycle=None):
+        self.push(key, True, cycle)
+
+    def release(self, key, cycle=None):
+        self.push(key, False, cycle)
+
+    def schedule(self, events):
+        """
+        Programa una lista de eventos (ciclo, tecla, pulsada), como Recording.key_events
+        """
+        for cycle, key, pressed in events:
+            self.push(key, pressed, cycle)
+
+    def poll(self, cycle):
+        """
+        Aplica los eventos que ya deben haber ocurrido en el ciclo indicado
+        """
+        events = self.events
+        while events:
+            event_cycle, key, pressed = events[0]
+            if event_cycle is not None and event_cycle > cycle:
+                break
+            events.popleft()
+
+            self.pressed[key] = pressed
+            if pressed and self.waiting and self.captured is None:
+                self.captured = key
+            if self.recording is not None:
+                self.recording.record_key(cycle, key, pressed)
+
+        if not events:
+            self.arrived.clear()
+            # Un evento añadido desde otro hilo entre la comprobacion y clear() no debe perderse
+            if events:
+                self.arrived.set()
+
+    def is_pressed(self, key, cycle):
+        """
+        :return: True si la tecla esta pulsada en el ciclo indicado
+        """
+        if self.events:
+            self.poll(cycle)
+        return self.pressed[key & 0xF] == 1
+
+    def take_key(self, cycle):
+        """
+        Usado por FX0A: devuelve la tecla pulsada desde que empezo la espera, o None si hay que seguir esperando
+        """
+        if not self.waiting:
+            # Solo cuentan las pulsaciones posteriores al comienzo de la espera
+            self.poll(cycle)
+            self.waiting = True
+        elif self.events:
+            self.poll(cycle)
+
+        key = self.captured
+        if key is not None:
+            self.waiting = False
+            self.captured = None
+        return key
+
+    def due(self, cycle):
+        """
+        :return: eventos pendientes que poll(cycle) aplicaria, sin aplicarlos
+        """
+        due = []
+        for event in self.events:
+            if event[0] is not None and event[0] > cycle:
+                break
+            due.append(event)
+        return due
+
+    def unapply(self, events):
+        """
+        Devuelve a la cabeza de la cola eventos ya aplicados (al deshacer una instruccion, ver Journal.py)
+        """
+        self.events.extendleft(reversed(events))
+        if events:
+            self.arrived.set()
+
+    def state(self):
+        """
+        :return: (teclas pulsadas, waiting, captured)
+        """
+        return bytes(self.pressed), self.waiting, self.captured
+
+    def set_state(self, pressed, waiting, captured):
+        self.pressed[:] = pressed
+        self.waiting = waiting
+        self.captured = captured
+
+    def next_event_cycle(self):
+        """
+        :return: ciclo del siguiente evento pendiente (None si debe aplicarse ya o si no hay ninguno)
+        """
+        return self.events[0][0] if self.events else None
+
+    def wait(self, timeout=None):
+        """
+        Duerme sin consumir CPU hasta que llegue algun evento
+
+        :param timeout: segundos como maximo; None espera indefinidamente
+        :return: True si hay eventos pendientes
+        """
+        return self.arrived.wait(timeout)
@@ -0,0 +1,347 @@
+"""
+Motor vectorizado: ejecuta N copias de la CPU Hertz a la vez con NumPy.
+
+Cada registro se guarda como una estructura de arrays (V es (N, 16), la memoria (N, 4096), PC/I/SP son
+vectores...). En cada paso todas las instancias ejecutan una instruccion: se agrupan segun el tipo de
+instruccion que tienen en su PC y se aplica a cada grupo una actualizacion vectorizada con la misma
+semantica que los manejadores de HertzCPU.
+"""
+from Config import MAX_MEMORY, PROGRAM_COUNTER_START, CLOCK_SPEED, TIMER_FREQUENCY, SCREEN_WIDTH, SCREEN_HEIGHT
+from Disassembler import FORMATS, instruction_kind
+import numpy
+
+KIND_NAMES = list(FORMATS)
+KIND_IDS = {name: index for index, name in enumerate(KIND_NAMES)}
+
+_kind_table = None
+
+
+def kind_table():
+    """
+    :return: array de 65536 entradas con el tipo de instruccion (indice de KIND_NAMES) de cada OPCODE
+    """
+    global _kind_table
+    if _kind_table is None:
+        _kind_table = numpy.array([KIND_IDS[instruction_kind(opcode)] for opcode in range(0x10000)], dtype=numpy.uint8)
+    return _kind_table
+
+
+def splitmix64(state):
+    """
+    Generador pseudoaleatorio sin estado compartido: cada instancia avanza su propia semilla
+    """
+    with numpy.errstate(over='ignore'):
+        state = state + numpy.uint64(0x9E3779B97F4A7C15)
+        z = state
+        z = (z ^ (z >> numpy.uint64(30))) * numpy.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> numpy.uint64(27))) * numpy.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> numpy.uint64(31))
+    return state, z
+
+
+class LockstepCPU:
+
+    def __init__(self, count, memory=None, seeds=None, clock_speed=CLOCK_SPEED):
+        """
+        :param count: numero de instancias
+        :param memory: imagen de memoria inicial comun a todas las instancias (a partir de la direccion 0)
+        :param seeds: semilla de cada instancia para la instruccion RND
+        :param clock_speed: instrucciones por segundo emuladas, para el avance de los temporizadores
+        """
+        self.count = count
+        self.v = numpy.zeros((count, 16), dtype=numpy.uint8)
+        self.memory = numpy.zeros((count, MAX_MEMORY), dtype=numpy.uint8)
+        if memory is not None:
+            image = numpy.frombuffer(bytes(memory), dtype=numpy.uint8)
+            self.memory[:, :image.size] = image
+        self.pc = numpy.full(count, PROGRAM_COUNTER_START, dtype=numpy.int64)
+        self.I = numpy.zeros(count, dtype=numpy.int64)
+        self.sp = numpy.zeros(count, dtype=numpy.int64)
+        self.stack = numpy.zeros((count, 16), dtype=numpy.int64)
+        self.framebuffer = numpy.zeros((count, SCREEN_HEIGHT, SCREEN_WIDTH), dtype=numpy.uint8)
+        # Igual que en Timers: valor escrito y ciclo de la escritura
+        if clock_speed <= 0:
+            raise ValueError("clock_speed must be positive, got " + str(clock_speed))
+        self.clock_speed = clock_speed
+        self.delay_timer = numpy.zeros(count, dtype=numpy.int64)
+        self.delay_set_at = numpy.zeros(count, dtype=numpy.int64)
+        self.sound_timer = numpy.zeros(count, dtype=numpy.int64)
+        self.sound_set_at = numpy.zeros(count, dtype=numpy.int64)
+
+        seeds = numpy.arange(count) if seeds is None else numpy.asarray(seeds)
+        self.random_state = seeds.astype(numpy.uint64)
+
+        self.cycles = 0
+        self.halted = numpy.zeros(count, dtype=bool)
+        self.trapped = numpy.zeros(count, dtype=bool)
+        self.halt_cycle = numpy.full(count, -1, dtype=numpy.int64)
+
+        self.kinds = kind_table()
+        self.handlers = {KIND_IDS[name]: getattr(self, 'execute_' + name.lower()) for name in KIND_NAMES}
+
+    @classmethod
+    def from_rom(cls, rom, count, seeds=None, offset=PROGRAM_COUNTER_START, clock_speed=CLOCK_SPEED):
+        """
+        Carga la ROM con el cargador de HertzCPU y la replica en todas las instancias
+        """
+        from CPU import HertzCPU
+        cpu = HertzCPU()
+        cpu.load_rom(rom, offset)
+        return cls(count, cpu.memory, seeds, clock_speed)
+
+    def delay_timer_value(self, instances):
+        """
+        :return: valor actual del temporizador delay de las instancias, calculado a partir de los ciclos
+        """
+        ticks = (self.cycles - self.delay_set_at[instances]) * TIMER_FREQUENCY // self.clock_speed
+        return numpy.maximum(self.delay_timer[instances] - ticks, 0)
+
+    def run(self, max_cycles):
+        """
+        Ejecuta hasta que todas las instancias se detienen o se agotan los ciclos
+
+        :return: numero de pasos ejecutados
+        """
+        steps = 0
+        while steps < max_cycles and not self.halted.all():
+            self.step()
+            steps += 1
+        return steps
+
+    def step(self):
+        """
+        Ejecuta una instruccion en todas las instancias que siguen en marcha
+        """
+        active = numpy.nonzero(~self.halted)[0]
+        if active.size == 0:
+            return
+
+        pc = self.pc[active]
+        out_of_memory = pc + 1 >= MAX_MEMORY
+        if out_of_memory.any():
+            self.trap(active[out_of_memory])
+            active, pc = active[~out_of_memory], pc[~out_of_memory]
+
+        opcodes = self.memory[active, pc].astype(numpy.int64) << 8 | self.memory[active, pc + 1]
+        self.pc[active] = pc + 2
+        self.cycles += 1
+
+        kinds = self.kinds[opcodes]
+        for kind in numpy.unique(kinds):
+            group = kinds == kind
+            self.handlers[kind](active[group], opcodes[group])
+
+    def trap(self, instances):
+        self.halted[instances] = True
+        self.trapped[instances] = True
+        self.halt_cycle[instances] = self.cycles
+
+    def report(self):
+        """
+        :return: lista con el estado final de cada instancia
+        """
+        return [{
+            'halted': bool(self.halted[index]),
+            'trapped': bool(self.trapped[index]),
+            'halt_cycle': int(self.halt_cycle[index]),
+            'v': [int(value) for value in self.v[index]],
+            'I': int(self.I[index]),
+            'pc': int(self.pc[index]),
+            'sp': int(self.sp[index])
+        } for index in range(self.count)]
+
+    # Manejadores vectorizados: reciben los indices de las instancias y sus OPCODES
+
+    def execute_sys(self, instances, opcodes):
+        # El OPCODE 0x0000 detiene el programa, igual que en el interprete
+        halt = instances[opcodes == 0x0]
+        self.halted[halt] = True
+        self.halt_cycle[halt] = self.cycles
+
+    def execute_cls(self, instances, opcodes):
+        self.framebuffer[instances] = 0
+
+    def execute_drw(self, instances, opcodes):
+        rows = opcodes & 0x000F
+        instances, opcodes = self.memory_range(instances, opcodes, rows)
+        rows = opcodes & 0x000F
+        x_pos = self.vx(instances, opcodes)
+        y_pos = self.vy(instances, opcodes)
+        collision = numpy.zeros(instances.size, dtype=bool)
+
+        # Cada iteracion dibuja la misma fila del sprite en todas las instancias que la tienen
+        for row in range(16):
+            drawing = rows > row
+            if not drawing.any():
+                break
+            drawn = instances[drawing]
+            sprite_row = self.memory[drawn, self.I[drawn] + row]
+            bits = numpy.unpackbits(sprite_row[:, None], axis=1)
+            screen_rows = ((y_pos[drawing] + row) % SCREEN_HEIGHT)[:, None]
+            columns = (x_pos[drawing][:, None] + numpy.arange(8)) % SCREEN_WIDTH
+
+            region = self.framebuffer[drawn[:, None], screen_rows, columns]
+            collision[drawing] |= (region & bits).any(axis=1)
+            self.framebuffer[drawn[:, None], screen_rows, columns] = region ^ bits
+
+        self.v[instances, 0xF] = collision
+
+    def execute_ret(self, instances, opcodes):
+        sp = self.sp[instances]
+        self.pc[instances] = self.stack[instances, sp]
+        self.sp[instances] = sp - 1
+
+    def execute_jp(self, instances, opcodes):
+        self.pc[instances] = opcodes & 0x0FFF
+
+    def execute_call(self, instances, opcodes):
+        sp = self.sp[instances]
+        self.stack[instances, sp] = self.pc[instances] + 2
+        self.sp[instances] = sp + 1
+        self.pc[instances] = opcodes & 0x0FFF
+
+    def skip_where(self, instances, condition):
+        self.pc[instances[condition]] += 2
+
+    def vx(self, instances, opcodes):
+        return self.v[instances, (opcodes & 0x0F00) >> 8].astype(numpy.int64)
+
+    def vy(self, instances, opcodes):
+        return self.v[instances, (opcodes & 0x00F0) >> 4].astype(numpy.int64)
+
+    def set_vx(self, instances, opcodes, values):
+        self.v[instances, (opcodes & 0x0F00) >> 8] = values & 0xFF
+
+    def execute_se_nn(self, instances, opcodes):
+        self.skip_where(instances, self.vx(instances, opcodes) == opcodes & 0x00FF)
+
+    def execute_sne_nn(self, instances, opcodes):
+        self.skip_where(instances, self.vx(instances, opcodes) != opcodes & 0x00FF)
+
+    def execute_se_vy(self, instances, opcodes):
+        self.skip_where(instances, self.vx(instances, opcodes) == self.vy(instances, opcodes))
+
+    def execute_sne_vy(self, instances, opcodes):
+        self.skip_where(instances, self.vx(instances, opcodes) != self.vy(instances, opcodes))
+
+    # Las instancias no tienen teclado: ninguna tecla esta pulsada nunca
+    def execute_skp(self, instances, opcodes):
+        pass
+
+    def execute_sknp(self, instances, opcodes):
+        self.pc[instances] += 2
+
+    def execute_ld_vx_k(self, instances, opcodes):
+        # Igual que una HertzCPU aparcada sin eventos: la instancia se queda en FX0A
+        self.pc[instances] -= 2
+
+    def execute_ld_nn(self, instances, opcodes):
+        self.set_vx(instances, opcodes, opcodes & 0x00FF)
+
+    def execute_add_nn(self, instances, opcodes):
+        self.set_vx(instances, opcodes, self.vx(instances, opcodes) + (opcodes & 0x00FF))
+
+    def execute_ld_vy(self, instances, opcodes):
+        self.set_vx(instances, opcodes, self.vy(instances, opcodes))
+
+    def execute_or(self, instances, opcodes):
+        self.set_vx(instances, opcodes, self.vx(instances, opcodes) | self.vy(instances, opcodes))
+
+    def execute_and(self, instances, opcodes):
+        self.set_vx(instances, opcodes, self.vx(instances, opcodes) & self.vy(instances, opcodes))
+
+    def execute_xor(self, instances, opcodes):
+        self.set_vx(instances, opcodes, self.vx(instances, opcodes) ^ self.vy(instances, opcodes))
+
+    def execute_add_vy(self, instances, opcodes):
+        # Igual que en el interprete: VF se pone a 0 antes de leer los operandos
+        self.v[instances, 0xF] = 0
+        resultado = self.vx(instances, opcodes) + self.vy(instances, opcodes)
+        self.v[instances, 0xF] = resultado >> 8
+        self.set_vx(instances, opcodes, resultado)
+
+    def execute_sub(self, instances, opcodes):
+        self.v[instances, 0xF] = 0
+        resultado = self.vx(instances, opcodes) - self.vy(instances, opcodes)
+        self.v[instances, 0xF] = resultado < 0
+        self.set_vx(instances, opcodes, resultado)
+
+    def execute_subn(self, instances, opcodes):
+        self.v[instances, 0xF] = 0
+        resultado = self.vy(instances, opcodes) - self.vx(instances, opcodes)
+        self.v[instances, 0xF] = resultado < 0
+        self.set_vx(instances, opcodes, resultado)
+
+    def execute_shr(self, instances, opcodes):
+        self.v[instances, 0xF] = self.vy(instances, opcodes) & 0x0F
+        self.set_vx(instances, opcodes, self.vx(instances, opcodes) >> 1)
+
+    def execute_shl(self, instances, opcodes):
+        self.v[instances, 0xF] = (self.vy(instances, opcodes) & 0xF0) >> 4
+        self.set_vx(instances, opcodes, self.vx(instances, opcodes) << 1)
+
+    def execute_ld_i(self, instances, opcodes):
+        self.I[instances] = opcodes & 0x0FFF
+
+    def execute_jp_v0(self, instances, opcodes):
+        self.pc[instances] = (opcodes & 0x0FFF) + self.v[instances, 0]
+
+    def execute_rnd(self, instances, opcodes):
+        self.random_state[instances], random_numbers = splitmix64(self.random_state[instances])
+        self.set_vx(instances, opcodes, (random_numbers & numpy.uint64(0xFF)).astype(numpy.int64) & opcodes & 0x00FF)
+
+    def execute_ld_vx_dt(self, instances, opcodes):
+        self.set_vx(instances, opcodes, self.delay_timer_value(instances))
+
+    def execute_ld_dt_vx(self, instances, opcodes):
+        self.delay_timer[instances] = self.vx(instances, opcodes)
+        self.delay_set_at[instances] = self.cycles
+
+    def execute_ld_st_vx(self, instances, opcodes):
+        self.sound_timer[instances] = self.vx(instances, opcodes)
+        self.sound_set_at[instances] = self.cycles
+
+    def execute_add_i_vx(self, instances, opcodes):
+        self.v[instances, 0xF] = 0
+        resultado = self.I[instances] + self.vx(instances, opcodes)
+        self.v[instances, 0xF] = resultado >> 16
+        self.I[instances] = resultado & 0xFFFF
+
+    def memory_range(self, instances, opcodes, length):
+        """
+        Detiene las instancias cuyo acceso se sale de la memoria
+
+        :return: instancias y OPCODES que pueden continuar
+        """
+        valid = self.I[instances] + length <= MAX_MEMORY
+        self.trap(instances[~valid])
+        return instances[valid], opcodes[valid]
+
+    def execute_ld_i_vx(self, instances, opcodes):
+        instances, opcodes = self.memory_range(instances, opcodes, ((opcodes & 0x0F00) >> 8) + 1)
+        last = (opcodes & 0x0F00) >> 8
+        for register in range(16):
+            stored = instances[last >= register]
+            self.memory[stored, self.I[stored] + register] = self.v[stored, register]
+
+    def execute_ld_vx_i(self, instances, opcodes):
+        instances, opcodes = self.memory_range(instances, opcodes, ((opcodes & 0x0F00) >> 8) + 1)
+        last = (opcodes & 0x0F00) >> 8
+        for register in range(16):
+            loaded = instances[last >= register]
+            self.v[loaded, register] = self.memory[loaded, self.I[loaded] + register]
+
+    def execute_ld_b_vx(self, instances, opcodes):
+        instances, opcodes = self.memory_range(instances, opcodes, 3)
+        value = self.vx(instances, opcodes)
+        address = self.I[instances]
+        self.memory[instances, address] = (value & 0xF00) >> 8
+        self.memory[instances, address + 1] = (value & 0x0F0) >> 4
+        self.memory[instances, address + 2] = value & 0x00F
+
+    def execute_nop_f5(self, instances, opcodes):
+        pass
+
+    def execute_unknown(self, instances, opcodes):
+        # Igual que InvalidOpcodeError: el PC queda apuntando a la instruccion siguiente
+        self.trap(instances)
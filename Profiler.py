@@ -0,0 +1,150 @@
+"""
+Perfilador de ejecucion.
+
+Cuenta cuantas veces se ejecuta cada OPCODE y cada direccion en arrays reservados de antemano, y cuantos
+ciclos se pasan dentro de cada subrutina (2NNN). Las subrutinas se siguen a partir del SP de la CPU: si ha
+subido desde la instruccion anterior, el PC actual es el comienzo de una subrutina; si ha bajado, se ha
+vuelto de ella.
+
+Genera un informe de puntos calientes y un archivo de pilas colapsadas (una linea 'main;sub_0x20;sub_0x40 N'
+por pila) que entienden flamegraph.pl, speedscope, etc.
+
+    python Profiler.py rom [-n CYCLES] [-o PREFIJO]
+"""
+from Config import MAX_MEMORY, BATCH_CYCLES, CLOCK_SPEED
+from Disassembler import disassemble, instruction_kind
+from array import array
+import argparse
+
+ROOT_FRAME = 'main'
+
+
+class Profiler:
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.opcode_counts = array('L', [0] * 0x10000)
+        self.address_counts = array('L', [0] * MAX_MEMORY)
+        # Ciclos por pila de llamadas: tupla con la direccion de cada subrutina activa
+        self.stacks = {}
+        self.frames = []
+        self.stack_key = ()
+
+    def record(self, pc, opcode):
+        """
+        Cuenta la instruccion opcode, a punto de ejecutarse en pc
+        """
+        self.opcode_counts[opcode] += 1
+        self.address_counts[pc] += 1
+
+        depth = self.cpu.registers.sp
+        if depth != len(self.frames):
+            self.update_frames(depth, pc)
+
+        stacks = self.stacks
+        key = self.stack_key
+        stacks[key] = stacks.get(key, 0) + 1
+
+    def update_frames(self, depth, pc):
+        frames = self.frames
+        if depth > len(frames):
+            # Acabamos de entrar en una subrutina: pc es su primera instruccion
+            frames.extend([pc] * (depth - len(frames)))
+        else:
+            del frames[max(depth, 0):]
+        self.stack_key = tuple(frames)
+
+    def kind_counts(self):
+        """
+        :return: ejecuciones por tipo de instruccion (claves de Disassembler.FORMATS), de mayor a menor
+        """
+        counts = {}
+        for opcode, count in enumerate(self.opcode_counts):
+            if count:
+                kind = instruction_kind(opcode)
+                counts[kind] = counts.get(kind, 0) + count
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+    def hotspots(self, limit=20):
+        """
+        :return: [(direccion, ejecuciones, mnemonic)] de las direcciones mas ejecutadas
+        """
+        memory = self.cpu.memory
+        addresses = sorted((address for address, count in enumerate(self.address_counts) if count),
+                           key=lambda address: self.address_counts[address], reverse=True)[:limit]
+        return [(address, self.address_counts[address],
+                 disassemble(memory[address] << 8 | memory[(address + 1) % MAX_MEMORY])[0]) for address in addresses]
+
+    def subroutines(self):
+        """
+        :return: [(direccion, ciclos propios, ciclos incluyendo las subrutinas llamadas)], de mas a menos ciclos
+        """
+        own = {}
+        inclusive = {}
+        for stack, cycles in self.stacks.items():
+            if stack:
+                own[stack[-1]] = own.get(stack[-1], 0) + cycles
+            for address in set(stack):
+                inclusive[address] = inclusive.get(address, 0) + cycles
+        return sorted(((address, own.get(address, 0), cycles) for address, cycles in inclusive.items()),
+                      key=lambda item: item[2], reverse=True)
+
+    def collapsed_stacks(self):
+        """
+        :return: lineas en formato de pilas colapsadas
+        """
+        lines = []
+        for stack, cycles in sorted(self.stacks.items()):
+            frames = [ROOT_FRAME] + ['sub_' + hex(address) for address in stack]
+            lines.append(';'.join(frames) + ' ' + str(cycles))
+        return lines
+
+    def report(self, limit=20):
+        """
+        :return: informe de texto con los tipos de instruccion, direcciones y subrutinas que mas ciclos consumen
+        """
+        total = sum(self.stacks.values())
+        lines = ["Instrucciones ejecutadas: " + str(total), "", "Tipo de instruccion"]
+        for kind, count in self.kind_counts():
+            lines.append("  {:<10} {:>12} {:6.2f}%".format(kind, count, 100.0 * count / total))
+
+        lines += ["", "Direcciones"]
+        for address, count, mnemonic in self.hotspots(limit):
+            lines.append("  {:<8} {:>12} {:6.2f}%  {}".format(hex(address), count, 100.0 * count / total, mnemonic))
+
+        lines += ["", "Subrutinas (propios / totales)"]
+        for address, own, inclusive in self.subroutines()[:limit]:
+            lines.append("  {:<8} {:>12} {:>12} {:6.2f}%".format(hex(address), own, inclusive, 100.0 * inclusive / total))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, prefix):
+        """
+        Escribe prefix.txt con el informe y prefix.folded con las pilas colapsadas
+        """
+        with open(prefix + '.txt', 'w') as report:
+            report.write(self.report())
+        with open(prefix + '.folded', 'w') as folded:
+            folded.write('\n'.join(self.collapsed_stacks()) + '\n')
+
+
+if __name__ == '__main__':
+    from CPU import HertzCPU, InvalidOpcodeError
+
+    parser = argparse.ArgumentParser(description='Perfila la ejecucion de una ROM')
+    parser.add_argument('rom')
+    parser.add_argument('-n', '--cycles', dest='cycles', type=int, default=BATCH_CYCLES)
+    parser.add_argument('-c', '--clockspeed', dest='clock_speed', type=int, default=CLOCK_SPEED)
+    parser.add_argument('-o', '--output', dest='output', help='prefijo de los archivos .txt y .folded')
+    args = parser.parse_args()
+
+    cpu = HertzCPU(clock_speed=args.clock_speed, profile=True)
+    cpu.load_rom(args.rom, 0)
+    try:
+        cpu.run(args.cycles)
+    except InvalidOpcodeError as error:
+        print(error)
+
+    if args.output:
+        cpu.profiler.write(args.output)
+    else:
+        print(cpu.profiler.report())
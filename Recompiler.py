@@ -0,0 +1,160 @@
+from Config import MAX_MEMORY
+from Disassembler import instruction_kind
+
+# Instrucciones que cambian el flujo del programa: terminan el bloque basico
+BRANCH_KINDS = {'JP', 'CALL', 'RET', 'JP_V0', 'SE_NN', 'SNE_NN', 'SE_VY', 'SNE_VY', 'SKP', 'SKNP'}
+
+# Instrucciones que escriben en memoria (pueden modificar el propio bloque) o detienen el programa (FX0A aparca la CPU)
+BLOCK_END_KINDS = BRANCH_KINDS | {'LD_I_VX', 'LD_B_VX', 'SYS', 'LD_VX_K'}
+
+MAX_BLOCK_LENGTH = 64
+
+# Instrucciones que leen o escriben los temporizadores: necesitan el contador de ciclos al dia
+TIMER_KINDS = {'LD_VX_DT', 'LD_DT_VX', 'LD_ST_VX'}
+
+# Instrucciones sencillas que se generan en linea con sus operandos como constantes
+INLINE_TEMPLATES = {
+    'LD_NN': "v[{x}] = {nn}",
+    'ADD_NN': "v[{x}] = (v[{x}] + {nn}) & 0xFF",
+    'LD_VY': "v[{x}] = v[{y}]",
+    'OR': "v[{x}] |= v[{y}]",
+    'AND': "v[{x}] &= v[{y}]",
+    'XOR': "v[{x}] ^= v[{y}]",
+    'LD_I': "registers.I = {nnn}",
+    'JP': "registers.pc = {nnn}",
+    'SE_NN': "if v[{x}] == {nn}: registers.pc += 2",
+    'SNE_NN': "if v[{x}] != {nn}: registers.pc += 2",
+}
+
+
+def ends_block(opcode):
+    """
+    Indica si el bloque basico termina tras esta instruccion
+    """
+    return instruction_kind(opcode) in BLOCK_END_KINDS
+
+
+class BlockCompiler:
+    """
+    Recompilador dinamico: traduce cada bloque basico de la ROM a una funcion de Python
+    que ejecuta todas sus instrucciones en una sola llamada.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        # Funcion compilada indexada por la direccion donde empieza el bloque
+        self.blocks = [None] * MAX_MEMORY
+        # Para cada byte de memoria, direcciones de los bloques que lo contienen
+        self.owners = [set() for _ in range(MAX_MEMORY)]
+        # Fin (sin incluir) de cada bloque compilado, indexado por su direccion de inicio
+        self.ends = {}
+        self.compiled_blocks = 0
+
+    def execute(self, remaining=None):
+        """
+        Ejecuta el bloque que empieza en el PC actual, compilandolo si es necesario
+
+        :param remaining: ciclos que quedan como maximo; si el bloque es mas largo se ejecuta una sola instruccion
+        :return: OPCODE de la ultima instruccion ejecutada
+        """
+        pc = self.cpu.registers.pc
+        block = self.blocks[pc]
+        if block is None:
+            block = self.compile(pc)
+            if block is None:
+                # La primera instruccion no es valida: el interprete se encarga de detener la CPU
+                return self.cpu.execute_instruction()
+        if remaining is not None and (self.ends[pc] - pc) >> 1 > remaining:
+            return self.cpu.execute_instruction()
+        return block(self.cpu)
+
+    def find_block(self, start):
+        """
+        Recorre la memoria desde start hasta encontrar el final del bloque basico
+
+        :return: lista de (direccion, opcode)
+        """
+        memory = self.cpu.memory
+        instructions = []
+        address = start
+
+        while address + 1 < MAX_MEMORY and len(instructions) < MAX_BLOCK_LENGTH:
+            opcode = memory[address] << 8 | memory[address + 1]
+            if instruction_kind(opcode) == 'UNKNOWN':
+                break
+            instructions.append((address, opcode))
+            if ends_block(opcode):
+                break
+            address += 2
+
+        return instructions
+
+    def compile(self, start):
+        """
+        Genera y compila la funcion del bloque que empieza en start
+
+        :return: funcion block(cpu) o None si no hay ninguna instruccion valida
+        """
+        instructions = self.find_block(start)
+        if not instructions:
+            return None
+
+        namespace = {}
+        lines = [
+            "def block(cpu):",
+            "    registers = cpu.registers",
+            "    v = registers.v"
+        ]
+
+        # Los ciclos se suman de una vez, salvo antes de las instrucciones que dependen del tiempo emulado
+        pending_cycles = 0
+        last_address, last_opcode = instructions[-1]
+        for address, opcode in instructions:
+            pending_cycles += 1
+            if address == last_address or instruction_kind(opcode) in TIMER_KINDS:
+                lines.append("    cpu.cycles += " + str(pending_cycles))
+                pending_cycles = 0
+
+            if address == last_address:
+                # Los saltos y llamadas parten del PC de la instruccion siguiente
+                lines.append("    registers.pc = " + str(address + 2))
+                lines.append("    cpu.opcode = " + str(opcode))
+
+            function, handler_operands = self.cpu.opcode_table[opcode]
+            template = INLINE_TEMPLATES.get(instruction_kind(opcode))
+            if template is not None:
+                lines.append("    " + template.format(
+                    x=(opcode & 0x0F00) >> 8, y=(opcode & 0x00F0) >> 4, nn=opcode & 0x00FF, nnn=opcode & 0x0FFF))
+            else:
+                name = "handler_" + hex(address)
+                namespace[name] = function
+                lines.append("    " + name + "(cpu" + "".join(", " + str(operand) for operand in handler_operands) + ")")
+
+        lines.append("    return " + str(last_opcode))
+
+        exec(compile("\n".join(lines), "<block " + hex(start) + ">", "exec"), namespace)
+        block = namespace['block']
+
+        self.blocks[start] = block
+        self.ends[start] = last_address + 2
+        for address in range(start, last_address + 2):
+            self.owners[address].add(start)
+        self.compiled_blocks += 1
+
+        return block
+
+    def invalidate(self, address, length=1):
+        """
+        Descarta los bloques compilados que contienen alguno de los bytes modificados
+        """
+        for written in range(address, min(address + length, MAX_MEMORY)):
+            for start in list(self.owners[written]):
+                self.discard(start)
+
+    def discard(self, start):
+        """
+        Elimina el bloque que empieza en start de todos los bytes que cubre
+        """
+        self.blocks[start] = None
+        for address in range(start, self.ends.pop(start)):
+            self.owners[address].discard(start)
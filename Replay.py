@@ -0,0 +1,55 @@
+"""
+Grabaciones de ejecuciones para poder repetirlas exactamente.
+
+Una grabacion guarda la semilla, los numeros aleatorios que ha consumido RND y los cambios de las teclas
+(ciclo, tecla, pulsada). Al repetirla con HertzCPU.replay() la CPU vuelve a recibir exactamente lo mismo,
+de forma que las mediciones de rendimiento y los informes de errores coinciden entre ejecuciones.
+Debe repetirse desde el mismo estado en el que empezo la grabacion (normalmente, la ROM recien cargada).
+"""
+import struct
+import zlib
+
+MAGIC = b'HREC'
+FORMAT_VERSION = 1
+# magic, version, semilla, ciclo inicial, numeros aleatorios, eventos de teclado
+HEADER = struct.Struct('<4sBQQII')
+# ciclo, tecla, pulsada
+KEY_EVENT = struct.Struct('<QB?')
+
+
+class Recording:
+
+    def __init__(self, seed=0, random_stream=b'', key_events=None, start_cycle=0):
+        self.seed = seed
+        self.random_stream = random_stream
+        self.key_events = [] if key_events is None else key_events
+        self.start_cycle = start_cycle
+
+    def record_key(self, cycle, key, pressed):
+        self.key_events.append((cycle, key, pressed))
+
+    def to_bytes(self):
+        data = [HEADER.pack(MAGIC, FORMAT_VERSION, self.seed & 0xFFFFFFFFFFFFFFFF, self.start_cycle,
+                            len(self.random_stream), len(self.key_events)),
+                bytes(self.random_stream)]
+        data.extend(KEY_EVENT.pack(*event) for event in self.key_events)
+        return zlib.compress(b''.join(data))
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        magic, version, seed, start_cycle, random_size, event_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a recording or unsupported recording version")
+        offset = HEADER.size + random_size
+        key_events = [KEY_EVENT.unpack_from(data, offset + i * KEY_EVENT.size) for i in range(event_count)]
+        return cls(seed, data[HEADER.size:offset], key_events, start_cycle)
+
+    def save(self, path):
+        with open(path, 'wb') as output:
+            output.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as recording_file:
+            return cls.from_bytes(recording_file.read())
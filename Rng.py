@@ -0,0 +1,94 @@
+"""
+Generador de numeros aleatorios de cada CPU.
+
+Cada HertzCPU tiene su propio generador con una semilla explicita, de forma que dos ejecuciones con la
+misma semilla son identicas. Los bytes se generan de RANDOM_BUFFER_SIZE en RANDOM_BUFFER_SIZE y RND solo
+lee el siguiente byte del buffer.
+
+Tambien puede reproducir una secuencia grabada (stream) en lugar de generarla; ver Replay.py.
+"""
+from Config import RANDOM_BUFFER_SIZE
+from os import urandom
+import random
+
+
+class ReplayExhaustedError(Exception):
+    """
+    La ejecucion ha pedido mas numeros aleatorios de los que se grabaron
+    """
+
+
+class RandomSource:
+
+    def __init__(self, seed=None, stream=None, buffer_size=RANDOM_BUFFER_SIZE):
+        """
+        :param seed: semilla entera. Si es None se elige una al azar (queda en self.seed para poder repetir la ejecucion)
+        :param stream: bytes grabados que se devuelven en orden en lugar de generarlos
+        """
+        self.seed = int.from_bytes(urandom(8), 'little') if seed is None else seed
+        self.buffer_size = buffer_size
+        # Buffers ya consumidos, solo mientras se graba
+        self.history = None
+        self.recording_start = 0
+
+        if stream is not None:
+            self.random = None
+            self.buffer = bytes(stream)
+        else:
+            self.random = random.Random(self.seed)
+            self.buffer = self.generate()
+        self.position = 0
+
+    def generate(self):
+        return self.random.getrandbits(self.buffer_size * 8).to_bytes(self.buffer_size, 'little')
+
+    def next_byte(self):
+        """
+        :return: siguiente numero aleatorio entre 0 y 255
+        """
+        position = self.position
+        if position == len(self.buffer):
+            self.refill()
+            position = 0
+        self.position = position + 1
+        return self.buffer[position]
+
+    def refill(self):
+        if self.random is None:
+            raise ReplayExhaustedError("The recorded random stream has been exhausted")
+        if self.history is not None:
+            self.history.append(self.buffer)
+        self.buffer = self.generate()
+        self.position = 0
+
+    def start_recording(self):
+        """
+        Empieza a guardar los numeros que se consumen a partir de ahora
+        """
+        self.history = []
+        self.recording_start = self.position
+
+    def recorded(self):
+        """
+        :return: bytes consumidos desde start_recording()
+        """
+        if self.history is None:
+            return b''
+        if not self.history:
+            return self.buffer[self.recording_start:self.position]
+        return self.history[0][self.recording_start:] + b''.join(self.history[1:]) + self.buffer[:self.position]
+
+    def getstate(self):
+        """
+        :return: estado completo para Snapshot: (estado de random.Random o None, buffer, posicion)
+        """
+        return (None if self.random is None else self.random.getstate()), self.buffer, self.position
+
+    def setstate(self, state):
+        random_state, self.buffer, self.position = state
+        if random_state is None:
+            self.random = None
+        else:
+            if self.random is None:
+                self.random = random.Random()
+            self.random.setstate(random_state)
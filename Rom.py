@@ -0,0 +1,79 @@
+"""
+Carga de ROMs en memoria.
+
+Se admiten dos formatos:
+ - Binario: cada byte del archivo es un byte del programa.
+ - Texto: cada byte se escribe como 8 digitos binarios separados por espacios o saltos de linea
+   (como Chip8Test.b).
+
+El formato se detecta automaticamente. Las ROM en texto se convierten una sola vez y el resultado
+se guarda en ROM_CACHE_DIR con el hash de su contenido como nombre, de forma que las siguientes
+cargas son una simple copia.
+"""
+from Config import ROM_CACHE_DIR
+from hashlib import sha1
+import mmap
+import os
+import re
+
+TEXT_ROM = re.compile(rb'[01\s]*')
+
+
+def is_text_rom(data):
+    """
+    :param data: contenido del archivo (bytes, mmap...)
+    :return: True si el archivo esta escrito como digitos binarios en texto
+    """
+    return len(data) > 0 and TEXT_ROM.fullmatch(data) is not None
+
+
+def parse_text_rom(data):
+    return bytes(int(value, 2) for value in data.split())
+
+
+def cached_text_rom(data, cache_dir=ROM_CACHE_DIR):
+    """
+    Convierte una ROM en texto a binario, reutilizando la conversion guardada si existe
+
+    :return: bytes del programa
+    """
+    cache_file = os.path.join(cache_dir, sha1(data).hexdigest() + '.bin')
+    try:
+        with open(cache_file, 'rb') as cached:
+            return cached.read()
+    except OSError:
+        pass
+
+    image = parse_text_rom(data)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Escribimos en un archivo temporal para que nunca se lea una conversion a medias
+        temporary_file = cache_file + '.' + str(os.getpid())
+        with open(temporary_file, 'wb') as cached:
+            cached.write(image)
+        os.replace(temporary_file, cache_file)
+    except OSError:
+        pass  # Sin cache la ROM se convierte en cada carga
+
+    return image
+
+
+def load_rom(memory, rom, offset, cache_dir=ROM_CACHE_DIR):
+    """
+    Copia el programa de un archivo en memoria a partir de offset
+
+    :param memory: bytearray de destino
+    :param rom: ruta del archivo
+    :param offset: la ubicación de memoria donde empezar a cargar el archivo
+    :return: numero de bytes cargados
+    """
+    with open(rom, 'rb') as file_data:
+        if os.fstat(file_data.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(file_data.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            image = cached_text_rom(data[:], cache_dir) if is_text_rom(data) else data
+
+            if offset + len(image) > len(memory):
+                raise IndexError("ROM " + rom + " does not fit in memory at offset " + hex(offset))
+            memory[offset:offset + len(image)] = image
+            return len(image)
@@ -1,11 +1,12 @@
 from pygame import display, DOUBLEBUF
-from pygame import draw
+from pygame import surfarray, Rect
+from pygame import event, key, KEYDOWN, KEYUP, QUIT
+from Config import SCREEN_WIDTH, SCREEN_HEIGHT, FRAME_RATE, KEYPAD_LAYOUT
+from Framebuffer import Framebuffer
+from time import perf_counter
+import numpy
 
 #Constantes
-SCREEN_WIDTH = 64
-SCREEN_HEIGHT = 32
-
-
 SCREEN_DEPTH = 8
 
 
@@ -17,34 +18,75 @@ PIXEL_STATES = {
 
 class Chip8Screen:
 
-    def __init__(self, scale_factor, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT):
+    def __init__(self, scale_factor, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT, framebuffer=None):
         self.scale_factor = scale_factor
+        # El estado de los pixeles vive en el framebuffer; la superficie de pygame solo lo muestra
+        self.framebuffer = framebuffer if framebuffer is not None else Framebuffer(screen_width, screen_height)
         display.init()
         self.surface = display.set_mode((screen_width * scale_factor, screen_height * scale_factor), DOUBLEBUF, SCREEN_DEPTH)
         display.set_caption('CHIP8 Emulator')
+        # Colores ya convertidos al formato de la superficie, indexados por estado del pixel
+        self.colors = numpy.array([self.surface.map_rgb(PIXEL_STATES[state]) for state in (0, 1)], dtype=numpy.uint32)
+        self.frame_time = 1.0 / FRAME_RATE
+        self.last_update = 0
         self.clear_screen()
         display.flip()
 
     def clear_screen(self):
+        self.framebuffer.clear()
         self.surface.fill(PIXEL_STATES[0])
 
     def draw_pixel(self, x_pos, y_pos, pixel_state):
+        # Solo cambia el framebuffer: la superficie se actualiza en update()
+        self.framebuffer.set_pixel(x_pos, y_pos, pixel_state)
 
-        x_base = x_pos * self.scale_factor
-        y_base = y_pos * self.scale_factor
+    def get_pixel(self, x_pos, y_pos):
+        return self.framebuffer.get_pixel(x_pos, y_pos)
 
-        draw.rect(self.surface, PIXEL_STATES[pixel_state], (x_base, y_base, self.scale_factor, self.scale_factor))
+    def render(self):
+        """
+        Copia a la superficie las filas modificadas del framebuffer, escaladas con un unico blit por bloque
 
-    def get_pixel(self, x_pos, y_pos):
+        :return: rectangulos de la ventana que han cambiado
+        """
+        scale = self.scale_factor
+        pixels = self.framebuffer.pixels
+        rects = []
 
-        x_scale = x_pos * self.scale_factor
-        y_scale = y_pos * self.scale_factor
+        for start, stop in self.framebuffer.dirty_spans():
+            # surfarray usa (x, y), por eso se traspone el bloque de filas
+            block = self.colors[pixels[start:stop]].T.repeat(scale, axis=0).repeat(scale, axis=1)
+            rect = Rect(0, start * scale, self.framebuffer.width * scale, (stop - start) * scale)
+            surfarray.blit_array(self.surface.subsurface(rect), block)
+            rects.append(rect)
 
-        if self.surface.get_at((x_scale, y_scale)) == PIXEL_STATES[0]:
-            return 0
-        else:
-            return 1
+        return rects
 
     def update(self):
-        display.flip()
-
+        """
+        Redibuja la ventana como mucho una vez por fotograma y solo en las zonas que han cambiado
+        """
+        now = perf_counter()
+        if now - self.last_update < self.frame_time:
+            return
+        self.last_update = now
+
+        rects = self.render()
+        if rects:
+            display.update(rects)
+
+    def handle_events(self, keypad):
+        """
+        Pasa al teclado de la CPU las teclas pulsadas y soltadas en la ventana (ver Config.KEYPAD_LAYOUT)
+
+        :return: False si se ha cerrado la ventana
+        """
+        running = True
+        for window_event in event.get():
+            if window_event.type == QUIT:
+                running = False
+            elif window_event.type in (KEYDOWN, KEYUP):
+                name = key.name(window_event.key)
+                if len(name) == 1 and name in KEYPAD_LAYOUT:
+                    keypad.push(KEYPAD_LAYOUT.index(name), window_event.type == KEYDOWN)
+        return running
@@ -0,0 +1,141 @@
+"""
+Estado de la CPU compartido entre procesos.
+
+El proceso de la CPU publica una vez por fotograma los registros, la pantalla y las ultimas instrucciones
+en un bloque de multiprocessing.shared_memory. La interfaz (npyscreen/pygame) lee ese bloque desde otro
+proceso, por lo que dibujar no le quita ciclos a HertzCPU ni compite con ella por el GIL.
+
+La sincronizacion es un seqlock: el escritor incrementa el numero de secuencia antes y despues de copiar
+(impar mientras escribe) y el lector repite la copia si la secuencia ha cambiado. Ninguno de los dos espera
+al otro mientras este trabaja.
+"""
+from Config import SCREEN_WIDTH, SCREEN_HEIGHT, TRACE_CAPACITY
+from multiprocessing import shared_memory
+import numpy
+
+
+def state_dtype(trace_capacity):
+    """
+    Distribucion del bloque compartido: un unico registro de numpy con todos los campos
+    """
+    return numpy.dtype([
+        ('sequence', numpy.uint64),
+        ('cycles', numpy.uint64),
+        ('halted', numpy.uint8),
+        ('trapped', numpy.uint8),
+        ('trap_opcode', numpy.uint16),
+        ('trap_address', numpy.uint16),
+        ('stop', 'S32'),
+        ('v', numpy.uint8, 16),
+        ('I', numpy.uint16),
+        ('pc', numpy.uint16),
+        ('sp', numpy.int16),
+        ('stack', numpy.uint16, 16),
+        ('delay_timer', numpy.uint8),
+        ('sound_timer', numpy.uint8),
+        ('framebuffer', numpy.uint8, (SCREEN_HEIGHT, SCREEN_WIDTH)),
+        ('trace_count', numpy.uint64),
+        ('opcodes', numpy.uint16, trace_capacity),
+        ('values', numpy.int64, trace_capacity),
+        ('sps', numpy.int16, trace_capacity),
+        ('randoms', numpy.int16, trace_capacity),
+    ])
+
+
+def format_hit(hit):
+    """
+    Texto del motivo de una parada en un punto de ruptura o de vigilancia
+    """
+    kind, location = hit
+    return kind + ' ' + (hex(location) if isinstance(location, int) else location)
+
+
+class SharedState:
+
+    def __init__(self, name=None, trace_capacity=TRACE_CAPACITY):
+        """
+        :param name: nombre de un bloque ya creado por otro proceso. Si es None se crea uno nuevo
+        :param trace_capacity: capacidad del TraceBuffer que se publica
+        """
+        self.dtype = state_dtype(trace_capacity)
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.dtype.itemsize)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.state = numpy.ndarray((), dtype=self.dtype, buffer=self.memory.buf)
+        if self.owner:
+            self.state.fill(0)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def publish(self, cpu, trace=None):
+        """
+        Copia el estado de la CPU al bloque compartido (solo desde el proceso de la CPU)
+
+        :param trace: TraceBuffer con las ultimas instrucciones, si se quiere publicar
+        """
+        state = self.state
+        registers = cpu.registers
+        state['sequence'] += 1
+
+        state['cycles'] = cpu.cycles
+        state['halted'] = cpu.halted
+        hit = cpu.breakpoints.hit
+        state['stop'] = b'' if hit is None else format_hit(hit).encode()
+        state['v'] = numpy.frombuffer(registers.v, dtype=numpy.uint8)
+        state['I'] = registers.I
+        state['pc'] = registers.pc
+        state['sp'] = registers.sp
+        state['stack'] = registers.stack
+        state['delay_timer'] = cpu.timers['delay_timer']
+        state['sound_timer'] = cpu.timers['sound_timer']
+        state['framebuffer'] = cpu.framebuffer.pixels
+        if trace is not None:
+            state['trace_count'] = trace.count
+            state['opcodes'] = trace.opcodes
+            state['values'] = trace.values
+            state['sps'] = trace.sps
+            state['randoms'] = trace.randoms
+
+        state['sequence'] += 1
+
+    def publish_trap(self, error):
+        """
+        Marca la CPU como detenida por un InvalidOpcodeError
+        """
+        state = self.state
+        state['sequence'] += 1
+        state['trapped'] = 1
+        state['trap_opcode'] = error.opcode
+        state['trap_address'] = error.address
+        state['sequence'] += 1
+
+    def read(self):
+        """
+        Copia coherente del estado publicado (desde cualquier proceso)
+
+        :return: registro de numpy independiente del bloque compartido, o None si aun no se ha publicado nada
+        """
+        state = self.state
+        while True:
+            sequence = int(state['sequence'])
+            if sequence % 2 == 1:
+                # El escritor esta a mitad de una copia
+                continue
+            snapshot = state.copy()
+            if int(state['sequence']) == sequence:
+                return snapshot if sequence else None
+
+    def load_trace(self, snapshot, trace):
+        """
+        Vuelca las instrucciones de una copia en un TraceBuffer local, p. ej. el que usa el grid de la interfaz
+        """
+        trace.load(int(snapshot['trace_count']), snapshot['opcodes'], snapshot['values'], snapshot['sps'], snapshot['randoms'])
+
+    def close(self):
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,209 @@
+"""
+Instantaneas del estado completo de la maquina.
+
+La memoria se divide en paginas de SNAPSHOT_PAGE_SIZE bytes guardadas como bytes (inmutables). Una
+instantanea solo copia las paginas escritas desde la anterior; el resto son los mismos objetos que ya
+tenia la instantanea previa, por lo que tomar miles de instantaneas cuesta poco. La CPU sabe que paginas
+se han escrito porque todas las escrituras pasan por HertzCPU.invalidate().
+
+Las instantaneas se pueden guardar en disco en un formato binario comprimido (to_bytes/from_bytes).
+"""
+from Config import MAX_MEMORY, SNAPSHOT_PAGE_SIZE
+from Timers import TIMER_NAMES
+from array import array
+import numpy
+import struct
+import zlib
+
+PAGE_COUNT = MAX_MEMORY // SNAPSHOT_PAGE_SIZE
+
+MAGIC = b'HSNP'
+FORMAT_VERSION = 3
+# magic, version, ciclos, halted, last_random, opcode, I, pc, sp, index
+HEADER = struct.Struct('<4sBQ?hHHHhH')
+# valor y ciclo de escritura de cada temporizador
+TIMER = struct.Struct('<BQ')
+# generador de la CPU: si tiene estado, version, 625 palabras de estado y gauss_next
+RANDOM_STATE = struct.Struct('<?B625I?d')
+# posicion y tamaño del buffer de numeros aleatorios, que va a continuacion
+RANDOM_BUFFER = struct.Struct('<II')
+# teclas pulsadas, parked, waiting, captured (-1 si ninguna) y numero de eventos pendientes, que van a continuacion
+KEYPAD = struct.Struct('<16s??bI')
+# ciclo (-1 si se aplica en la siguiente lectura), tecla, pulsada
+KEY_EVENT = struct.Struct('<qB?')
+
+
+def page_range(address, length):
+    """
+    :return: range con las paginas que contienen los bytes [address, address + length)
+    """
+    return range(address // SNAPSHOT_PAGE_SIZE, min((address + length - 1) // SNAPSHOT_PAGE_SIZE + 1, PAGE_COUNT))
+
+
+class Snapshot:
+    __slots__ = ('pages', 'v', 'I', 'pc', 'stack', 'sp', 'index', 'timers', 'cycles', 'halted',
+                 'opcode', 'last_random', 'random_state', 'framebuffer', 'parked', 'keypad')
+
+    @classmethod
+    def capture(cls, cpu):
+        """
+        Toma una instantanea de la CPU reutilizando las paginas que no se han escrito desde la anterior
+        """
+        memory = cpu.memory
+        pages = cpu.pages
+        dirty_pages = cpu.dirty_pages
+        for page in range(PAGE_COUNT):
+            if dirty_pages[page]:
+                start = page * SNAPSHOT_PAGE_SIZE
+                pages[page] = bytes(memory[start:start + SNAPSHOT_PAGE_SIZE])
+                dirty_pages[page] = 0
+
+        snapshot = cls()
+        registers = cpu.registers
+        snapshot.pages = tuple(pages)
+        snapshot.v = bytes(registers.v)
+        snapshot.I = registers.I
+        snapshot.pc = registers.pc
+        snapshot.stack = tuple(registers.stack)
+        snapshot.sp = registers.sp
+        snapshot.index = registers.index
+        snapshot.timers = tuple((cpu.timers.values[name], cpu.timers.set_at[name]) for name in TIMER_NAMES)
+        snapshot.cycles = cpu.cycles
+        snapshot.halted = cpu.halted
+        snapshot.opcode = cpu.opcode
+        snapshot.last_random = cpu.last_random
+        snapshot.random_state = cpu.rng.getstate()
+        snapshot.framebuffer = numpy.packbits(cpu.framebuffer.pixels).tobytes()
+        # Estado del teclado y eventos aun no aplicados: (pulsadas, waiting, captured, eventos)
+        snapshot.parked = cpu.parked
+        snapshot.keypad = cpu.keypad.state() + (tuple(cpu.keypad.events),)
+        return snapshot
+
+    def restore(self, cpu):
+        """
+        Devuelve la CPU al estado de la instantanea. Solo se copian las paginas que han cambiado.
+        """
+        memory = cpu.memory
+        pages = cpu.pages
+        for page, data in enumerate(self.pages):
+            if data is not pages[page] or cpu.dirty_pages[page]:
+                start = page * SNAPSHOT_PAGE_SIZE
+                memory[start:start + SNAPSHOT_PAGE_SIZE] = data
+                cpu.invalidate(start, SNAPSHOT_PAGE_SIZE)
+                pages[page] = data
+                cpu.dirty_pages[page] = 0
+
+        registers = cpu.registers
+        registers.v[:] = self.v
+        registers.I = self.I
+        registers.pc = self.pc
+        registers.stack[:] = array('H', self.stack)
+        registers.sp = self.sp
+        registers.index = self.index
+        for name, (value, set_at) in zip(TIMER_NAMES, self.timers):
+            cpu.timers.values[name] = value
+            cpu.timers.set_at[name] = set_at
+        cpu.cycles = self.cycles
+        cpu.halted = self.halted
+        cpu.opcode = self.opcode
+        cpu.last_random = self.last_random
+        cpu.rng.setstate(self.random_state)
+
+        cpu.parked = self.parked
+        keypad = cpu.keypad
+        pressed, waiting, captured, events = self.keypad
+        keypad.set_state(pressed, waiting, captured)
+        keypad.events.clear()
+        keypad.arrived.clear()
+        keypad.unapply(list(events))
+
+        framebuffer = cpu.framebuffer
+        bits = numpy.unpackbits(numpy.frombuffer(self.framebuffer, dtype=numpy.uint8))
+        framebuffer.pixels[:] = bits[:framebuffer.pixels.size].reshape(framebuffer.pixels.shape)
+        framebuffer.dirty.fill(True)
+
+    def to_bytes(self):
+        """
+        :return: instantanea serializada y comprimida con zlib
+        """
+        generator_state, random_buffer, random_position = self.random_state
+        version, words, gauss_next = generator_state or (0, (0,) * 625, None)
+        data = [
+            HEADER.pack(MAGIC, FORMAT_VERSION, self.cycles, self.halted,
+                        -1 if self.last_random is None else self.last_random,
+                        self.opcode, self.I, self.pc, self.sp, self.index),
+            self.v,
+            struct.pack('<16H', *self.stack),
+        ]
+        data.extend(TIMER.pack(value, set_at) for value, set_at in self.timers)
+        data.append(RANDOM_STATE.pack(generator_state is not None, version, *words, gauss_next is not None, gauss_next or 0.0))
+        data.append(RANDOM_BUFFER.pack(random_position, len(random_buffer)))
+        data.append(random_buffer)
+        keys, waiting, captured, events = self.keypad
+        data.append(KEYPAD.pack(keys, self.parked, waiting, -1 if captured is None else captured, len(events)))
+        data.extend(KEY_EVENT.pack(-1 if cycle is None else cycle, key, pressed) for cycle, key, pressed in events)
+        data.append(self.framebuffer)
+        data.extend(self.pages)
+        return zlib.compress(b''.join(data))
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        magic, version, cycles, halted, last_random, opcode, I, pc, sp, index = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a snapshot or unsupported snapshot version")
+        offset = HEADER.size
+
+        snapshot = cls()
+        snapshot.cycles = cycles
+        snapshot.halted = halted
+        snapshot.last_random = None if last_random < 0 else last_random
+        snapshot.opcode = opcode
+        snapshot.I = I
+        snapshot.pc = pc
+        snapshot.sp = sp
+        snapshot.index = index
+
+        snapshot.v = data[offset:offset + 16]
+        offset += 16
+        snapshot.stack = struct.unpack_from('<16H', data, offset)
+        offset += 32
+
+        timers = []
+        for _ in TIMER_NAMES:
+            timers.append(TIMER.unpack_from(data, offset))
+            offset += TIMER.size
+        snapshot.timers = tuple(timers)
+
+        random_state = RANDOM_STATE.unpack_from(data, offset)
+        offset += RANDOM_STATE.size
+        gauss_next = random_state[-1] if random_state[-2] else None
+        generator_state = (random_state[1], random_state[2:627], gauss_next) if random_state[0] else None
+        random_position, random_size = RANDOM_BUFFER.unpack_from(data, offset)
+        offset += RANDOM_BUFFER.size
+        snapshot.random_state = (generator_state, data[offset:offset + random_size], random_position)
+        offset += random_size
+
+        keys, snapshot.parked, waiting, captured, event_count = KEYPAD.unpack_from(data, offset)
+        offset += KEYPAD.size
+        events = []
+        for _ in range(event_count):
+            cycle, key, key_pressed = KEY_EVENT.unpack_from(data, offset)
+            events.append((None if cycle < 0 else cycle, key, key_pressed))
+            offset += KEY_EVENT.size
+        snapshot.keypad = (keys, waiting, None if captured < 0 else captured, tuple(events))
+
+        framebuffer_size = len(data) - offset - MAX_MEMORY
+        snapshot.framebuffer = data[offset:offset + framebuffer_size]
+        offset += framebuffer_size
+        snapshot.pages = tuple(data[start:start + SNAPSHOT_PAGE_SIZE] for start in range(offset, len(data), SNAPSHOT_PAGE_SIZE))
+        return snapshot
+
+    def save(self, path):
+        with open(path, 'wb') as output:
+            output.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as snapshot_file:
+            return cls.from_bytes(snapshot_file.read())
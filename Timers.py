@@ -0,0 +1,64 @@
+from Config import TIMER_FREQUENCY
+
+TIMER_NAMES = ('delay_timer', 'sound_timer')
+
+
+class Timers:
+    """
+    Temporizadores delay y sound de la CPU.
+
+    Ambos llevan a cabo una cuenta regresiva a 60Hz hasta llegar a 0. En lugar de descontarlos en cada
+    instruccion se guarda el valor escrito y el ciclo en el que se escribio: el valor actual se calcula
+    solo cuando se lee, a partir de los ciclos transcurridos. Mientras ambos estan a 0 no cuestan nada.
+    Admite el acceso como diccionario (timers['delay_timer']).
+    """
+    __slots__ = ('cpu', 'clock_speed', 'values', 'set_at')
+
+    def __init__(self, cpu, clock_speed):
+        """
+        :param cpu: CPU cuyo contador de ciclos marca el tiempo emulado
+        :param clock_speed: instrucciones por segundo de la CPU emulada
+        """
+        if clock_speed <= 0:
+            # Los temporizadores avanzan con los ciclos: sin velocidad de reloj no hay tiempo emulado
+            raise ValueError("clock_speed must be positive, got " + str(clock_speed))
+        self.cpu = cpu
+        self.clock_speed = clock_speed
+        self.values = {name: 0 for name in TIMER_NAMES}
+        self.set_at = {name: 0 for name in TIMER_NAMES}
+
+    def __getitem__(self, name):
+        value = self.values[name]
+        if value == 0:
+            return 0
+        ticks = (self.cpu.cycles - self.set_at[name]) * TIMER_FREQUENCY // self.clock_speed
+        return max(value - ticks, 0)
+
+    def __setitem__(self, name, value):
+        self.values[name] = int(value)
+        self.set_at[name] = self.cpu.cycles
+
+    def cycles_until_zero(self, name):
+        """
+        :return: ciclos que faltan para que el temporizador llegue a 0
+        """
+        return self.cycles_until(name, 0)
+
+    def cycles_until(self, name, target):
+        """
+        :return: ciclos que faltan para que el temporizador baje hasta target (0 si ya esta en target o por debajo)
+        """
+        if self[name] <= target:
+            return 0
+        # Primer ciclo en el que los ticks transcurridos desde set_at alcanzan los que faltan hasta target
+        elapsed = -(-(self.values[name] - target) * self.clock_speed // TIMER_FREQUENCY)
+        return self.set_at[name] + elapsed - self.cpu.cycles
+
+    def tick(self):
+        """
+        Descuenta manualmente un periodo de 60Hz en los temporizadores activos
+        """
+        for name in TIMER_NAMES:
+            value = self[name]
+            if value > 0:
+                self[name] = value - 1
@@ -0,0 +1,90 @@
+from Disassembler import describe_result, destination_value, disassemble
+from array import array
+
+
+class TraceBuffer:
+    """
+    Buffer circular de capacidad fija con las ultimas instrucciones ejecutadas.
+
+    Por cada instruccion solo se guardan unos pocos enteros (OPCODE, valor del destino, SP y numero
+    aleatorio) en arrays reservados de antemano. Las filas de texto (Instruction, Mnemonic, Human, Result)
+    se construyen cuando alguien las lee, por lo que puede usarse directamente como values de un Grid.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.opcodes = array('H', [0] * capacity)
+        self.values = array('l', [0] * capacity)
+        self.sps = array('h', [0] * capacity)
+        self.randoms = array('h', [-1] * capacity)
+        # Filas que no son instrucciones (HALT, TRAP, DUMP...) indexadas por su posicion en el buffer
+        self.rows = {}
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __getitem__(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("trace index out of range")
+
+        slot = (self.count - length + index) % self.capacity
+        row = self.rows.get(slot)
+        if row is not None:
+            return row
+
+        opcode = self.opcodes[slot]
+        if opcode == 0x0:
+            return hex(opcode), "HALT"
+        random_number = self.randoms[slot]
+        mnemonic, human = disassemble(opcode, None if random_number < 0 else random_number)
+        return hex(opcode), mnemonic, human, describe_result(opcode, self.values[slot], self.sps[slot])
+
+    def next_slot(self):
+        slot = self.count % self.capacity
+        self.count += 1
+        self.rows.pop(slot, None)
+        return slot
+
+    def record(self, cpu, opcode):
+        """
+        Guarda la instruccion que acaba de ejecutar la CPU
+        """
+        slot = self.next_slot()
+        self.opcodes[slot] = opcode
+        if opcode == 0x0:
+            # HALT no tiene destino: al leer la fila basta con el OPCODE
+            return
+
+        self.values[slot] = destination_value(cpu, opcode)
+        self.sps[slot] = cpu.registers.sp
+        self.randoms[slot] = -1 if cpu.last_random is None else cpu.last_random
+
+    def append_row(self, row):
+        """
+        Añade una fila ya formateada
+        """
+        self.rows[self.next_slot()] = row
+
+    def load(self, count, opcodes, values, sps, randoms):
+        """
+        Sustituye el contenido por columnas copiadas de otro buffer de la misma capacidad (p. ej. de SharedState)
+        """
+        self.opcodes[:] = array('H', opcodes)
+        self.values[:] = array('l', values)
+        self.sps[:] = array('h', sps)
+        self.randoms[:] = array('h', randoms)
+        self.rows.clear()
+        self.count = count
+
+    def tracer(self, cpu):
+        """
+        :return: funcion para el parametro trace de HertzCPU.run
+        """
+        def trace(opcode):
+            self.record(cpu, opcode)
+
+        return trace
@@ -0,0 +1,193 @@
+"""
+Traza binaria de ejecucion.
+
+Cada instruccion ejecutada se guarda como un registro de tamaño fijo (RECORD) en un buffer reservado de
+antemano: PC, OPCODE, registro modificado, su nuevo valor, SP, numero aleatorio y banderas. Cuando el buffer
+se llena se entrega a un hilo que lo escribe en el archivo y se sigue con otro buffer, de forma que la CPU
+no espera al disco.
+
+El decodificador carga el archivo en un array estructurado de NumPy (load) y reconstruye las columnas
+Instruction, Mnemonic, Human y Result del interfaz (rows).
+
+    python TraceFile.py traza.bin [-n FILAS]
+"""
+from Config import TRACE_CHUNK_RECORDS
+from Disassembler import FORMATS, describe_result, destination_value, disassemble, instruction_kind
+from queue import Queue
+import argparse
+import numpy
+import struct
+import threading
+
+MAGIC = b'HTRC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBB')
+
+# pc, opcode, registro modificado, banderas, sp, valor, numero aleatorio
+RECORD = struct.Struct('<HHBBhih')
+RECORD_DTYPE = numpy.dtype([
+    ('pc', '<u2'), ('opcode', '<u2'), ('register', 'u1'), ('flags', 'u1'),
+    ('sp', '<i2'), ('value', '<i4'), ('random', '<i2')
+])
+
+# Banderas
+FLAG_RANDOM = 0x1
+FLAG_HALT = 0x2
+
+# Codigo del registro modificado para los destinos que no son un registro V
+REGISTER_CODES = {'I': 16, 'pc': 17, 'delay_timer': 18, 'sound_timer': 19, 'skip': 20, None: 255}
+REGISTER_NAMES = {code: name for name, code in REGISTER_CODES.items()}
+
+register_table = None
+
+
+def build_register_table():
+    """
+    :return: codigo del registro que modifica cada uno de los 65536 OPCODES
+    """
+    table = bytearray(0x10000)
+    for opcode in range(0x10000):
+        destination = FORMATS[instruction_kind(opcode)][3]
+        if destination == 'vx':
+            table[opcode] = (opcode & 0x0F00) >> 8
+        elif destination == 'vf':
+            table[opcode] = 0xF
+        else:
+            table[opcode] = REGISTER_CODES[destination]
+    return table
+
+
+def register_name(code):
+    """
+    :return: nombre del registro a partir de su codigo ('V3', 'I', 'pc'...)
+    """
+    return 'V' + str(code) if code < 16 else str(REGISTER_NAMES[code])
+
+
+class TraceWriter:
+
+    def __init__(self, path, cpu, chunk_records=TRACE_CHUNK_RECORDS):
+        """
+        :param path: archivo de la traza (se sobrescribe)
+        :param cpu: CPU cuyas instrucciones se registran
+        :param chunk_records: registros por buffer; cada buffer lleno se escribe de una vez
+        """
+        global register_table
+        if register_table is None:
+            register_table = build_register_table()
+        self.register_table = register_table
+
+        self.cpu = cpu
+        self.chunk_size = chunk_records * RECORD.size
+        self.buffer = bytearray(self.chunk_size)
+        self.offset = 0
+        self.records = 0
+        # El PC de la siguiente instruccion: la funcion de traza se llama cuando el PC ya ha avanzado
+        self.pc = cpu.registers.pc
+
+        # Buffers libres y buffers pendientes de escribir; dos bastan para que la CPU no espere
+        self.free = Queue()
+        self.free.put(bytearray(self.chunk_size))
+        self.pending = Queue()
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size))
+        self.thread = threading.Thread(target=self.write_chunks, daemon=True)
+        self.thread.start()
+
+    def record(self, opcode):
+        """
+        Registra la instruccion que acaba de ejecutar la CPU. Se usa como parametro trace de HertzCPU.run
+        """
+        cpu = self.cpu
+        registers = cpu.registers
+        flags = 0
+        random_number = -1
+        if opcode == 0x0:
+            flags = FLAG_HALT
+            value = 0
+        else:
+            value = destination_value(cpu, opcode)
+            if cpu.last_random is not None and opcode & 0xF000 == 0xC000:
+                flags = FLAG_RANDOM
+                random_number = cpu.last_random
+
+        RECORD.pack_into(self.buffer, self.offset, self.pc, opcode, self.register_table[opcode], flags,
+                         registers.sp, value, random_number)
+        self.pc = registers.pc
+        self.records += 1
+        self.offset += RECORD.size
+        if self.offset == self.chunk_size:
+            self.flush()
+
+    __call__ = record
+
+    def flush(self):
+        """
+        Entrega el buffer actual al hilo escritor y continua con uno libre
+        """
+        if self.offset:
+            self.pending.put(memoryview(self.buffer)[:self.offset])
+            self.buffer = self.free.get()
+            self.offset = 0
+
+    def write_chunks(self):
+        while True:
+            chunk = self.pending.get()
+            if chunk is None:
+                break
+            self.file.write(chunk)
+            self.free.put(chunk.obj)
+
+    def close(self):
+        self.flush()
+        self.pending.put(None)
+        self.thread.join()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def load(path):
+    """
+    :return: array estructurado de NumPy (RECORD_DTYPE) con todos los registros de la traza
+    """
+    with open(path, 'rb') as trace_file:
+        magic, version, record_size = HEADER.unpack(trace_file.read(HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError("Not a trace file or unsupported trace version")
+        return numpy.fromfile(trace_file, dtype=RECORD_DTYPE)
+
+
+def row(record):
+    """
+    :return: columnas (Instruction, Mnemonic, Human, Result) de un registro, como en el interfaz
+    """
+    opcode = int(record['opcode'])
+    if record['flags'] & FLAG_HALT:
+        return hex(opcode), "HALT"
+    random_number = int(record['random']) if record['flags'] & FLAG_RANDOM else None
+    mnemonic, human = disassemble(opcode, random_number)
+    return hex(opcode), mnemonic, human, describe_result(opcode, int(record['value']), int(record['sp']))
+
+
+def rows(records):
+    for record in records:
+        yield row(record)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Muestra una traza binaria grabada con TraceWriter')
+    parser.add_argument('trace')
+    parser.add_argument('-n', '--rows', dest='rows', type=int, help='muestra solo las ultimas filas')
+    args = parser.parse_args()
+
+    records = load(args.trace)
+    if args.rows:
+        records = records[-args.rows:]
+    for record in records:
+        print(hex(record['pc']).ljust(8) + '  '.join(row(record)))
@@ -1,12 +1,26 @@
-from CPU import HertzCPU
-from pygame import time
+from CPU import HertzCPU, InvalidOpcodeError
+from Clock import FrameClock
+from Config import CLOCK_SPEED, KEYPAD_LAYOUT, TERMINAL_KEY_HOLD, TRACE_CAPACITY, TRACE_REFRESH_RATE, WAIT_TIMEOUT
+from ControlFlow import ControlFlowGraph
+from SharedState import SharedState
+from Trace import TraceBuffer
+from TraceFile import TraceWriter
+import multiprocessing
 import npyscreen
-import threading
 import argparse
+import queue
+import threading
+import time
 
 inputfile = ''
 clockspeed = 0
 dump = False
+breakpoints = []
+tracefile = None
+
+TRACE_TITLES = ('Instruction', 'Mnemonic', 'Human', 'Result')
+# Filas de ControlFlowGraph.listing()
+LISTING_TITLES = ('Address', 'Instruction', 'Mnemonic', 'Human')
 
 class Interprete(npyscreen.NPSAppManaged):
     def onStart(self):
@@ -14,44 +28,183 @@ class Interprete(npyscreen.NPSAppManaged):
 
 class MainForm(npyscreen.Form):
     def create(self):
-        self.grid_instrucciones = self.add(npyscreen.GridColTitles, always_show_cursor=True, col_titles=('Instruction', 'Mnemonic', 'Human', 'Result'))
-        self.grid_instrucciones.set_grid_values_from_flat_list([])
-
-        thread_time = threading.Thread(target=self.execute,args=())
-        thread_time.daemon = True
-        thread_time.start()
+        self.grid_instrucciones = self.add(npyscreen.GridColTitles, always_show_cursor=True, col_titles=TRACE_TITLES)
+        # El grid lee las filas directamente del buffer circular: la memoria usada no crece con la ejecucion
+        self.trace = TraceBuffer(TRACE_CAPACITY)
+        self.grid_instrucciones.values = self.trace
+        self.finished = False
+        self.sequence = 0
+
+        # La pantalla se redibuja desde el hilo de npyscreen (while_waiting) con lo que publica el proceso de la CPU
+        self.keypress_timeout = max(1, round(10 / TRACE_REFRESH_RATE))
+
+        # El grid tiene el foco y atiende las teclas antes que el formulario, y ya usa algunas (g, q, h/j/k/l):
+        # nuestras teclas se registran en el propio grid con su codigo, que tiene prioridad sobre las suyas
+
+        # La tecla g reanuda la CPU cuando se detiene en un punto de ruptura o en una pausa (tecla p).
+        # La c forma parte del teclado hexadecimal (Config.KEYPAD_LAYOUT)
+        self.resume = multiprocessing.Event()
+        self.pause = multiprocessing.Event()
+        self.grid_instrucciones.add_handlers({ord('g'): self.continue_execution, ord('p'): self.pause_execution})
+
+        # Las teclas de KEYPAD_LAYOUT se envian al teclado de la CPU; shutdown avisa al proceso de que termine.
+        # La q (tecla 0x4) ya no cierra el grid: se sale con ESC o TAB
+        self.keys = multiprocessing.Queue()
+        self.shutdown = multiprocessing.Event()
+        self.grid_instrucciones.add_handlers({ord(name): self.press_key for name in KEYPAD_LAYOUT})
+
+        # La tecla l alterna entre la traza y el listado estatico de toda la ROM (ver ControlFlow.py).
+        # El grid la usa para moverse a la derecha: se registra en el con su codigo, como las anteriores
+        self.listing = ControlFlowGraph.from_rom(inputfile, 0).listing()
+        self.showing_listing = False
+        self.grid_instrucciones.add_handlers({ord('l'): self.toggle_listing})
+
+        self.shared = SharedState()
+        process_cpu = multiprocessing.Process(target=execute, args=(self.shared.name, inputfile, clockspeed, breakpoints, self.resume, tracefile,
+                                                                       self.keys, self.pause, self.shutdown))
+        process_cpu.daemon = True
+        process_cpu.start()
+
+    def while_waiting(self):
+        if not self.finished:
+            self.update_trace()
+
+        if self.showing_listing:
+            self.grid_instrucciones.display()
+            return
+
+        # Mostramos siempre las ultimas instrucciones ejecutadas
+        visible_rows = len(self.grid_instrucciones._my_widgets)
+        self.grid_instrucciones.begin_row_display_at = max(0, len(self.trace) - visible_rows)
+        self.grid_instrucciones.display()
+
+    def update_trace(self):
+        snapshot = self.shared.read()
+        if snapshot is None or snapshot['sequence'] == self.sequence:
+            return
+        self.sequence = snapshot['sequence']
+        self.shared.load_trace(snapshot, self.trace)
+
+        if snapshot['stop']:
+            self.trace.append_row((hex(snapshot['pc']), "BREAK", snapshot['stop'].decode(), "g: continue"))
+
+        # Una vez detenida la CPU ya no se publica nada mas: las filas finales se añaden aqui
+        if snapshot['trapped']:
+            self.trace.append_row((hex(snapshot['trap_opcode']), "TRAP", hex(snapshot['trap_address'])))
+            self.finished = True
+        elif snapshot['halted']:
+            if dump:
+                for i, registro in enumerate(snapshot['v']):
+                    self.trace.append_row(("0x0", "DUMP V" + str(i), bin(registro)))
+            self.finished = True
+
+    def continue_execution(self, key):
+        self.pause.clear()
+        self.resume.set()
+
+    def pause_execution(self, key):
+        self.pause.set()
+
+    def press_key(self, key):
+        self.keys.put(KEYPAD_LAYOUT.index(chr(key)))
+
+    def toggle_listing(self, key):
+        self.showing_listing = not self.showing_listing
+        self.grid_instrucciones.values = self.listing if self.showing_listing else self.trace
+        self.grid_instrucciones.col_titles = LISTING_TITLES if self.showing_listing else TRACE_TITLES
+        self.grid_instrucciones.begin_row_display_at = 0
 
     def afterEditing(self):
+        self.shutdown.set()
+        self.shared.close()
         self.parentApp.setNextForm(None)
 
-    def execute(self):
-        cpu = HertzCPU()
-
-        cpu.load_rom(inputfile, 0)
-
-        internalClock = time.Clock()
-
-        running = True
-
-        while running:
-            internalClock.tick_busy_loop(clockspeed)  # Limita la CPU a funcionar a 1hz
-            cpu.decrement_timers()
-            instruccion = cpu.execute_instruction()
-
-            if instruccion == 0x0:
-                self.grid_instrucciones.values.append((hex(instruccion), "HALT"))
-                running = False
-            else:
-                self.grid_instrucciones.values.append((hex(instruccion), cpu.instruction_name[0], cpu.instruction_name[1], cpu.instruction_name[2]))
-
-            if instruccion == 0x0:
-                running = False
-                if dump:
-                    for i, registro in enumerate(cpu.registers['v']):
-                        self.grid_instrucciones.values.append(("0x0", "DUMP V" + str(i), bin(registro)))
-
-            self.grid_instrucciones.display()
 
+def forward_keys(keys, keypad, shutdown):
+    """
+    Hilo del proceso de la CPU: pasa al teclado las teclas recibidas del formulario.
+    El terminal no avisa al soltar una tecla, asi que se suelta sola tras TERMINAL_KEY_HOLD segundos
+    """
+    while not shutdown.is_set():
+        try:
+            key = keys.get(timeout=WAIT_TIMEOUT)
+        except queue.Empty:
+            continue
+        keypad.press(key)
+        time.sleep(TERMINAL_KEY_HOLD)
+        keypad.release(key)
+
+
+def wait_until(wait, shutdown):
+    """
+    Llama a wait(WAIT_TIMEOUT) hasta que devuelva True o se pida terminar
+
+    :return: False si se ha pedido terminar
+    """
+    while not wait(WAIT_TIMEOUT):
+        if shutdown.is_set():
+            return False
+    return True
+
+
+def execute(shared_name, inputfile, clockspeed, breakpoints, resume, tracefile=None, keys=None, pause=None, shutdown=None):
+    """
+    Proceso de la CPU: ejecuta la ROM y publica su estado en el bloque compartido una vez por fotograma
+
+    :param breakpoints: direcciones donde detenerse hasta que se active resume
+    :param tracefile: archivo opcional donde grabar la traza binaria completa (ver TraceFile.py)
+    :param keys: cola con las teclas 0x0-0xF pulsadas en el formulario
+    :param pause: evento que detiene la CPU hasta que se active resume
+    :param shutdown: evento que termina el proceso
+    """
+    pause = pause or multiprocessing.Event()
+    shutdown = shutdown or multiprocessing.Event()
+    shared = SharedState(shared_name)
+    cpu = HertzCPU(clock_speed=clockspeed or CLOCK_SPEED)
+
+    cpu.load_rom(inputfile, 0)
+    for address in breakpoints:
+        cpu.breakpoints.add_breakpoint(address)
+
+    # La CPU ejecuta los ciclos de cada fotograma de golpe y solo espera al reloj una vez por fotograma
+    internalClock = FrameClock(clockspeed)
+    trace = TraceBuffer(TRACE_CAPACITY)
+    tracer = trace.tracer(cpu)
+    writer = None
+    if tracefile:
+        writer = TraceWriter(tracefile, cpu)
+        record = trace.record
+
+        def tracer(opcode):
+            record(cpu, opcode)
+            writer.record(opcode)
+
+    if keys is not None:
+        threading.Thread(target=forward_keys, args=(keys, cpu.keypad, shutdown), daemon=True).start()
+
+    while not cpu.halted and not shutdown.is_set():
+        try:
+            cpu.run(internalClock.cycles_per_frame(), tracer)
+        except InvalidOpcodeError as error:
+            shared.publish(cpu, trace)
+            shared.publish_trap(error)
+            break
+
+        shared.publish(cpu, trace)
+        if cpu.breakpoints.hit is not None or pause.is_set():
+            if not wait_until(resume.wait, shutdown):
+                break
+            resume.clear()
+        if cpu.parked and not cpu.timers['delay_timer'] and not cpu.timers['sound_timer']:
+            # FX0A sin temporizadores en marcha: no hay nada que emular hasta que llegue una tecla o una pausa
+            if not wait_until(lambda timeout: cpu.keypad.wait(timeout) or pause.is_set(), shutdown):
+                break
+        else:
+            internalClock.wait()
+
+    if writer is not None:
+        writer.close()
+    shared.close()
 
 if __name__ == '__main__':
 
@@ -59,6 +212,8 @@ if __name__ == '__main__':
     parser.add_argument('-f', '--file', dest='file')
     parser.add_argument('-c', '--clockspeed', dest='clock_speed')
     parser.add_argument('-d', '--dump', action='count')
+    parser.add_argument('-t', '--tracefile', dest='tracefile')
+    parser.add_argument('-b', '--breakpoint', dest='breakpoints', action='append', default=[], type=lambda address: int(address, 0))
     args = parser.parse_args()
 
     if args.file != None and args.clock_speed != None:
@@ -66,6 +221,8 @@ if __name__ == '__main__':
         inputfile = args.file
         if args.dump == 1:
             dump = True
+        breakpoints = args.breakpoints
+        tracefile = args.tracefile
         interprete = Interprete()
         interprete.run()
     else:
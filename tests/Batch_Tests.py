@@ -0,0 +1,57 @@
+import unittest
+import os
+import tempfile
+from Batch import find_roms, parse_dump, run_batch
+
+# LD V1, 5 ; ADD V1, 1 ; HALT
+PROGRAM = bytes([0x61, 0x05, 0x71, 0x01, 0x00, 0x00])
+# JP 0x0
+LOOP = bytes([0x10, 0x00])
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        for name, program in (('add.ch8', PROGRAM), ('wrong.ch8', PROGRAM), ('loop.ch8', LOOP)):
+            with open(os.path.join(self.path, name), 'wb') as rom:
+                rom.write(program)
+        with open(os.path.join(self.path, 'add.dump'), 'w') as dump:
+            dump.write("DUMP V0 0b0\nDUMP V1 0b110\n")
+        with open(os.path.join(self.path, 'wrong.dump'), 'w') as dump:
+            dump.write("V1 0x7\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_dump(self):
+        self.assertEqual({0: 0, 1: 6, 15: 255}, parse_dump("DUMP V0 0b0\nV1 6\n\nV15 0xff\n"))
+
+    def test_run_batch(self):
+        roms = find_roms([self.path])
+        self.assertEqual(['add.ch8', 'loop.ch8', 'wrong.ch8'], [os.path.basename(rom) for rom in roms])
+
+        report = run_batch(roms, cycles=100, jobs=2)
+        add, loop, wrong = report['results']
+
+        self.assertEqual(1, report['passed'])
+        self.assertEqual(2, report['failed'])
+        self.assertTrue(add['passed'])
+        self.assertEqual(3, add['cycles'])
+        self.assertFalse(loop['halted'])
+        self.assertEqual(100, loop['cycles'])
+        self.assertEqual(['V1'], wrong['mismatches'])
+
+    def test_breakpoint(self):
+        report = run_batch([os.path.join(self.path, 'add.ch8')], cycles=100, jobs=1, breakpoints=[0x2])
+        result = report['results'][0]
+
+        self.assertFalse(result['passed'])
+        self.assertEqual({'kind': 'breakpoint', 'location': '0x2'}, result['stop'])
+        self.assertEqual(1, result['cycles'])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import Benchmark
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_every_handler_is_measured(self):
+        results = Benchmark.instruction_benchmarks(iterations=10)
+        names = {name.split()[0] for name in results}
+
+        cpu = Benchmark.HertzCPU()
+        handlers = list(cpu.general_opcode_lookup.values()) + list(cpu.logic_opcode_lookup.values()) + \
+            list(cpu.misc_opcode_lookup.values()) + list(cpu.key_opcode_lookup.values())
+        dispatchers = {cpu.execute_logic_instruction.__name__, cpu.execute_misc_instruction.__name__,
+                       cpu.execute_key_instruction.__name__}
+        self.assertEqual({handler.__name__ for handler in handlers} - dispatchers, names)
+
+    def test_programs(self):
+        results = Benchmark.program_benchmarks(cycles=200)
+        self.assertEqual(8, len(results))
+        self.assertTrue(all(value > 0 for value in results.values()))
+
+    def test_compare(self):
+        baseline = {'instructions_ns': {'a': 100.0, 'b': 100.0}, 'programs_ips': {'rom': 1000.0, 'other': 1000.0}}
+        results = {'instructions_ns': {'a': 110.0, 'b': 130.0, 'c': 1.0},
+                   'programs_ips': {'rom': 700.0, 'other': 900.0, 'new': 5.0}}
+
+        # Las instrucciones se ralentizan de media 1.196 veces y los programas 1.318
+        regressions = Benchmark.compare(results, baseline, threshold=0.2, entry_threshold=1.0)
+        self.assertEqual([('instructions_ns', 'c', None, 1.0), ('programs_ips', 'new', None, 5.0)], regressions[:2])
+        self.assertEqual(('programs_ips', 'geometric mean slowdown', 1.0), regressions[2][:3])
+        self.assertAlmostEqual((1000 / 700 * 1000 / 900) ** 0.5, regressions[2][3])
+
+        # Las medidas sin referencia se informan aunque el umbral sea amplio
+        self.assertEqual([('instructions_ns', 'c', None, 1.0), ('programs_ips', 'new', None, 5.0)],
+                         Benchmark.compare(results, baseline, threshold=0.5, entry_threshold=1.0))
+
+        # Una sola medida solo cuenta si empeora mas de entry_threshold
+        results['instructions_ns']['b'] = 250.0
+        regressions = Benchmark.compare(results, baseline, threshold=0.5, entry_threshold=1.0)
+        self.assertEqual(('instructions_ns', 'b', 100.0, 250.0), regressions[0])
+        self.assertEqual(('instructions_ns', 'geometric mean slowdown', 1.0), regressions[2][:3])
+        self.assertAlmostEqual((1.1 * 2.5) ** 0.5, regressions[2][3])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
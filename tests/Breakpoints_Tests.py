@@ -0,0 +1,89 @@
+import unittest
+from CPU import HertzCPU
+
+# 0x000 LD V0, 7 ; LD I, 0x300 ; ADD V1, 1 ; LD [I], V2 ; LD V3, [I] ; JP 0x004
+PROGRAM = bytes([0x60, 0x07, 0xa3, 0x00, 0x71, 0x01, 0xf2, 0x55, 0xf3, 0x65, 0x10, 0x04])
+
+
+class BreakpointsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = HertzCPU()
+        self.cpu.memory[0:len(PROGRAM)] = PROGRAM
+        self.breakpoints = self.cpu.breakpoints
+
+    def test_breakpoint(self):
+        self.breakpoints.add_breakpoint(0x4)
+
+        self.assertEqual(2, self.cpu.run(100))
+        self.assertEqual(('breakpoint', 0x4), self.breakpoints.hit)
+        self.assertEqual(0x4, self.cpu.registers.pc)
+
+        # Al continuar se ejecuta la instruccion del punto de ruptura y se vuelve a parar en la siguiente vuelta
+        self.assertEqual(4, self.cpu.run(100))
+        self.assertEqual(0x4, self.cpu.registers.pc)
+        self.assertEqual(1, self.cpu.registers.v[1])
+
+        self.breakpoints.remove_breakpoint(0x4)
+        self.assertFalse(self.breakpoints.active)
+        self.assertEqual(100, self.cpu.run(100))
+        self.assertIsNone(self.breakpoints.hit)
+
+    def test_run_until(self):
+        self.breakpoints.add_breakpoint(0x2)
+
+        self.assertEqual(1, self.cpu.run_until(lambda cpu: False, 50))
+        self.assertEqual(('breakpoint', 0x2), self.breakpoints.hit)
+
+        self.breakpoints.watch_memory(0x300)
+        self.assertEqual(2, self.cpu.run_until(lambda cpu: False, 50))
+        self.assertEqual(('write', 0x300), self.breakpoints.hit)
+        self.assertEqual(0x6, self.cpu.registers.pc)
+
+    def test_memory_watchpoints(self):
+        self.breakpoints.watch_memory(0x302, 0x304)
+        self.cpu.run(100)
+        self.assertEqual(('write', 0x302), self.breakpoints.hit)
+        self.assertEqual(0x6, self.cpu.registers.pc)
+
+        self.breakpoints.unwatch_memory(0x302, 0x304)
+        self.breakpoints.watch_memory(0x303, read=True, write=False)
+        self.cpu.run(100)
+        self.assertEqual(('read', 0x303), self.breakpoints.hit)
+        self.assertEqual(0x8, self.cpu.registers.pc)
+
+    def test_register_watchpoints(self):
+        self.breakpoints.watch_register(1)
+        self.cpu.run(100)
+        self.assertEqual(('write', 'V1'), self.breakpoints.hit)
+        self.assertEqual(0x4, self.cpu.registers.pc)
+
+        self.breakpoints.clear()
+        self.breakpoints.watch_register(2, read=True, write=False)
+        self.cpu.run(100)
+        self.assertEqual(('read', 'V2'), self.breakpoints.hit)
+        self.assertEqual(0x6, self.cpu.registers.pc)
+
+    def test_parked_watchpoint(self):
+        # 0x000 LD V3, K ; JP 0x000
+        self.cpu.memory[0:4] = bytes([0xf3, 0x0a, 0x10, 0x00])
+        self.breakpoints.watch_register(3)
+        self.assertEqual(0, self.cpu.run(100))
+        self.assertEqual(('write', 'V3'), self.breakpoints.hit)
+
+        # Aparcada en FX0A la instruccion se repite en cada run() sin volver a detenerse
+        self.assertEqual(100, self.cpu.run(100))
+        self.assertTrue(self.cpu.parked)
+        self.assertIsNone(self.breakpoints.hit)
+        self.assertEqual(100, self.cpu.run(100))
+        self.assertIsNone(self.breakpoints.hit)
+
+        self.cpu.keypad.press(0x7)
+        self.cpu.run(1)
+        self.assertFalse(self.cpu.parked)
+        self.assertEqual(0x7, self.cpu.registers.v[3])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
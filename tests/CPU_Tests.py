@@ -1,5 +1,5 @@
 import unittest
-from CPU import Chip8Cpu
+from CPU import HertzCPU, InvalidOpcodeError
 import numpy
 
 class CpuTests(unittest.TestCase):
@@ -7,7 +7,7 @@ class CpuTests(unittest.TestCase):
 
     # Preparamos la CPU para ser usada durante los tests
     def setUp(self):
-        self.cpu = Chip8Cpu()
+        self.cpu = HertzCPU()
 
     def test_rom(self):
         # Comprueba si podemos cargar un archivo en memoria correctamente
@@ -26,17 +26,21 @@ class CpuTests(unittest.TestCase):
         self.assertEqual(0x1, self.cpu.registers['v'][0xb])
 
     def test_skip_if_vx_equals_nn(self):
+        # Estos tests se escribieron con el programa empezando en 0x200 (CHIP-8); Hertz empieza en 0
+        self.cpu.registers['pc'] = 0x200
         self.cpu.opcode = 0x3c21
         self.cpu.registers['v'][0xc] = 0x21
         self.cpu.skip_if_vx_equals_nn()
         self.assertEqual(0x202, self.cpu.registers['pc'])
 
     def test_skip_if_vx_not_equals_nn(self):
+        self.cpu.registers['pc'] = 0x200
         self.cpu.opcode = 0x4222
         self.cpu.skip_if_vx_not_equals_nn()
         self.assertEqual(0x202, self.cpu.registers['pc'])
 
     def test_skip_if_vx_equals_vy(self):
+        self.cpu.registers['pc'] = 0x200
         self.cpu.opcode = 0x5c20
         self.cpu.registers['v'][0xc] = 0x23
         self.cpu.registers['v'][0x2] = 0x23
@@ -44,6 +48,7 @@ class CpuTests(unittest.TestCase):
         self.assertEqual(0x202, self.cpu.registers['pc'])
 
     def test_skip_if_vx_not_equals_vy(self):
+        self.cpu.registers['pc'] = 0x200
         self.cpu.opcode = 0x92f0
         self.cpu.registers['v'][0x2] = 22
         self.cpu.skip_if_vx_not_equals_vy()
@@ -240,6 +245,129 @@ class CpuTests(unittest.TestCase):
         self.assertEqual(0x0, self.cpu.memory[0x0])
         self.assertEqual(0x2, self.cpu.memory[0x1])
 
+    def test_instruction_name(self):
+        # El texto de la instruccion solo se construye al consultarlo
+        self.cpu.memory[0x0] = 0x7c
+        self.cpu.memory[0x1] = 0x23
+        self.cpu.registers['pc'] = 0x0
+        self.cpu.registers['v'][0xc] = numpy.uint8(0x1)
+        self.cpu.execute_instruction()
+
+        self.assertEqual(('ADD V12, 35', 'V12 <= V12 + 35', 'V12 = 36'), self.cpu.instruction_name)
+
+    def test_opcode_table(self):
+        # Cada entrada de la tabla guarda el manejador y los operandos ya decodificados
+        handler, operands = self.cpu.opcode_table[0x8ab4]
+        self.assertEqual(self.cpu.add_vy_to_vx.function, handler)
+        self.assertEqual((0xa, 0xb), operands)
+
+    def test_invalid_opcode(self):
+        self.cpu.memory[0x0] = 0x80
+        self.cpu.memory[0x1] = 0x0f
+        self.cpu.registers['pc'] = 0x0
+
+        with self.assertRaises(InvalidOpcodeError) as trap:
+            self.cpu.execute_instruction()
+        self.assertEqual(0x800f, trap.exception.opcode)
+        self.assertEqual(0x0, trap.exception.address)
+
+    def test_self_modifying_code(self):
+        # LD V3, 5 ; LD [I], V1
+        self.cpu.memory[0x0:0x4] = bytes([0x63, 0x05, 0xf1, 0x55])
+        self.cpu.registers['pc'] = 0x0
+        self.cpu.execute_instruction()
+        self.assertEqual(0x5, self.cpu.registers['v'][0x3])
+
+        # Sobrescribimos la primera instruccion con LD V3, 7
+        self.cpu.registers['v'][0x0] = numpy.uint8(0x63)
+        self.cpu.registers['v'][0x1] = numpy.uint8(0x07)
+        self.cpu.registers['I'] = numpy.uint16(0x0)
+        self.cpu.execute_instruction()
+
+        self.cpu.registers['pc'] = 0x0
+        self.cpu.execute_instruction()
+        self.assertEqual(0x7, self.cpu.registers['v'][0x3])
+        self.assertEqual(3, self.cpu.cache_stats()['misses'])
+
+    def test_cache_stats(self):
+        # 0x000 ADD V0, 1 ; JP 0x004 ; 0x004 JP 0x004 (bucle de espera que se salta)
+        self.cpu.memory[0x0:0x6] = bytes([0x70, 0x01, 0x10, 0x04, 0x10, 0x04])
+        snapshot = self.cpu.snapshot()
+        self.cpu.run(1000)
+        self.assertEqual({'hits': 0, 'misses': 3, 'hit_rate': 0.0}, self.cpu.cache_stats())
+
+        # Al volver atras los contadores siguen creciendo: nunca hay aciertos negativos
+        self.cpu.restore(snapshot)
+        self.cpu.run(3)
+        stats = self.cpu.cache_stats()
+        self.assertEqual(3, stats['hits'] + stats['misses'] - 3)
+        self.assertGreaterEqual(stats['hits'], 0)
+
+        # El recompilador no pasa por la cache de instrucciones
+        cpu = HertzCPU(dynarec=True)
+        cpu.memory[0x0:0x6] = bytes([0x70, 0x01, 0x10, 0x00, 0x00, 0x00])
+        cpu.run(100)
+        self.assertEqual(0, cpu.cache_stats()['hits'])
+
+    def test_registers_view(self):
+        # El banco de registros admite el acceso como diccionario y como atributos
+        self.cpu.registers['I'] = numpy.uint16(0x123)
+        self.cpu.registers['v'][0x1] = numpy.uint8(0xfe)
+
+        self.assertEqual(0x123, self.cpu.registers.I)
+        self.assertEqual(0xfe, self.cpu.registers.v[0x1])
+        self.assertIsInstance(self.cpu.registers['I'], int)
+
+    def test_run(self):
+        # ADD V1, 1 ; JP 0x0
+        self.cpu.memory[0x0:0x4] = bytes([0x71, 0x01, 0x10, 0x00])
+        self.cpu.registers['pc'] = 0x0
+
+        self.assertEqual(100, self.cpu.run(100))
+        self.assertEqual(50, self.cpu.registers['v'][0x1])
+        self.assertEqual(100, self.cpu.cycles)
+        self.assertFalse(self.cpu.halted)
+
+    def test_run_stops_on_halt(self):
+        # LD V1, 3 ; HALT
+        self.cpu.memory[0x0:0x2] = bytes([0x61, 0x03])
+        self.cpu.registers['pc'] = 0x0
+
+        self.assertEqual(2, self.cpu.run(100))
+        self.assertTrue(self.cpu.halted)
+
+    def test_run_until(self):
+        self.cpu.memory[0x0:0x4] = bytes([0x71, 0x01, 0x10, 0x00])
+        self.cpu.registers['pc'] = 0x0
+
+        self.cpu.run_until(lambda cpu: cpu.registers['v'][0x1] == 7)
+        self.assertEqual(13, self.cpu.cycles)
+
+    def test_timers_follow_cycles(self):
+        # Con un reloj de 600 instrucciones por segundo el temporizador descuenta una vez cada 10 ciclos
+        cpu = HertzCPU(clock_speed=600)
+        cpu.timers['delay_timer'] = 3
+        cpu.timers['sound_timer'] = 1
+
+        cpu.cycles += 10
+        self.assertEqual(2, cpu.timers['delay_timer'])
+        self.assertEqual(0, cpu.timers['sound_timer'])
+
+        cpu.cycles += 25
+        self.assertEqual(0, cpu.timers['delay_timer'])
+
+    def test_decrement_timers(self):
+        self.cpu.timers['delay_timer'] = 0
+        self.cpu.timers['sound_timer'] = 2
+        self.cpu.decrement_timers()
+
+        self.assertEqual(0, self.cpu.timers['delay_timer'])
+        self.assertEqual(1, self.cpu.timers['sound_timer'])
+
+    def test_invalid_clock_speed(self):
+        with self.assertRaises(ValueError):
+            HertzCPU(clock_speed=0)
+
 
 if __name__ == '__main__':
 
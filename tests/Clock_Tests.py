@@ -0,0 +1,23 @@
+import unittest
+from Clock import FrameClock
+from Config import UNLIMITED_FRAME_CYCLES
+
+
+class ClockTests(unittest.TestCase):
+
+    def test_cycles_per_frame(self):
+        # Las fracciones de ciclo se acumulan: en un segundo se ejecuta exactamente la velocidad de reloj
+        clock = FrameClock(100)
+        frames = [clock.cycles_per_frame() for _ in range(60)]
+
+        self.assertEqual(100, sum(frames))
+        self.assertEqual({1, 2}, set(frames))
+
+    def test_unlimited(self):
+        clock = FrameClock(0)
+        self.assertEqual(UNLIMITED_FRAME_CYCLES, clock.cycles_per_frame())
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import tempfile
+from ControlFlow import ControlFlowGraph
+
+TEST_ROM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Chip8Test.b')
+
+# 0x00 LD V0, 0 ; CALL 0x10
+# 0x04 DW 0xffff (la CPU vuelve a PC + 2 tras CALL)
+# 0x06 ADD V0, 1 ; SE V0, 3 ; JP 0x06 ; SYS 0
+# 0x10 LD V1, 2 ; RET
+PROGRAM = bytes([
+    0x60, 0x00, 0x20, 0x10, 0xff, 0xff,
+    0x70, 0x01, 0x30, 0x03, 0x10, 0x06, 0x00, 0x00
+]).ljust(0x10, b'\x00') + bytes([0x61, 0x02, 0x00, 0xee])
+
+
+class ControlFlowTests(unittest.TestCase):
+
+    def setUp(self):
+        self.memory = bytearray(4096)
+        self.memory[0:len(PROGRAM)] = PROGRAM
+
+    def test_blocks(self):
+        graph = ControlFlowGraph.analyze(self.memory, 0)
+
+        self.assertEqual([0x0, 0x6, 0xa, 0xc, 0x10], sorted(graph.blocks))
+        self.assertEqual([0x10, 0x6], graph.blocks[0x0].successors)
+        self.assertEqual([0xa, 0xc], graph.blocks[0x6].successors)
+        self.assertEqual([0x6], graph.blocks[0xa].successors)
+        self.assertEqual([], graph.blocks[0xc].successors)
+        self.assertEqual(0x14, graph.blocks[0x10].end)
+        self.assertEqual([0x10], graph.subroutines)
+        self.assertEqual([0x12], graph.dynamic)
+
+        self.assertIs(graph.blocks[0x6], graph.block_at(0x8))
+        self.assertIsNone(graph.block_at(0x4))
+
+    def test_listing(self):
+        graph = ControlFlowGraph.analyze(self.memory, 0)
+        listing = graph.listing()
+
+        self.assertEqual(('0x0', '0x6000', 'LD V0, 0', 'V0 <= 0'), listing[0])
+        self.assertEqual(('0xc', '0x0', 'HALT', ''), listing[5])
+        self.assertNotIn('0x4', [row[0] for row in listing])
+        self.assertIn('sub_0x10:', graph.format_listing())
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            graph = ControlFlowGraph.from_memory(self.memory, 0, cache_dir)
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+
+            cached = ControlFlowGraph.from_memory(self.memory, 0, cache_dir)
+            self.assertEqual(graph.listing(), cached.listing())
+            self.assertEqual(graph.blocks[0x0].instructions, cached.blocks[0x0].instructions)
+
+            self.memory[0x11] = 0x05
+            self.assertEqual('LD V1, 5', ControlFlowGraph.from_memory(self.memory, 0, cache_dir).rows[0x10][1])
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+
+    def test_rom(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            graph = ControlFlowGraph.from_rom(TEST_ROM, 0, cache_dir=cache_dir)
+
+        self.assertEqual(17, len(graph.rows))
+        self.assertEqual([0x1e, 0x20], graph.blocks[0x0].successors)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from CPU import HertzCPU
+from Framebuffer import Framebuffer
+from Lockstep import LockstepCPU
+
+
+class FramebufferTests(unittest.TestCase):
+
+    def test_draw_sprite(self):
+        framebuffer = Framebuffer()
+
+        self.assertEqual(0, framebuffer.draw_sprite(2, 1, b'\xf0\x90'))
+        self.assertEqual([0, 0, 1, 1, 1, 1, 0, 0], list(framebuffer.pixels[1, 0:8]))
+        self.assertEqual([0, 0, 1, 0, 0, 1, 0, 0], list(framebuffer.pixels[2, 0:8]))
+
+        # Dibujar otra vez el mismo sprite lo borra y marca la colision
+        self.assertEqual(1, framebuffer.draw_sprite(2, 1, b'\xf0\x90'))
+        self.assertEqual(0, framebuffer.pixels.sum())
+
+    def test_sprite_wraps_around(self):
+        framebuffer = Framebuffer()
+        framebuffer.draw_sprite(62, 31, b'\xc0\xc0')
+
+        self.assertEqual(1, framebuffer.get_pixel(63, 31))
+        self.assertEqual(1, framebuffer.get_pixel(62, 0))
+        self.assertEqual(4, framebuffer.pixels.sum())
+
+    def test_dirty_spans(self):
+        framebuffer = Framebuffer()
+        self.assertEqual([(0, 32)], framebuffer.dirty_spans())
+        self.assertEqual([], framebuffer.dirty_spans())
+
+        framebuffer.draw_sprite(0, 30, b'\x80\x80\x80')
+        framebuffer.set_pixel(5, 10, 1)
+        self.assertEqual([(0, 1), (10, 11), (30, 32)], framebuffer.dirty_spans())
+
+        framebuffer.clear()
+        self.assertEqual([(0, 32)], framebuffer.dirty_spans())
+
+    def test_draw_and_clear_instructions(self):
+        # LD I, 0x10 ; DRW V0, V1, 2 ; DRW V0, V1, 2 ; CLS ; HALT
+        program = bytes([0xa0, 0x10, 0xd0, 0x12, 0xd0, 0x12, 0x00, 0xe0, 0x00, 0x00]).ljust(0x10, b'\x00') + b'\xff\x81'
+        cpu = HertzCPU()
+        cpu.memory[0:len(program)] = program
+
+        cpu.run(2)
+        self.assertEqual(10, cpu.framebuffer.pixels.sum())
+        self.assertEqual(0, cpu.registers['v'][0xf])
+        cpu.run(1)
+        self.assertEqual(1, cpu.registers['v'][0xf])
+        cpu.framebuffer.draw_sprite(0, 0, b'\x01')
+        cpu.run(2)
+        self.assertEqual(0, cpu.framebuffer.pixels.sum())
+
+        engine = LockstepCPU(3, program[0:6])
+        engine.memory[:, 0x10:0x12] = [0xff, 0x81]
+        engine.v[1, 0] = 60
+        engine.run(2)
+        self.assertEqual(1, engine.framebuffer[1, 0, 63])
+        engine.run(1)
+        self.assertTrue((engine.v[:, 0xf] == 1).all())
+        engine.run(2)
+        self.assertEqual(0, engine.framebuffer.sum())
+
+
+if __name__ == '__main__':
+
+    unittest.main()
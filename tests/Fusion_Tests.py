@@ -0,0 +1,75 @@
+import unittest
+from CPU import HertzCPU
+
+# 0x00 LD V0, 0xf0 ; ADD V0, 0x20
+# 0x04 LD V1, 0xf0 ; ADD V1, V0 ; SE VF, 1 ; LD V2, 9
+# 0x0c LD VF, 0xfe ; ADD VF, VF ; SE VF, 1 ; LD V3, 9
+# 0x14 LD I, 0x80 ; LD [I], V3 ; LD I, 0x81 ; LD V4, [I] ; SYS 0
+PROGRAM = bytes([
+    0x60, 0xf0, 0x70, 0x20,
+    0x61, 0xf0, 0x81, 0x04, 0x3f, 0x01, 0x62, 0x09,
+    0x6f, 0xfe, 0x8f, 0xf4, 0x3f, 0x01, 0x63, 0x09,
+    0xa0, 0x80, 0xf3, 0x55, 0xa0, 0x81, 0xf4, 0x65, 0x00, 0x00
+])
+
+
+class FusionTests(unittest.TestCase):
+
+    def run_program(self, program, cycles, hooked):
+        cpu = HertzCPU()
+        cpu.memory[0:len(program)] = program
+        cpu.run(cycles, trace=(lambda opcode: None) if hooked else None)
+        return cpu
+
+    def assertSameState(self, expected, cpu):
+        self.assertEqual(list(expected.registers['v']), list(cpu.registers['v']))
+        for register in ('I', 'pc', 'sp'):
+            self.assertEqual(expected.registers[register], cpu.registers[register])
+        self.assertEqual(expected.cycles, cpu.cycles)
+        self.assertEqual(expected.opcode, cpu.opcode)
+        self.assertEqual(expected.halted, cpu.halted)
+        self.assertEqual(expected.memory, cpu.memory)
+
+    def test_same_result_as_unfused(self):
+        fused = self.run_program(PROGRAM, 100, hooked=False)
+        self.assertSameState(self.run_program(PROGRAM, 100, hooked=True), fused)
+
+        self.assertTrue(fused.halted)
+        # V0..V3 guardados en 0x80: el acarreo salta LD V2, 9 pero VF se sobrescribe con el resultado de ADD VF, VF
+        self.assertEqual(bytes([0x10, 0x00, 0x00, 0x09]), fused.memory[0x80:0x84])
+        self.assertEqual(2, fused.fused_cache[0x0][3])
+        self.assertEqual(2, fused.fused_cache[0x6][3])
+        self.assertEqual(2, fused.fused_cache[0x14][3])
+
+    def test_pairs_do_not_cross_limit(self):
+        for cycles in range(1, 16):
+            self.assertSameState(self.run_program(PROGRAM, cycles, hooked=True),
+                                 self.run_program(PROGRAM, cycles, hooked=False))
+
+    def test_self_modifying_pair(self):
+        # 0x00 LD V0, 0x00 ; LD I, 0x0a ; LD [I], V1 ; LD V1, 1 ; ADD V1, 5 (sobrescrito con SYS 0)
+        program = bytes([0x60, 0x00, 0xa0, 0x0c, 0xf1, 0x55, 0x00, 0x00, 0x00, 0x00, 0x61, 0x01, 0x71, 0x05])
+        cpu = HertzCPU()
+        cpu.memory[0:len(program)] = program
+        cpu.fuse(0xa)
+        cpu.registers['pc'] = 0x0
+        cpu.run(3)
+        cpu.registers['pc'] = 0xa
+        cpu.run(10)
+
+        self.assertEqual(1, cpu.registers['v'][0x1])
+        self.assertTrue(cpu.halted)
+
+    def test_breakpoint_inside_pair(self):
+        cpu = HertzCPU()
+        cpu.memory[0:len(PROGRAM)] = PROGRAM
+        cpu.breakpoints.add_breakpoint(0x2)
+        cpu.run(100)
+
+        self.assertEqual(('breakpoint', 0x2), cpu.breakpoints.hit)
+        self.assertEqual(0xf0, cpu.registers['v'][0x0])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from CPU import HertzCPU
+
+# 0x00 LD V0, 30 ; LD DT, V0
+# 0x04 LD V1, DT ; SE V1, 0 ; JP 0x04
+# 0x0a LD V2, 7 ; JP 0x0c
+POLL_PROGRAM = bytes([0x60, 0x1e, 0xf0, 0x15, 0xf1, 0x07, 0x31, 0x00, 0x10, 0x04, 0x62, 0x07, 0x10, 0x0c])
+
+
+class IdleTests(unittest.TestCase):
+
+    def test_self_jump(self):
+        cpu = HertzCPU()
+        cpu.memory[0x0:0x2] = bytes([0x10, 0x00])
+
+        cpu.run(1000000)
+        self.assertEqual(1000000, cpu.cycles)
+        self.assertEqual(0x0, cpu.registers['pc'])
+        self.assertGreater(cpu.idle_cycles, 999000)
+
+    def test_poll_delay_timer(self):
+        results = []
+        for hooked in (False, True):
+            cpu = HertzCPU(clock_speed=600)
+            cpu.memory[0:len(POLL_PROGRAM)] = POLL_PROGRAM
+            cpu.run(1000, trace=(lambda opcode: None) if hooked else None)
+            results.append(([int(v) for v in cpu.registers['v']], cpu.cycles, cpu.registers['pc']))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(7, results[0][0][0x2])
+
+    def test_poll_stops_on_limit(self):
+        cpu = HertzCPU(clock_speed=600)
+        cpu.memory[0:len(POLL_PROGRAM)] = POLL_PROGRAM
+
+        # El temporizador llega a 0 en el ciclo 302: la espera se corta antes en el limite
+        cpu.run(200)
+        self.assertEqual(200, cpu.cycles)
+        self.assertNotEqual(7, cpu.registers['v'][0x2])
+        self.assertGreater(cpu.idle_cycles, 0)
+
+    def test_rewritten_loop(self):
+        cpu = HertzCPU()
+        cpu.memory[0:len(POLL_PROGRAM)] = POLL_PROGRAM
+        self.assertEqual(HertzCPU.idle_poll_delay_timer, cpu.decode(0x4)[1])
+
+        # Una escritura sobre el salto cambia la entrada que empieza cuatro bytes antes
+        cpu.memory[0x8:0xa] = bytes([0x00, 0x00])
+        cpu.invalidate(0x8, 2)
+        self.assertIsNone(cpu.decode_cache[0x4])
+        self.assertNotEqual(HertzCPU.idle_poll_delay_timer, cpu.decode(0x4)[1])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
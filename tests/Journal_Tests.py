@@ -0,0 +1,99 @@
+import unittest
+from CPU import HertzCPU
+from Journal import UndoJournal
+
+# 0x000 LD V0, 7 ; LD I, 0x300 ; CALL 0x020 ; LD DT, V0 ; LD [I], V2 ; LD B, V0 ; ADD V0, 1 ; JP 0x004
+# 0x020 DRW V0, V0, 2 ; ADD I, V0 ; LD V3, [I] ; CLS ; SHL V0, V1 ; RET
+PROGRAM = bytes([
+    0x60, 0x07, 0xa3, 0x00, 0x20, 0x20, 0xf0, 0x15, 0xf2, 0x55, 0xf0, 0x33, 0x70, 0x01, 0x10, 0x04
+]).ljust(0x20, b'\x00') + bytes([0xd0, 0x02, 0xf0, 0x1e, 0xf3, 0x65, 0x00, 0xe0, 0x80, 0x1e, 0x00, 0xee])
+
+
+class JournalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = HertzCPU(journal=True)
+        self.cpu.memory[0:len(PROGRAM)] = PROGRAM
+        self.cpu.memory[0x300:0x302] = b'\xff\x81'
+
+    def state(self):
+        cpu = self.cpu
+        return (bytes(cpu.memory), bytes(cpu.registers.v), cpu.registers.I, cpu.registers.pc, cpu.registers.sp,
+                list(cpu.registers.stack), cpu.cycles, cpu.timers['delay_timer'], cpu.framebuffer.pixels.tobytes())
+
+    def test_step_back(self):
+        states = []
+        for _ in range(40):
+            states.append(self.state())
+            self.cpu.run(1)
+
+        for expected in reversed(states):
+            self.assertEqual(1, self.cpu.step_back())
+            self.assertEqual(expected, self.state())
+        self.assertEqual(0, self.cpu.step_back())
+
+    def test_step_back_screen(self):
+        self.cpu.run(4)
+        drawn = self.cpu.framebuffer.pixels.copy()
+        self.assertTrue(drawn.any())
+        self.cpu.run(3)
+        self.assertFalse(self.cpu.framebuffer.pixels.any())
+
+        self.cpu.step_back(3)
+        self.assertTrue((drawn == self.cpu.framebuffer.pixels).all())
+        self.cpu.step_back()
+        self.assertFalse(self.cpu.framebuffer.pixels.any())
+
+    def test_run_back_to(self):
+        self.cpu.run(100)
+        cycles = self.cpu.cycles
+
+        steps = self.cpu.run_back_to(0x20)
+        self.assertEqual(0x20, self.cpu.registers.pc)
+        self.assertEqual(cycles - steps, self.cpu.cycles)
+        self.assertLessEqual(steps, 15)
+
+    def test_capacity_is_bounded(self):
+        cpu = HertzCPU()
+        cpu.journal = UndoJournal(cpu, 8)
+        cpu.memory[0:len(PROGRAM)] = PROGRAM
+        cpu.run(50)
+
+        self.assertEqual(8, len(cpu.journal))
+        self.assertEqual(8, cpu.step_back(20))
+        self.assertEqual(42, cpu.cycles)
+
+    def test_step_back_keypad(self):
+        # LD V0, 60 ; LD DT, V0 ; LD V3, K ; SKP V3 ; LD V4, 1 ; JP 0x0a
+        cpu = HertzCPU(journal=True, clock_speed=600)
+        cpu.memory[0:12] = bytes([0x60, 0x3c, 0xf0, 0x15, 0xf3, 0x0a, 0xe3, 0x9e, 0x64, 0x01, 0x10, 0x0a])
+        cpu.keypad.press(0x2, cycle=500)
+
+        cpu.run(300)
+        self.assertTrue(cpu.parked)
+        cpu.run(300)
+        self.assertFalse(cpu.parked)
+        self.assertEqual(0x2, cpu.registers.v[3])
+        self.assertEqual(1, cpu.keypad.pressed[0x2])
+
+        # Volver a FX0A: la CPU sigue aparcada y la pulsacion vuelve a estar pendiente
+        cpu.run_back_to(0x4)
+        self.assertTrue(cpu.parked)
+        self.assertTrue(cpu.keypad.waiting)
+        self.assertEqual(0, cpu.keypad.pressed[0x2])
+        self.assertEqual([(500, 0x2, True)], list(cpu.keypad.events))
+
+        cpu.step_back(len(cpu.journal))
+        self.assertEqual(0, cpu.cycles)
+        self.assertFalse(cpu.parked)
+        self.assertFalse(cpu.keypad.waiting)
+
+        # Repetir desde el principio da el mismo resultado
+        cpu.run(600)
+        self.assertEqual(0x2, cpu.registers.v[3])
+        self.assertEqual(600, cpu.cycles)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
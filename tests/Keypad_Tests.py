@@ -0,0 +1,108 @@
+import unittest
+from CPU import HertzCPU
+from Disassembler import disassemble
+from Keypad import Keypad
+
+# 0x00 LD V0, 60 ; LD DT, V0
+# 0x04 LD V3, K ; LD V5, DT ; JP 0x08
+WAIT_PROGRAM = bytes([0x60, 0x3c, 0xf0, 0x15, 0xf3, 0x0a, 0xf5, 0x07, 0x10, 0x08])
+
+
+class KeypadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = HertzCPU(clock_speed=600)
+        self.cpu.memory[0:len(WAIT_PROGRAM)] = WAIT_PROGRAM
+
+    def test_skip_if_key(self):
+        # SKP V1 ; LD V2, 1 ; SKNP V1 ; LD V3, 1 ; SYS 0
+        self.cpu.memory[0:10] = bytes([0xe1, 0x9e, 0x62, 0x01, 0xe1, 0xa1, 0x63, 0x01, 0x00, 0x00])
+        self.cpu.registers['v'][0x1] = 0x7
+        self.cpu.keypad.press(0x7)
+        self.cpu.run(10)
+
+        self.assertEqual(0, self.cpu.registers['v'][0x2])
+        self.assertEqual(1, self.cpu.registers['v'][0x3])
+        self.assertTrue(self.cpu.halted)
+
+    def test_wait_parks_cpu(self):
+        executed = self.cpu.run(100000)
+
+        self.assertEqual(100000, executed)
+        self.assertTrue(self.cpu.parked)
+        self.assertEqual(0x4, self.cpu.registers['pc'])
+        self.assertGreater(self.cpu.idle_cycles, 99990)
+
+        self.cpu.keypad.press(0xb)
+        self.cpu.run(2)
+        self.assertFalse(self.cpu.parked)
+        self.assertEqual(0xb, self.cpu.registers['v'][0x3])
+        self.assertEqual(0x8, self.cpu.registers['pc'])
+
+    def test_run_until_parks(self):
+        executed = self.cpu.run_until(lambda cpu: False, 5000)
+
+        self.assertEqual(5000, executed)
+        self.assertTrue(self.cpu.parked)
+        self.assertGreater(self.cpu.idle_cycles, 4990)
+
+        self.cpu.keypad.press(0x4, cycle=6000)
+        self.cpu.run_until(lambda cpu: not cpu.parked)
+        self.assertEqual(6000, self.cpu.cycles)
+        self.assertEqual(0x4, self.cpu.registers['v'][0x3])
+
+    def test_press_before_wait_is_ignored(self):
+        self.cpu.keypad.press(0x1)
+        self.cpu.run(100)
+
+        self.assertTrue(self.cpu.parked)
+        self.assertEqual(1, self.cpu.keypad.pressed[0x1])
+
+    def test_scheduled_event(self):
+        results = []
+        for hooked in (False, True):
+            cpu = HertzCPU(clock_speed=600)
+            cpu.memory[0:len(WAIT_PROGRAM)] = WAIT_PROGRAM
+            cpu.keypad.press(0x2, cycle=201)
+            cpu.run(1000, trace=(lambda opcode: None) if hooked else None)
+            results.append([int(v) for v in cpu.registers['v']])
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(0x2, results[0][0x3])
+        # LD V5, DT se ejecuta en el ciclo 202: han pasado 20 ticks de 60Hz desde LD DT, V0
+        self.assertEqual(40, results[0][0x5])
+
+    def test_record_and_replay(self):
+        self.cpu.start_recording()
+        self.cpu.run(100)
+        self.cpu.keypad.press(0xa)
+        self.cpu.run(100)
+        recording = self.cpu.stop_recording()
+        self.assertEqual([(101, 0xa, True)], recording.key_events)
+
+        replayed = HertzCPU(clock_speed=600)
+        replayed.memory[0:len(WAIT_PROGRAM)] = WAIT_PROGRAM
+        replayed.replay(recording)
+        replayed.run(1000)
+
+        self.assertEqual(list(self.cpu.registers['v']), list(replayed.registers['v']))
+        self.assertEqual(50, replayed.registers['v'][0x5])
+
+    def test_wait_wakes_on_event(self):
+        keypad = Keypad()
+        self.assertFalse(keypad.wait(0))
+        keypad.release(0x3)
+        self.assertTrue(keypad.wait(0))
+        keypad.poll(0)
+        self.assertFalse(keypad.wait(0))
+
+    def test_disassemble(self):
+        self.assertEqual(('SKP V1', 'KEY[V1] pressed'), disassemble(0xe19e))
+        self.assertEqual(('SKNP V1', 'KEY[V1] not pressed'), disassemble(0xe1a1))
+        self.assertEqual(('LD V3, K', 'V3 <= KEY'), disassemble(0xf30a))
+        self.assertEqual(('DW 0xe1ff', ''), disassemble(0xe1ff))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
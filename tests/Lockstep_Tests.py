@@ -0,0 +1,66 @@
+import unittest
+import os
+from CPU import HertzCPU
+from Lockstep import LockstepCPU
+
+TEST_ROM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Chip8Test.b')
+
+# Bucle con llamada, acarreo, BCD y copias de registros a memoria:
+# 0x00 LD V0, 0 ; LD V1, 250 ; LD I, 0x80
+# 0x06 CALL 0x20 ; ADD V0, 1 ; SE V0, 5 ; JP 0x06
+# 0x0e LD [I], V3 ; LD V2, [I] ; LD B, V1 ; SYS 0
+# 0x20 ADD V1, V0 (con acarreo) ; SHL V3, V1 ; JP 0x08
+PROGRAM = bytes([
+    0x60, 0x00, 0x61, 0xfa, 0xa0, 0x80,
+    0x20, 0x20, 0x70, 0x01, 0x30, 0x05, 0x10, 0x06,
+    0xf3, 0x55, 0xf2, 0x65, 0xf1, 0x33, 0x00, 0x00
+]).ljust(0x20, b'\x00') + bytes([0x81, 0x04, 0x83, 0x1e, 0x10, 0x08])
+
+
+class LockstepTests(unittest.TestCase):
+
+    def test_same_result_as_interpreter(self):
+        cpu = HertzCPU()
+        cpu.memory[0:len(PROGRAM)] = PROGRAM
+        while cpu.execute_instruction() != 0x0:
+            pass
+
+        engine = LockstepCPU(64, PROGRAM)
+        engine.run(1000)
+
+        report = engine.report()
+        for instance in (report[0], report[-1]):
+            self.assertTrue(instance['halted'])
+            self.assertFalse(instance['trapped'])
+            self.assertEqual(cpu.cycles, instance['halt_cycle'])
+            self.assertEqual(list(cpu.registers['v']), instance['v'])
+            self.assertEqual(cpu.registers['I'], instance['I'])
+            self.assertEqual(cpu.registers['pc'], instance['pc'])
+        self.assertEqual(bytes(cpu.memory), engine.memory[3].tobytes())
+
+    def test_seeds(self):
+        engine = LockstepCPU.from_rom(TEST_ROM, 32, seeds=range(32), offset=0)
+        engine.run(100)
+
+        self.assertTrue(engine.halted.all())
+        self.assertEqual(16, engine.halt_cycle[0])
+        # Todas las instancias coinciden salvo en el registro cargado con RND
+        self.assertTrue((engine.v[:, 1] == 69).all())
+        self.assertGreater(len(set(engine.v[:, 4])), 1)
+
+        again = LockstepCPU.from_rom(TEST_ROM, 32, seeds=range(32), offset=0)
+        again.run(100)
+        self.assertTrue((engine.v == again.v).all())
+
+    def test_invalid_opcode(self):
+        engine = LockstepCPU(4)
+        engine.memory[:, 0:2] = [0x80, 0x0f]
+        engine.run(10)
+
+        self.assertTrue(engine.trapped.all())
+        self.assertEqual(1, engine.halt_cycle[0])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+from CPU import HertzCPU
+
+# 0x00 LD V0, 0 ; CALL 0x10
+# 0x10 ADD V1, 1 ; SE V1, 3 ; JP 0x10 ; CALL 0x20
+# 0x20 ADD V2, 1 ; HALT
+PROGRAM = (bytes([0x60, 0x00, 0x20, 0x10]).ljust(0x10, b'\x00') +
+           bytes([0x71, 0x01, 0x31, 0x03, 0x10, 0x10, 0x20, 0x20]).ljust(0x10, b'\x00') +
+           bytes([0x72, 0x01, 0x00, 0x00]))
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = HertzCPU(profile=True)
+        self.cpu.memory[0:len(PROGRAM)] = PROGRAM
+        self.cpu.run(1000)
+        self.profiler = self.cpu.profiler
+
+    def test_counts(self):
+        self.assertTrue(self.cpu.halted)
+        self.assertEqual(3, self.profiler.address_counts[0x10])
+        self.assertEqual(2, self.profiler.address_counts[0x14])
+        self.assertEqual(1, self.profiler.opcode_counts[0x7201])
+
+        kinds = dict(self.profiler.kind_counts())
+        self.assertEqual(2, kinds['CALL'])
+        self.assertEqual(4, kinds['ADD_NN'])
+        self.assertEqual(self.cpu.cycles, sum(kinds.values()))
+
+    def test_subroutines(self):
+        subroutines = {address: (own, inclusive) for address, own, inclusive in self.profiler.subroutines()}
+        self.assertEqual((2, 2), subroutines[0x20])
+        self.assertEqual((9, 11), subroutines[0x10])
+
+        self.assertEqual(['main 2', 'main;sub_0x10 9', 'main;sub_0x10;sub_0x20 2'], self.profiler.collapsed_stacks())
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'profile')
+            self.profiler.write(prefix)
+            with open(prefix + '.folded') as folded:
+                self.assertEqual(3, len(folded.read().split()) // 2)
+            with open(prefix + '.txt') as report:
+                self.assertIn('ADD V2, 1', report.read())
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+from CPU import HertzCPU
+import numpy
+
+TEST_ROM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Chip8Test.b')
+
+
+class RecompilerTests(unittest.TestCase):
+
+    def run_until_halt(self, cpu, step):
+        while step() != 0x0:
+            pass
+
+    def test_same_result_as_interpreter(self):
+        interpreter = HertzCPU(seed=1)
+        interpreter.load_rom(TEST_ROM, 0)
+        self.run_until_halt(interpreter, interpreter.execute_instruction)
+
+        recompiled = HertzCPU(dynarec=True, seed=1)
+        recompiled.load_rom(TEST_ROM, 0)
+        self.run_until_halt(recompiled, recompiled.execute_block)
+
+        self.assertEqual([int(v) for v in interpreter.registers['v']], [int(v) for v in recompiled.registers['v']])
+        for register in ('I', 'pc', 'sp'):
+            self.assertEqual(interpreter.registers[register], recompiled.registers[register])
+        self.assertEqual(interpreter.cycles, recompiled.cycles)
+        self.assertEqual(interpreter.memory, recompiled.memory)
+        self.assertLess(recompiled.compiler.compiled_blocks, recompiled.cycles)
+
+    def test_store_invalidates_block(self):
+        cpu = HertzCPU(dynarec=True)
+        # LD V3, 5 ; LD I, 0 ; LD [I], V1
+        cpu.memory[0x0:0x6] = bytes([0x63, 0x05, 0xa0, 0x00, 0xf1, 0x55])
+        cpu.registers['v'][0x0] = numpy.uint8(0x63)
+        cpu.registers['v'][0x1] = numpy.uint8(0x07)
+
+        cpu.execute_block()
+        self.assertEqual(0x6, cpu.registers['pc'])
+        self.assertEqual(0x5, cpu.registers['v'][0x3])
+        self.assertIsNone(cpu.compiler.blocks[0x0])
+
+        cpu.registers['pc'] = 0x0
+        cpu.execute_block()
+        self.assertEqual(0x7, cpu.registers['v'][0x3])
+
+    def test_self_modifying_loop_owners(self):
+        # LD I, 0x3 ; ADD V0, nn ; LD [I], V0 ; JP 0x0: cada vuelta reescribe nn dentro del propio bloque
+        cpu = HertzCPU(dynarec=True)
+        cpu.memory[0x0:0x8] = bytes([0xa0, 0x03, 0x70, 0x01, 0xf0, 0x55, 0x10, 0x00])
+        for _ in range(200):
+            cpu.execute_block()
+
+        self.assertGreater(cpu.compiler.compiled_blocks, 100)
+        self.assertLessEqual(max(len(owners) for owners in cpu.compiler.owners), 2)
+        self.assertEqual(len(cpu.compiler.ends), sum(block is not None for block in cpu.compiler.blocks))
+
+    def test_run_does_not_pass_limit(self):
+        for cycles in range(1, 40):
+            interpreter = HertzCPU(seed=1)
+            interpreter.load_rom(TEST_ROM, 0)
+            recompiled = HertzCPU(dynarec=True, seed=1)
+            recompiled.load_rom(TEST_ROM, 0)
+
+            self.assertEqual(interpreter.run(cycles), recompiled.run(cycles))
+            self.assertLessEqual(recompiled.cycles, cycles)
+            self.assertEqual(interpreter.registers['pc'], recompiled.registers['pc'])
+
+        # Bucle de 6 instrucciones: ningun lote coincide con el final de un bloque
+        program = bytes([0x70, 0x01, 0x71, 0x02, 0x72, 0x03, 0x73, 0x04, 0x74, 0x05, 0x10, 0x00])
+        cpu = HertzCPU(dynarec=True)
+        cpu.memory[0:len(program)] = program
+        for cycles in (1, 4, 7, 11, 5, 3):
+            start = cpu.cycles
+            self.assertEqual(cycles, cpu.run(cycles))
+            self.assertEqual(start + cycles, cpu.cycles)
+
+    def test_timer_reads_inside_block(self):
+        # LD DT, V0 ; 20 x ADD V1, 1 ; LD V2, DT ; SYS 0
+        program = bytes([0xf0, 0x15]) + bytes([0x71, 0x01]) * 20 + bytes([0xf2, 0x07, 0x00, 0x00])
+        results = []
+        for dynarec in (False, True):
+            cpu = HertzCPU(dynarec=dynarec, clock_speed=120)
+            cpu.memory[0:len(program)] = program
+            cpu.registers['v'][0x0] = 50
+            cpu.run(100)
+            results.append(cpu.registers['v'][0x2])
+
+        self.assertEqual([40, 40], results)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+from CPU import HertzCPU
+from Replay import Recording
+from Rng import ReplayExhaustedError
+
+# RND V0, 0xff ; ADD V1, V0 ; JP 0x0
+PROGRAM = bytes([0xc0, 0xff, 0x81, 0x04, 0x10, 0x00])
+
+
+class ReplayTests(unittest.TestCase):
+
+    def run_program(self, cpu, cycles=3000):
+        cpu.memory[0:len(PROGRAM)] = PROGRAM
+        cpu.run(cycles)
+        return bytes(cpu.registers.v)
+
+    def test_seed(self):
+        self.assertEqual(self.run_program(HertzCPU(seed=42)), self.run_program(HertzCPU(seed=42)))
+        self.assertNotEqual(self.run_program(HertzCPU(seed=42)), self.run_program(HertzCPU(seed=43)))
+
+        cpu = HertzCPU()
+        self.assertEqual(self.run_program(HertzCPU(seed=cpu.rng.seed)), self.run_program(cpu))
+
+    def test_replay(self):
+        cpu = HertzCPU()
+        cpu.start_recording()
+        expected = self.run_program(cpu)
+        recording = cpu.stop_recording()
+        self.assertEqual(1000, len(recording.random_stream))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.rec')
+            recording.save(path)
+            recording = Recording.load(path)
+
+        replayed = HertzCPU(seed=0)
+        replayed.replay(recording)
+        self.assertEqual(expected, self.run_program(replayed))
+
+        # La grabacion no tiene mas numeros
+        with self.assertRaises(ReplayExhaustedError):
+            replayed.run(3)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import tempfile
+import os
+import Rom
+
+
+class RomTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, 'cache')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_rom(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as rom:
+            rom.write(content)
+        return path
+
+    def test_detect_format(self):
+        self.assertTrue(Rom.is_text_rom(b' 01100001 \n 01110111\n'))
+        self.assertFalse(Rom.is_text_rom(b'\x61\x77'))
+        self.assertFalse(Rom.is_text_rom(b''))
+
+    def test_load_binary_rom(self):
+        memory = bytearray(16)
+        length = Rom.load_rom(memory, self.write_rom('rom.bin', b'\x61\x77\x00'), 4, self.cache_dir)
+
+        self.assertEqual(3, length)
+        self.assertEqual(b'\x61\x77\x00', memory[4:7])
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_load_text_rom_is_cached(self):
+        path = self.write_rom('rom.b', b' 01100001 \n 01110111\n')
+        memory = bytearray(16)
+        Rom.load_rom(memory, path, 0, self.cache_dir)
+
+        self.assertEqual(b'\x61\x77', memory[0:2])
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+        # La segunda carga lee la conversion guardada
+        cached = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(cached, 'wb') as image:
+            image.write(b'\x12\x34')
+        Rom.load_rom(memory, path, 0, self.cache_dir)
+        self.assertEqual(b'\x12\x34', memory[0:2])
+
+    def test_rom_too_large(self):
+        with self.assertRaises(IndexError):
+            Rom.load_rom(bytearray(4), self.write_rom('rom.bin', b'\x00' * 8), 0, self.cache_dir)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
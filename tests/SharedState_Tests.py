@@ -0,0 +1,63 @@
+import unittest
+import multiprocessing
+from CPU import HertzCPU, InvalidOpcodeError
+from SharedState import SharedState
+from Trace import TraceBuffer
+
+# LD V1, 5 ; ADD V1, 1 ; LD I, 0x10 ; DRW V0, V0, 1 ; HALT
+PROGRAM = bytes([0x61, 0x05, 0x71, 0x01, 0xa0, 0x10, 0xd0, 0x01, 0x00, 0x00]).ljust(0x10, b'\x00') + b'\x80'
+
+
+def run_program(shared_name):
+    shared = SharedState(shared_name, trace_capacity=8)
+    cpu = HertzCPU()
+    cpu.memory[0:len(PROGRAM)] = PROGRAM
+    trace = TraceBuffer(8)
+    cpu.run(100, trace.tracer(cpu))
+    shared.publish(cpu, trace)
+    shared.close()
+
+
+class SharedStateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.shared = SharedState(trace_capacity=8)
+
+    def tearDown(self):
+        self.shared.close()
+
+    def test_publish_from_another_process(self):
+        self.assertIsNone(self.shared.read())
+
+        process = multiprocessing.Process(target=run_program, args=(self.shared.name,))
+        process.start()
+        process.join()
+
+        snapshot = self.shared.read()
+        self.assertTrue(snapshot['halted'])
+        self.assertEqual(6, snapshot['v'][1])
+        self.assertEqual(0x10, snapshot['I'])
+        self.assertEqual(1, snapshot['framebuffer'][0, 0])
+
+        trace = TraceBuffer(8)
+        self.shared.load_trace(snapshot, trace)
+        self.assertEqual(5, len(trace))
+        self.assertEqual(('0x7101', 'ADD V1, 1', 'V1 <= V1 + 1', 'V1 = 6'), trace[1])
+        self.assertEqual(('0x0', 'HALT'), trace[-1])
+
+    def test_trap(self):
+        cpu = HertzCPU()
+        cpu.memory[0:2] = bytes([0x80, 0x0f])
+        with self.assertRaises(InvalidOpcodeError) as context:
+            cpu.run(1)
+        self.shared.publish_trap(context.exception)
+
+        snapshot = self.shared.read()
+        self.assertTrue(snapshot['trapped'])
+        self.assertEqual(0x800f, snapshot['trap_opcode'])
+        self.assertEqual(0, snapshot['sequence'] % 2)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
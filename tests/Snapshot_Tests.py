@@ -0,0 +1,91 @@
+import unittest
+import os
+import tempfile
+import zlib
+from CPU import HertzCPU
+from Snapshot import Snapshot, PAGE_COUNT
+
+TEST_ROM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Chip8Test.b')
+
+# 0x000 LD V0, 7 ; LD I, 0x300 ; RND V2, 0xff ; LD DT, V0 ; LD [I], V2 ; ADD V0, 1 ; DRW V0, V0, 1 ; JP 0x004
+PROGRAM = bytes([0x60, 0x07, 0xa3, 0x00, 0xc2, 0xff, 0xf0, 0x15, 0xf2, 0x55, 0x70, 0x01, 0xd0, 0x01, 0x10, 0x04])
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = HertzCPU()
+        self.cpu.memory[0:len(PROGRAM)] = PROGRAM
+
+    def state(self, cpu):
+        return (bytes(cpu.memory), bytes(cpu.registers.v), cpu.registers.I, cpu.registers.pc, cpu.cycles,
+                cpu.timers['delay_timer'], cpu.framebuffer.pixels.tobytes())
+
+    def test_restore(self):
+        self.cpu.run(10)
+        snapshot = self.cpu.snapshot()
+        self.cpu.run(50)
+        expected = self.state(self.cpu)
+
+        self.cpu.restore(snapshot)
+        self.assertEqual(10, self.cpu.cycles)
+        # El generador aleatorio tambien vuelve atras: la ejecucion se repite igual
+        self.cpu.run(50)
+        self.assertEqual(expected, self.state(self.cpu))
+
+    def test_pages_are_shared(self):
+        first = self.cpu.snapshot()
+        self.cpu.run(10)
+        second = self.cpu.snapshot()
+
+        # Solo se ha escrito la pagina 0x300
+        changed = [page for page in range(PAGE_COUNT) if first.pages[page] is not second.pages[page]]
+        self.assertEqual([0x3], changed)
+
+    def test_serialization(self):
+        self.cpu.run(10)
+        snapshot = self.cpu.snapshot()
+        self.cpu.run(20)
+        expected = self.state(self.cpu)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoint.snp')
+            snapshot.save(path)
+            # La memoria y la pantalla casi vacias se comprimen; el estado del generador aleatorio no
+            self.assertLess(os.path.getsize(path), 4096)
+
+            resumed = HertzCPU(seed=0)
+            resumed.restore(Snapshot.load(path))
+
+        resumed.run(20)
+        self.assertEqual(expected, self.state(resumed))
+
+    def test_keypad(self):
+        # 0x000 LD V1, K ; JP 0x000
+        self.cpu.memory[0:4] = bytes([0xf1, 0x0a, 0x10, 0x00])
+        self.cpu.keypad.press(0x5)
+        self.cpu.run(3)
+        self.cpu.keypad.press(0x7, cycle=10)
+        self.cpu.keypad.release(0x7, cycle=12)
+        snapshot = Snapshot.from_bytes(self.cpu.snapshot().to_bytes())
+
+        self.cpu.run(20)
+        expected = (self.cpu.registers.v[1], bytes(self.cpu.keypad.pressed), self.cpu.parked)
+        self.assertEqual((0x7, True), (expected[0], expected[2]))
+
+        resumed = HertzCPU()
+        resumed.restore(snapshot)
+        self.assertTrue(resumed.parked)
+        self.assertEqual(1, resumed.keypad.pressed[0x5])
+        self.assertEqual([(10, 0x7, True), (12, 0x7, False)], list(resumed.keypad.events))
+        resumed.run(20)
+        self.assertEqual(expected, (resumed.registers.v[1], bytes(resumed.keypad.pressed), resumed.parked))
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            Snapshot.from_bytes(zlib.compress(b'\x00' * 64))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+import tempfile
+from CPU import HertzCPU
+from Trace import TraceBuffer
+import TraceFile
+
+TEST_ROM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Chip8Test.b')
+
+
+class TraceFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trace.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_same_rows_as_trace_buffer(self):
+        cpu = HertzCPU()
+        cpu.load_rom(TEST_ROM, 0)
+        trace = TraceBuffer(100)
+
+        # Buffers de 3 registros: la traza se escribe en varios bloques
+        with TraceFile.TraceWriter(self.path, cpu, chunk_records=3) as writer:
+            def both(opcode):
+                trace.record(cpu, opcode)
+                writer.record(opcode)
+            cpu.run(100, both)
+
+        records = TraceFile.load(self.path)
+        self.assertEqual(16, len(records))
+        # SE V2, 187 salta la instruccion 0x1e
+        self.assertEqual(list(range(0, 30, 2)) + [0x20], records['pc'].tolist())
+        self.assertEqual(list(trace), list(TraceFile.rows(records)))
+
+    def test_changed_register(self):
+        cpu = HertzCPU()
+        # LD V3, 5 ; LD I, 0x20 ; SUB V3, V3 ; HALT
+        cpu.memory[0:8] = bytes([0x63, 0x05, 0xa0, 0x20, 0x83, 0x35, 0x00, 0x00])
+        with TraceFile.TraceWriter(self.path, cpu) as writer:
+            cpu.run(10, writer)
+
+        records = TraceFile.load(self.path)
+        self.assertEqual(['V3', 'I', 'V3', 'None'], [TraceFile.register_name(code) for code in records['register']])
+        self.assertEqual([5, 0x20, 0, 0], list(records['value']))
+        self.assertEqual(TraceFile.FLAG_HALT, records['flags'][-1])
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as trace_file:
+            trace_file.write(b'\x00' * 32)
+        with self.assertRaises(ValueError):
+            TraceFile.load(self.path)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
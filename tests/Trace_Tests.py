@@ -0,0 +1,35 @@
+import unittest
+from CPU import HertzCPU
+from Trace import TraceBuffer
+
+
+class TraceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = HertzCPU()
+        # LD V1, 0 ; ADD V1, 1 ; JP 0x2
+        self.cpu.memory[0x0:0x6] = bytes([0x61, 0x00, 0x71, 0x01, 0x10, 0x02])
+        self.cpu.registers['pc'] = 0x0
+
+    def test_capacity_is_bounded(self):
+        trace = TraceBuffer(4)
+        self.cpu.run(101, trace.tracer(self.cpu))
+
+        self.assertEqual(4, len(trace))
+        self.assertEqual(('0x7101', 'ADD V1, 1', 'V1 <= V1 + 1', 'V1 = 50'), trace[-2])
+        self.assertEqual(('0x1002', 'JP 2', 'PC <= 2', 'PC = 2'), trace[-1])
+        with self.assertRaises(IndexError):
+            trace[4]
+
+    def test_rows(self):
+        trace = TraceBuffer(2)
+        self.cpu.run(1, trace.tracer(self.cpu))
+        trace.append_row(('0x0', 'HALT'))
+        trace.append_row(('0x0', 'DUMP V0', '0b0'))
+
+        self.assertEqual([('0x0', 'HALT'), ('0x0', 'DUMP V0', '0b0')], list(trace))
+
+
+if __name__ == '__main__':
+
+    unittest.main()